@@ -0,0 +1,475 @@
+"""
+benchmark.py
+Benchmarks reproducibles de los caminos críticos de procesamiento y E/S.
+Propietario: Computación.
+
+Genera escaneos sintéticos (a partir del perfil de data/scan720.csv) a tamaños
+realistas para el A1M8 a 8k muestras/s y mide, por cada etapa registrada:
+ - tiempo de pared (mejor de --repeat ejecuciones)
+ - pico de memoria (tracemalloc, en una ejecución aparte para no falsear el tiempo)
+Los resultados se añaden a un histórico JSON local (docs/bench/history.json,
+fuera de git: cada máquina tiene el suyo) y se comparan con la línea base
+versionada (docs/bench/baseline.json): cualquier etapa más lenta que la base
+en más de --tolerance se marca como regresión.
+
+Tamaños: rev (1 vuelta), minute (1 minuto), hour (1 hora, opt-in: tarda y ocupa
+~1 GB en disco temporal). Las etapas que construyen un objeto Python por
+muestra tienen un tamaño máximo y se saltan por encima de él.
+
+Para añadir una etapa nueva basta con decorar una función con @benchmark:
+recibe el nº de muestras y un contexto, prepara los datos (no se mide) y
+devuelve la función sin argumentos que se cronometra.
+
+Uso:
+ python src/benchmark.py                           # rev + minute, todas las etapas
+ python src/benchmark.py --sizes rev minute hour --only read_csv filter_batch
+ python src/benchmark.py --save-baseline           # fija la línea base actual
+ python src/benchmark.py --fail-on-regression      # exit 1 si hay regresiones (CI)
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import csv
+import io
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH_DIR = ROOT / 'docs' / 'bench'
+HISTORY_FILE = BENCH_DIR / 'history.json'   # local, en .gitignore
+BASELINE_FILE = BENCH_DIR / 'baseline.json'
+
+SAMPLE_RATE = 8000      # muestras/s nominales del A1M8
+ROTATION_HZ = 5.5       # vueltas/s típicas
+SIZES = {
+    'rev': int(SAMPLE_RATE / ROTATION_HZ),
+    'minute': SAMPLE_RATE * 60,
+    'hour': SAMPLE_RATE * 3600,
+}
+DEFAULT_SIZES = ('rev', 'minute')
+OBJ_LIMIT = SIZES['minute']  # máximo de muestras para etapas con un objeto por muestra
+
+
+# ── Registro de benchmarks ───────────────────────────────────────────
+@dataclass
+class Bench:
+    name: str
+    setup: Callable[[int, 'Context'], Callable[[], object]]
+    max_n: Optional[int] = None
+    description: str = ''
+
+
+BENCHMARKS: Dict[str, Bench] = {}
+
+
+def benchmark(name: str, max_n: Optional[int] = None):
+    """Decorador que registra una etapa. La docstring de la función es su descripción."""
+    def deco(fn):
+        BENCHMARKS[name] = Bench(name, fn, max_n, (fn.__doc__ or '').strip().splitlines()[0])
+        return fn
+    return deco
+
+
+@dataclass
+class Context:
+    """Directorio temporal y caché de datos sintéticos compartidos entre etapas."""
+    tmp: Path
+    _cols: Dict[int, Tuple[np.ndarray, ...]] = field(default_factory=dict)
+    _csv: Dict[int, Path] = field(default_factory=dict)
+
+    def columns(self, n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Columnas sintéticas (quality, angle, measure_m, ok) de n muestras."""
+        if n not in self._cols:
+            self._cols[n] = synthetic_scan(n)
+        return self._cols[n]
+
+    def reference_csv(self, n: int) -> Path:
+        """CSV sintético con el formato de referencia (CSV_HEADER) de n muestras."""
+        if n not in self._csv:
+            path = self.tmp / f'scan_{n}.csv'
+            q, a, m, ok = self.columns(n)
+            with path.open('w', encoding='utf-8') as f:
+                f.write('quality,angle,measure_m,ok\n')
+                # Por bloques para no duplicar en memoria el CSV de 1 hora
+                for i in range(0, n, 1_000_000):
+                    sl = slice(i, i + 1_000_000)
+                    np.savetxt(f, np.column_stack((q[sl], a[sl], m[sl], ok[sl])),
+                               fmt=('%d', '%.3f', '%.4f', '%d'), delimiter=',')
+            self._csv[n] = path
+        return self._csv[n]
+
+
+def synthetic_scan(n: int, seed: int = 0):
+    """
+    Escaneo sintético de n muestras: el perfil de data/scan720.csv remuestreado
+    a la resolución de ROTATION_HZ, repetido vuelta a vuelta, con ruido.
+    """
+    from lidar_protocol import load_profile
+    q_prof, a_prof, d_prof = load_profile(str(ROOT / 'data' / 'scan720.csv'))
+    rng = np.random.default_rng(seed)
+    per_rev = SIZES['rev']
+    idx = np.arange(n) % per_rev
+    angle = idx * (360.0 / per_rev)
+    prof = np.round(angle / (a_prof[1] - a_prof[0])).astype(int) % len(a_prof)
+    measure_m = np.maximum(d_prof[prof] / 1000.0 + rng.normal(0.0, 0.01, n), 0.0)
+    measure_m[d_prof[prof] == 0] = 0.0
+    quality = np.clip(q_prof[prof] + rng.integers(-5, 6, n), 0, 255).astype(np.int64)
+    ok = ((measure_m > 0) & (quality >= 10)).astype(np.int64)
+    return quality, np.round(angle, 3), np.round(measure_m, 4), ok
+
+
+def synthetic_frames(n: int):
+    """Lista de ScanFrames (formato del driver: quality, angle_deg, dist_mm) con n puntos en total."""
+    from lidar_driver import ScanFrame
+    q, a, m, _ = synthetic_scan(n)
+    per_rev = SIZES['rev']
+    return [ScanFrame.from_columns(1.7e9 + i / ROTATION_HZ, q[s:s + per_rev], a[s:s + per_rev],
+                                   m[s:s + per_rev] * 1000.0)
+            for i, s in enumerate(range(0, n, per_rev))]
+
+
+# ── Etapas ───────────────────────────────────────────────────────────
+@benchmark('read_csv', max_n=OBJ_LIMIT)
+def bench_read_csv(n: int, ctx: Context):
+    """Lectura: lidar_driver_csv.read_scan_csv (lista de LidarSample)."""
+    from lidar_driver_csv import read_scan_csv
+    path = ctx.reference_csv(n)
+    return lambda: read_scan_csv(str(path))
+
+
+@benchmark('read_csv_chunks')
+def bench_read_csv_chunks(n: int, ctx: Context):
+    """Lectura por bloques: lidar_driver_csv.iter_scan_csv (columnas NumPy)."""
+    from lidar_driver_csv import iter_scan_csv
+    path = ctx.reference_csv(n)
+
+    def run():
+        for _ in iter_scan_csv(str(path)):
+            pass
+    return run
+
+
+@benchmark('ingest_cached')
+def bench_ingest_cached(n: int, ctx: Context):
+    """Carga desde la caché binaria de ingest.py (memmap, sin parsear texto)."""
+    from ingest import build_cache, load_scan
+    path = ctx.reference_csv(n)
+    build_cache(path)
+    return lambda: float(load_scan(path).measure_m.sum())
+
+
+@benchmark('health_chunks')
+def bench_health_chunks(n: int, ctx: Context):
+    """Salud del dataset en una pasada: dataset_health_chunks(iter_scan_csv)."""
+    from lidar_driver_csv import dataset_health_chunks, iter_scan_csv
+    path = ctx.reference_csv(n)
+    return lambda: dataset_health_chunks(iter_scan_csv(str(path)))
+
+
+@benchmark('filter_scalar', max_n=OBJ_LIMIT)
+def bench_filter_scalar(n: int, ctx: Context):
+    """Filtrado + proyección: filter_and_project (contrato escalar)."""
+    from lidar_driver_csv import LidarSample
+    from lidar_processing import filter_and_project
+    samples = [LidarSample(*row) for row in zip(*(c.tolist() for c in ctx.columns(n)))]
+    return lambda: filter_and_project(samples)
+
+
+@benchmark('filter_batch')
+def bench_filter_batch(n: int, ctx: Context):
+    """Filtrado + proyección: filter_and_project_batch (columnas NumPy)."""
+    from lidar_processing import filter_and_project_batch
+    cols = ctx.columns(n)
+    return lambda: filter_and_project_batch(*cols)
+
+
+@benchmark('project_direct')
+def bench_project_direct(n: int, ctx: Context):
+    """Proyección XY directa: radians + cos + sin por punto (ángulos q6 del driver)."""
+    _, a, m, _ = ctx.columns(n)
+    a = np.rint(a * 64.0) / 64.0
+
+    def run():
+        rad = np.radians(a)
+        return m * np.cos(rad), m * np.sin(rad)
+    return run
+
+
+@benchmark('project_lut')
+def bench_project_lut(n: int, ctx: Context):
+    """Proyección XY con lidar_processing.TrigTable (tablas q6, ángulos q6 del driver)."""
+    from lidar_processing import TrigTable
+    _, a, m, _ = ctx.columns(n)
+    a = np.rint(a * 64.0) / 64.0
+    trig = TrigTable()
+    return lambda: trig.project(a, m)
+
+
+@benchmark('outliers')
+def bench_outliers(n: int, ctx: Context):
+    """Outliers (umbrales + mediana/aislamiento/mixed pixel) por frames de 8k puntos."""
+    from outliers import detect_outliers
+    q, a, m, _ = ctx.columns(n)
+    step = SAMPLE_RATE  # 8k puntos por frame: el caso más denso del A1M8
+    frames = [(q[i:i + step], a[i:i + step], m[i:i + step]) for i in range(0, n, step)]
+
+    def run():
+        for fq, fa, fm in frames:
+            detect_outliers(fq, fa, fm)
+    return run
+
+
+@benchmark('occupancy_update')
+def bench_occupancy_update(n: int, ctx: Context):
+    """Mapa de ocupación: una actualización (rayos libres + impactos) por frame de 8k puntos."""
+    from lidar_processing import filter_and_project_batch
+    from occupancy_grid import OccupancyGrid
+    q, a, m, ok = ctx.columns(n)
+    step = SAMPLE_RATE
+    frames = [filter_and_project_batch(q[i:i + step], a[i:i + step], m[i:i + step], ok[i:i + step])
+              for i in range(0, n, step)]
+
+    def run():
+        grid = OccupancyGrid(resolution_m=0.05)
+        for x, y, _ in frames:
+            grid.update(x, y)
+    return run
+
+
+@benchmark('icp_match')
+def bench_icp_match(n: int, ctx: Context):
+    """ICP point-to-line entre frames de 8k puntos desplazados 5 cm y 2° (odometría)."""
+    from lidar_processing import filter_and_project_batch
+    from scan_matching import match_scans
+    q, a, m, ok = ctx.columns(n)
+    step = SAMPLE_RATE
+    c, s = np.cos(np.deg2rad(-2.0)), np.sin(np.deg2rad(-2.0))
+    pairs = []
+    for i in range(0, n, step):
+        x, y, _ = filter_and_project_batch(q[i:i + step], a[i:i + step], m[i:i + step], ok[i:i + step])
+        # source = el mismo barrido visto desde el sensor tras moverse
+        pairs.append((c * (x - 0.05) - s * y, s * (x - 0.05) + c * y, x, y))
+
+    def run():
+        for sx, sy, rx, ry in pairs:
+            match_scans(sx, sy, rx, ry)
+    return run
+
+
+def _index_workload(n: int, ctx: Context):
+    """Frames proyectados de 8k puntos y 1000 consultas por frame (obstáculos cerca de una ruta)."""
+    from lidar_processing import filter_and_project_batch
+    q, a, m, ok = ctx.columns(n)
+    step = SAMPLE_RATE
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(0, n, step):
+        x, y, _ = filter_and_project_batch(q[i:i + step], a[i:i + step], m[i:i + step], ok[i:i + step])
+        frames.append((x, y, rng.uniform(-3, 3, 1000), rng.uniform(-3, 3, 1000)))
+    return frames
+
+
+@benchmark('spatial_index')
+def bench_spatial_index(n: int, ctx: Context):
+    """GridIndex: rebuild por frame + 1000 consultas de vecino más cercano y de radio 0.5 m."""
+    from spatial_index import GridIndex
+    frames = _index_workload(n, ctx)
+
+    def run():
+        idx = GridIndex()
+        for x, y, qx, qy in frames:
+            idx.rebuild(x, y)
+            idx.nearest(qx, qy)
+            idx.query_radius(qx, qy, 0.5)
+    return run
+
+
+@benchmark('spatial_brute', max_n=SIZES['rev'])
+def bench_spatial_brute(n: int, ctx: Context):
+    """Referencia de spatial_index: las mismas consultas recorriendo todos los puntos."""
+    from spatial_index import brute_knn, brute_radius_counts
+    frames = _index_workload(n, ctx)
+
+    def run():
+        for x, y, qx, qy in frames:
+            brute_knn(x, y, qx, qy, 1)
+            brute_radius_counts(x, y, qx, qy, 0.5)
+    return run
+
+
+@benchmark('report')
+def bench_report(n: int, ctx: Context):
+    """Informe: record_scan_csv.main (CSV → filtered/invalid/report) parseando el texto; la caché se mide en ingest_cached."""
+    from record_scan_csv import main as report_main
+    path = ctx.reference_csv(n)
+    out = ctx.tmp / f'report_{n}'
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            report_main(str(path), str(out), cache=False)
+    return run
+
+
+@benchmark('write_record_csv')
+def bench_write_record_csv(n: int, ctx: Context):
+    """Escritura: record_scan.write_frame_csv (grabación a CSV frame a frame)."""
+    from record_scan import write_frame_csv
+    frames = synthetic_frames(n)
+    out = ctx.tmp / f'record_{n}.csv'
+
+    def run():
+        with out.open('w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['t', 'quality', 'angle_deg', 'dist_mm'])
+            seen = 0
+            for fr in frames:
+                _, seen = write_frame_csv(writer, fr, seen, 1)
+    return run
+
+
+@benchmark('write_record_bin')
+def bench_write_record_bin(n: int, ctx: Context):
+    """Escritura: record_scan.write_frame_bin (grabación binaria frame a frame)."""
+    from record_scan import write_frame_bin
+    from scan_binary import BinaryScanWriter
+    frames = synthetic_frames(n)
+    out = ctx.tmp / f'record_{n}.bin'
+
+    def run():
+        with BinaryScanWriter(str(out)) as writer:
+            seen = 0
+            for fr in frames:
+                _, seen = write_frame_bin(writer, fr, seen, 1)
+    return run
+
+
+@benchmark('read_record_bin')
+def bench_read_record_bin(n: int, ctx: Context):
+    """Lectura: scan_binary.BinaryScanReader.columns (memmap → columnas)."""
+    from scan_binary import BinaryScanReader, BinaryScanWriter
+    path = ctx.tmp / f'read_{n}.bin'
+    with BinaryScanWriter(str(path)) as writer:
+        for fr in synthetic_frames(n):
+            writer.write_frame(fr)
+    return lambda: BinaryScanReader(str(path)).columns()
+
+
+# ── Ejecución, histórico y regresiones ───────────────────────────────
+def run_one(bench: Bench, n: int, ctx: Context, repeat: int) -> dict:
+    """Ejecuta una etapa: mejor tiempo de `repeat` ejecuciones + pico de memoria."""
+    fn = bench.setup(n, ctx)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    # Pico de memoria en una ejecución aparte (tracemalloc ralentiza)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    wall = min(times)
+    return {'n': n, 'wall_s': wall, 'samples_per_s': n / wall if wall else None,
+            'peak_mb': peak / 2**20}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Lista de regresiones: (clave, tiempo base, tiempo actual, ratio)."""
+    regressions = []
+    for key, res in results.items():
+        base = baseline.get('results', {}).get(key)
+        if base and res['wall_s'] > base['wall_s'] * (1.0 + tolerance):
+            regressions.append((key, base['wall_s'], res['wall_s'], res['wall_s'] / base['wall_s']))
+    return regressions
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description='Benchmarks de procesamiento y E/S')
+    ap.add_argument('--sizes', nargs='+', default=list(DEFAULT_SIZES), choices=list(SIZES))
+    ap.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='Etapas a ejecutar')
+    ap.add_argument('--repeat', type=int, default=3, help='Repeticiones por etapa (se guarda la mejor)')
+    ap.add_argument('--tolerance', type=float, default=0.20, help='Margen antes de marcar regresión (0.20 = 20%%)')
+    ap.add_argument('--history', default=str(HISTORY_FILE))
+    ap.add_argument('--baseline', default=str(BASELINE_FILE))
+    ap.add_argument('--save-baseline', action='store_true', help='Guardar esta ejecución como línea base')
+    ap.add_argument('--fail-on-regression', action='store_true', help='Salir con código 1 si hay regresiones')
+    ap.add_argument('--list', action='store_true', help='Listar las etapas registradas')
+    args = ap.parse_args()
+
+    if args.list:
+        for b in BENCHMARKS.values():
+            print(f'{b.name:18} {b.description}')
+        return 0
+
+    names = args.only or list(BENCHMARKS)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='lidar_bench_') as tmp:
+        ctx = Context(Path(tmp))
+        for size in args.sizes:
+            n = SIZES[size]
+            for name in names:
+                bench = BENCHMARKS[name]
+                key = f'{name}/{size}'
+                if bench.max_n is not None and n > bench.max_n:
+                    print(f'{key:28} (omitido: > {bench.max_n:,} muestras)')
+                    continue
+                res = run_one(bench, n, ctx, args.repeat)
+                results[key] = res
+                print(f'{key:28} {res["wall_s"] * 1e3:10.2f} ms  {res["samples_per_s"]:14,.0f} muestras/s'
+                      f'  pico {res["peak_mb"]:8.1f} MB')
+
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+    # Histórico: una lista JSON con todas las ejecuciones
+    history_path = Path(args.history)
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    history = json.loads(history_path.read_text(encoding='utf-8')) if history_path.exists() else []
+    history.append(record)
+    history_path.write_text(json.dumps(history, indent=1), encoding='utf-8')
+    print(f'[OK] Histórico actualizado: {history_path} ({len(history)} ejecuciones)')
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(record, indent=1), encoding='utf-8')
+        print(f'[OK] Línea base guardada: {baseline_path}')
+        return 0
+    if not baseline_path.exists():
+        print('[INFO] Sin línea base; usa --save-baseline para fijarla.')
+        return 0
+
+    regressions = compare(results, json.loads(baseline_path.read_text(encoding='utf-8')), args.tolerance)
+    for key, base, now, ratio in regressions:
+        print(f'[REGRESIÓN] {key}: {base * 1e3:.2f} ms → {now * 1e3:.2f} ms ({ratio:.2f}x)')
+    if not regressions:
+        print(f'[OK] Sin regresiones respecto a la línea base (tolerancia {args.tolerance:.0%})')
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+"""
+frame_ring.py
+Anillo acotado de frames para desacoplar la lectura del puerto serie del consumidor.
+Propietario: LiDAR líder.
+
+Un hilo lector vacía el puerto continuamente y deja los frames en un anillo de
+tamaño fijo. Si el consumidor (matplotlib, escritura CSV...) va lento, el anillo
+aplica una política de desbordamiento en lugar de dejar crecer el buffer serie:
+ - 'drop_oldest' → se descarta el frame más antiguo del anillo
+ - 'latest'      → solo se guarda el último frame (anillo de 1)
+ - 'block'       → el lector espera a que haya hueco (no se pierde nada, pero
+                   el retraso se traslada al buffer serie)
+
+Uso:
+ ring = FrameRing(capacity=4, policy='drop_oldest')
+ ring.put(frame)        # hilo lector
+ fr = ring.get()        # consumidor (None cuando el anillo se cierra)
+ print(ring.stats())
+"""
+from __future__ import annotations
+import threading
+from collections import deque
+from typing import Any, Optional
+
+POLICIES = ('drop_oldest', 'latest', 'block')
+
+
+class FrameRing:
+    """Cola acotada y segura entre hilos, con política de desbordamiento y contadores."""
+
+    def __init__(self, capacity: int = 4, policy: str = 'drop_oldest') -> None:
+        """
+        Args:
+            capacity: nº máximo de frames en espera (se ignora con 'latest')
+            policy: 'drop_oldest', 'latest' o 'block'
+        """
+        if policy not in POLICIES:
+            raise ValueError(f'política desconocida: {policy!r} (opciones: {POLICIES})')
+        if capacity < 1:
+            raise ValueError('capacity debe ser >= 1')
+        self.policy = policy
+        self.capacity = 1 if policy == 'latest' else capacity
+        self._q: deque = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        # Contadores (se leen con stats())
+        self.pushed = 0      # frames entregados por el lector
+        self.delivered = 0   # frames entregados al consumidor
+        self.dropped = 0     # frames descartados por desbordamiento
+        self.max_depth = 0   # profundidad máxima alcanzada
+
+    def put(self, item: Any) -> bool:
+        """
+        Añade un frame aplicando la política de desbordamiento.
+        Returns:
+            False si el anillo está cerrado (el lector debe terminar).
+        """
+        with self._cond:
+            if self.policy == 'block':
+                while len(self._q) >= self.capacity and not self._closed:
+                    self._cond.wait()
+            elif len(self._q) >= self.capacity:
+                self._q.popleft()
+                self.dropped += 1
+            if self._closed:
+                return False
+            self._q.append(item)
+            self.pushed += 1
+            self.max_depth = max(self.max_depth, len(self._q))
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        Saca el frame más antiguo disponible (espera si no hay ninguno).
+        Returns:
+            El frame, o None si el anillo se cerró y ya está vacío.
+        Raises:
+            TimeoutError si pasa `timeout` segundos sin frames.
+            La excepción del lector, si terminó por un error.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._q or self._closed, timeout):
+                raise TimeoutError(f'Sin frames en {timeout} s')
+            if self._q:
+                item = self._q.popleft()
+                self.delivered += 1
+                self._cond.notify_all()
+                return item
+            if self._error is not None:
+                raise self._error
+            return None
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        """Cierra el anillo: despierta a lector y consumidor. `error` se relanza en get()."""
+        with self._cond:
+            self._closed = True
+            if error is not None and self._error is None:
+                self._error = error
+            self._cond.notify_all()
+
+    @property
+    def depth(self) -> int:
+        """Nº de frames en espera ahora mismo."""
+        return len(self._q)
+
+    def stats(self) -> dict:
+        """Contadores del anillo, para logs o para mostrarlos en pantalla."""
+        with self._cond:
+            return {
+                'policy': self.policy,
+                'capacity': self.capacity,
+                'depth': len(self._q),
+                'max_depth': self.max_depth,
+                'pushed': self.pushed,
+                'delivered': self.delivered,
+                'dropped': self.dropped,
+            }
+
+
+if __name__ == '__main__':
+    # Demo: un productor a 10 Hz y un consumidor lento (4 Hz) con cada política
+    import time
+
+    for policy in POLICIES:
+        ring = FrameRing(capacity=3, policy=policy)
+
+        def productor():
+            for i in range(20):
+                if not ring.put((i, time.time())):
+                    break
+                time.sleep(0.01)
+            ring.close()
+
+        th = threading.Thread(target=productor, daemon=True)
+        th.start()
+        edades = []
+        while (item := ring.get()) is not None:
+            edades.append(time.time() - item[1])
+            time.sleep(0.025)
+        th.join()
+        print(f'{policy:12} → recibidos {len(edades):2}, edad máx. {max(edades) * 1e3:5.1f} ms, {ring.stats()}')
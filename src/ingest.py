@@ -0,0 +1,272 @@
+"""
+ingest.py
+Ingesta de CSV de escaneo con detección de formato y caché binaria.
+Propietario: Computación.
+
+Los CSV de data/ no comparten formato y read_scan_csv() solo acepta el de
+referencia (CSV_HEADER). Este módulo reconoce los formatos conocidos por su
+header, normaliza una sola vez columnas y unidades a las de ScanChunk
+(quality, angle en grados, measure_m en metros, ok) y guarda el resultado
+junto al CSV en una caché binaria:
+ <archivo>.cols.npy  → array (4, N) float64: quality, angle, measure_m, ok
+ <archivo>.cols.json → formato detectado y huella del CSV (tamaño, mtime, sha256)
+Las cargas siguientes abren el .npy como memmap (sin parsear texto). La
+caché se da por buena si tamaño y mtime coinciden; si solo cambia el mtime
+(copia, checkout) se compara el sha256 antes de reconstruirla.
+
+Formatos reconocidos (header, sin distinguir mayúsculas):
+ referencia : quality,angle,measure_m,ok
+ scan720    : quality,angle_deg,distance_m,is_valid_hint (distancia vacía = sin eco)
+ mm         : Angle,Distance,Quality (distancia en mm; ok = distancia > 0)
+ record_scan: t,quality,angle_deg,dist_mm (grabaciones de record_scan.py; ok = distancia > 0)
+
+Uso:
+ scan = load_scan('data/scan720.csv')            # ScanChunk con todo el archivo
+ for chunk in iter_scan('data/larga.csv'): ...    # por bloques (vistas del memmap)
+ python src/ingest.py data/scan720.csv data/scan_20261902_1822.csv
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, Optional, Tuple, Union
+import numpy as np
+from lidar_driver_csv import DEFAULT_CHUNK, ScanChunk
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = '.cols'
+_HASH_BLOCK = 1 << 20
+# Campo vacío (",," o "," al final de la línea) → nan para np.loadtxt
+_EMPTY_FIELD = re.compile(r'(?<=,)(?=,|\r?$)|^(?=,)', re.M)
+
+PathLike = Union[str, Path]
+
+
+@dataclass(frozen=True)
+class Schema:
+    """Formato de CSV conocido y cómo llevarlo a las columnas de ScanChunk."""
+    name: str
+    header: Tuple[str, ...]      # en minúsculas, en el orden del archivo
+    quality: str
+    angle: str
+    distance: str
+    dist_scale: float            # factor de la distancia a metros
+    ok: Optional[str] = None     # None = ok si la distancia es > 0
+
+    def column(self, name: str) -> int:
+        return self.header.index(name)
+
+
+SCHEMAS = (
+    Schema('referencia', ('quality', 'angle', 'measure_m', 'ok'), 'quality', 'angle', 'measure_m', 1.0, 'ok'),
+    Schema('scan720', ('quality', 'angle_deg', 'distance_m', 'is_valid_hint'),
+           'quality', 'angle_deg', 'distance_m', 1.0, 'is_valid_hint'),
+    Schema('mm', ('angle', 'distance', 'quality'), 'quality', 'angle', 'distance', 1e-3),
+    Schema('record_scan', ('t', 'quality', 'angle_deg', 'dist_mm'), 'quality', 'angle_deg', 'dist_mm', 1e-3),
+)
+
+
+def detect_schema(path: PathLike) -> Schema:
+    """
+    Formato del CSV según su header.
+    Raises:
+        ValueError si el header no corresponde a ningún formato conocido.
+    """
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        header = tuple(h.strip().lower() for h in f.readline().strip().split(','))
+    for schema in SCHEMAS:
+        if header == schema.header:
+            return schema
+    known = ' | '.join(','.join(s.header) for s in SCHEMAS)
+    raise ValueError(f'{path}: formato de CSV desconocido {header}. Conocidos: {known}')
+
+
+# ── Parseo del texto (solo la primera vez) ───────────────────────────
+def _parse_blocks(path: PathLike, schema: Schema, chunk_size: int) -> Iterator[np.ndarray]:
+    """Bloques normalizados (4, n) float64: quality, angle, measure_m, ok."""
+    cols = [schema.column(schema.quality), schema.column(schema.angle), schema.column(schema.distance)]
+    if schema.ok is not None:
+        cols.append(schema.column(schema.ok))
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        f.readline()  # header
+        while True:
+            lines = list(islice(f, chunk_size))
+            if not lines:
+                return
+            text = ''.join(lines)
+            if ',,' in text or ',\n' in text or ',\r' in text or text.startswith(','):
+                text = _EMPTY_FIELD.sub('nan', text)
+            if '\n\n' in text or text.startswith('\n'):
+                text = '\n'.join(ln for ln in text.splitlines() if ln.strip())
+            data = np.loadtxt(text.splitlines(), delimiter=',', dtype=np.float64, ndmin=2, usecols=cols)
+            if not len(data):
+                continue
+            # Campos vacíos como el sensor: sin eco = distancia 0, calidad/ok 0
+            np.nan_to_num(data, copy=False, nan=0.0)
+            block = np.empty((4, len(data)))
+            block[0] = data[:, 0]
+            block[1] = data[:, 1]
+            block[2] = data[:, 2] * schema.dist_scale
+            block[3] = data[:, 3] if schema.ok is not None else (block[2] > 0)
+            yield block
+
+
+def _count_rows(path: PathLike) -> int:
+    """Cota superior de filas de datos (saltos de línea tras el header), sin parsear."""
+    n = 0
+    with open(path, 'rb') as f:
+        last = b''
+        for buf in iter(lambda: f.read(_HASH_BLOCK), b''):
+            n += buf.count(b'\n')
+            last = buf
+    if last and not last.endswith(b'\n'):
+        n += 1  # última línea sin salto
+    return max(n - 1, 0)
+
+
+def _sha256(path: PathLike) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(_HASH_BLOCK), b''):
+            h.update(buf)
+    return h.hexdigest()
+
+
+# ── Caché ────────────────────────────────────────────────────────────
+def cache_paths(path: PathLike) -> Tuple[Path, Path]:
+    """Rutas de la caché de un CSV: (<archivo>.cols.npy, <archivo>.cols.json)."""
+    path = Path(path)
+    base = path.with_name(path.name + CACHE_SUFFIX)
+    return base.with_name(base.name + '.npy'), base.with_name(base.name + '.json')
+
+
+def _fingerprint(path: PathLike) -> dict:
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _cache_is_valid(path: PathLike) -> bool:
+    """La caché existe, es de esta versión y corresponde al contenido actual del CSV."""
+    npy, meta_path = cache_paths(path)
+    if not npy.exists() or not meta_path.exists():
+        return False
+    try:
+        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return False
+    fp = _fingerprint(path)
+    if meta.get('version') != CACHE_VERSION or meta.get('size') != fp['size']:
+        return False
+    if meta.get('mtime_ns') == fp['mtime_ns']:
+        return True
+    # Mismo tamaño pero otro mtime: decide el contenido
+    if meta.get('sha256') != _sha256(path):
+        return False
+    meta['mtime_ns'] = fp['mtime_ns']
+    meta_path.write_text(json.dumps(meta, indent=1), encoding='utf-8')
+    return True
+
+
+def build_cache(path: PathLike, chunk_size: int = DEFAULT_CHUNK) -> Path:
+    """
+    Parsea el CSV una vez (por bloques, memoria constante) y escribe su caché.
+    Returns:
+        Ruta del .npy.
+    """
+    schema = detect_schema(path)
+    npy, meta_path = cache_paths(path)
+    fp = _fingerprint(path)
+    tmp = npy.with_name(npy.stem + '.tmp.npy')
+    # Se reserva la cota de filas y se recorta al final si había líneas vacías
+    cap = _count_rows(path)
+    out = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float64, shape=(4, cap))
+    n = 0
+    for block in _parse_blocks(path, schema, chunk_size):
+        out[:, n:n + block.shape[1]] = block
+        n += block.shape[1]
+    out.flush()
+    if n < cap:
+        trimmed = np.array(out[:, :n])
+        del out
+        np.save(tmp, trimmed)
+    else:
+        del out
+    os.replace(tmp, npy)
+    meta = {'version': CACHE_VERSION, 'schema': schema.name, 'rows': n,
+            'source': Path(path).name, **fp, 'sha256': _sha256(path)}
+    meta_path.write_text(json.dumps(meta, indent=1), encoding='utf-8')
+    return npy
+
+
+def _cached_columns(path: PathLike) -> Optional[np.ndarray]:
+    """Memmap (4, N) de la caché (se crea si falta o no es válida); None si no se puede usar."""
+    try:
+        if not _cache_is_valid(path):
+            build_cache(path)
+        return np.load(cache_paths(path)[0], mmap_mode='r')
+    except OSError as e:
+        print(f'[WARN] Sin caché para {path} ({e}); se parsea el texto')
+        return None
+
+
+def _chunk(cols: np.ndarray) -> ScanChunk:
+    return ScanChunk(
+        quality=cols[0].astype(np.int64),
+        angle=cols[1],
+        measure_m=cols[2],
+        ok=cols[3].astype(np.int64),
+    )
+
+
+def load_scan(path: PathLike, cache: bool = True) -> ScanChunk:
+    """
+    Todo el CSV (cualquier formato conocido) como un ScanChunk normalizado.
+    angle y measure_m son vistas del memmap de la caché (sin copia).
+    """
+    cols = _cached_columns(path) if cache else None
+    if cols is None:
+        blocks = list(_parse_blocks(path, detect_schema(path), DEFAULT_CHUNK))
+        cols = np.concatenate(blocks, axis=1) if blocks else np.empty((4, 0))
+    return _chunk(cols)
+
+
+def iter_scan(path: PathLike, chunk_size: int = DEFAULT_CHUNK, cache: bool = True) -> Iterator[ScanChunk]:
+    """
+    Igual que iter_scan_csv(), pero para cualquier formato conocido y desde la
+    caché. Sin caché se parsea el texto bloque a bloque (memoria constante).
+    """
+    cols = _cached_columns(path) if cache else None
+    if cols is None:
+        for block in _parse_blocks(path, detect_schema(path), chunk_size):
+            yield _chunk(block)
+        return
+    for i in range(0, cols.shape[1], chunk_size):
+        yield _chunk(cols[:, i:i + chunk_size])
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    ap = argparse.ArgumentParser(description='Detecta el formato, crea la caché y compara tiempos de carga')
+    ap.add_argument('csv', nargs='+')
+    args = ap.parse_args()
+    for p in args.csv:
+        schema = detect_schema(p)
+        t0 = time.perf_counter()
+        texto = load_scan(p, cache=False)
+        t_texto = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        load_scan(p)  # crea (o valida) la caché
+        t_build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        scan = load_scan(p)
+        t_cache = time.perf_counter() - t0
+        same = all(np.array_equal(getattr(scan, k), getattr(texto, k)) for k in ('quality', 'angle', 'measure_m', 'ok'))
+        print(f'{p}: formato {schema.name}, {len(scan)} filas, ok {scan.ok.mean():.1%} | '
+              f'texto {t_texto * 1e3:.1f} ms, 1ª carga {t_build * 1e3:.1f} ms, '
+              f'caché {t_cache * 1e3:.2f} ms | idénticos: {same}')
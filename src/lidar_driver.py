@@ -9,26 +9,163 @@ Uso:
  for frame in driver.frames():
      procesar(frame) # cada frame es un barrido completo 360°
  driver.shutdown_safe()
+
+Por sectores (menor latencia: cada porción de 30° llega en cuanto se cierra,
+sin esperar a la vuelta completa; con reassemble() se recuperan las vueltas):
+ for sec in driver.sectors(width_deg=30, backend='bulk'):
+     procesar(sec) # sec.rev, sec.a0, sec.a1, sec.t + columnas como ScanFrame
+ for frame in reassemble(driver.sectors()): ...
+
+Backends de lectura (argumento `backend` de frames()):
+ 'rplidar' → iter_scans() de la librería oficial (por defecto)
+ 'bulk'    → lectura por bloques + decodificador NumPy (lidar_protocol.py)
+ 'express' → scan express (cápsulas de 84 bytes, más muestras por vuelta)
+
+Adquisición en segundo plano (consumidores lentos):
+ for frame in driver.frames_threaded(capacity=4, policy='drop_oldest'):
+     procesar(frame)
+ print(driver.ring.stats()) # frames descartados, profundidad de la cola...
+
+Desde asyncio (la lectura serie va en un hilo dedicado; al salir o cancelar
+se ejecuta igualmente shutdown_safe()):
+ async with aclosing(driver.aframes(frame_timeout=1.0)) as frames:
+     async for frame in frames:
+         await procesar(frame)
+
+Latencia por etapa (ver profiling.py): con driver.profiler = Profiler() cada
+frame lleva marcas read/decode/filter/queue en frame.stamps.
 """
 from __future__ import annotations
+import asyncio
+import threading
 import time
-from dataclasses import dataclass
-from typing import Iterable, List, Tuple
-from rplidar import RPLidar
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import AsyncIterator, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from rplidar import DEFAULT_MOTOR_PWM, RPLidar, RPLidarException
+from frame_ring import FrameRing
+from lidar_protocol import (EXPRESS_PACKET_LEN, EXPRESS_SAMPLES, EXPRESS_SCAN_BYTE,
+                            EXPRESS_TYPE, SCAN_BYTE, SCAN_PACKET_LEN, SCAN_TYPE,
+                            ExpressScanDecoder, MeasureChunk, RevolutionSplitter,
+                            SectorAssembler, StandardScanDecoder)
 
 # Tipo para cada punto: (quality, angle_deg, dist_mm)
 # Se define un alias de tipo para que el código sea más legible y el IDE ayude.
 ScanPoint = Tuple[int, float, float]
 
-@dataclass
 class ScanFrame:
     """
-    Un barrido completo del sensor (aprox. 360°).
-    Usamos un dataclass para agrupar fácilmente el momento exacto de la captura 
-    junto con todos los puntos recogidos en esa vuelta.
+    Un barrido completo del sensor (aprox. 360°), en formato columnar.
+    En lugar de una lista de tuplas guardamos un único buffer NumPy (3 x N)
+    preasignado: fila 0 = quality, fila 1 = angle_deg, fila 2 = dist_mm.
+    Así un frame cuesta una sola reserva de memoria en vez de ~500 tuplas,
+    y los consumidores trabajan directamente con arrays (sin list comprehensions).
+
+    Compatibilidad: `ScanFrame(t, pts)` y `fr.pts` siguen funcionando como
+    antes (lista de tuplas (quality, angle_deg, dist_mm)).
+    """
+    __slots__ = ('t', 'n', '_buf', 'stamps')
+
+    def __init__(self, t: float, pts: Optional[Sequence[ScanPoint]] = None, capacity: int = 0) -> None:
+        """
+        Args:
+            t: timestamp Unix (time.time()) para sincronización
+            pts: puntos iniciales opcionales (quality, angle_deg, dist_mm)
+            capacity: nº de puntos a reservar en el buffer
+        """
+        self.t = t
+        self.stamps = None  # marcas de tiempo por etapa (solo con profiler, ver profiling.py)
+        n_pts = len(pts) if pts is not None else 0
+        # Única reserva de memoria del frame: las tres columnas van contiguas
+        self._buf = np.empty((3, max(capacity, n_pts)), dtype=np.float64)
+        self.n = 0  # nº de puntos ocupados en el buffer
+        if n_pts:
+            self.load(pts)
+
+    # Vistas (sin copia) sobre las columnas ocupadas del buffer
+    @property
+    def quality(self) -> np.ndarray:
+        return self._buf[0, :self.n]
+
+    @property
+    def angle(self) -> np.ndarray:
+        return self._buf[1, :self.n]
+
+    @property
+    def dist(self) -> np.ndarray:
+        return self._buf[2, :self.n]
+
+    @property
+    def pts(self) -> List[ScanPoint]:
+        """Lista de tuplas (quality, angle_deg, dist_mm), para el código antiguo."""
+        return list(zip(self.quality.astype(int).tolist(), self.angle.tolist(), self.dist.tolist()))
+
+    def __len__(self) -> int:
+        return self.n
+
+    @classmethod
+    def from_columns(cls, t: float, quality, angle, dist) -> 'ScanFrame':
+        """Crea un frame copiando columnas ya decodificadas (una sola reserva)."""
+        fr = cls(t, capacity=len(angle))
+        fr.n = len(angle)
+        fr._buf[0, :fr.n] = quality
+        fr._buf[1, :fr.n] = angle
+        fr._buf[2, :fr.n] = dist
+        return fr
+
+    def load(self, scan: Sequence[ScanPoint]) -> None:
+        """
+        Copia en el buffer una secuencia de puntos (quality, angle_deg, dist_mm).
+        Es lo que devuelve rplidar.iter_scans(); NumPy hace la conversión en C.
+        """
+        n = len(scan)
+        if n > self._buf.shape[1]:
+            self._buf = np.empty((3, n), dtype=np.float64)
+        self._buf[:, :n].T[...] = scan
+        self.n = n
+
+    def keep(self, mask: np.ndarray) -> None:
+        """Compacta el frame en su propio buffer conservando solo los puntos de `mask`."""
+        k = int(np.count_nonzero(mask))
+        self._buf[:, :k] = self._buf[:, :self.n][:, mask]
+        self.n = k
+
+class ScanSector(ScanFrame):
+    """
+    Porción angular fija de una vuelta (ver LidarDriver.sectors()): los puntos
+    con angle en [a0, a1) de la vuelta `rev`, entregados sin esperar a que la
+    vuelta se complete. Mismo formato columnar que ScanFrame.
     """
-    t: float             # timestamp Unix (time.time()) para sincronización
-    pts: List[ScanPoint] # lista de puntos, cada uno con (quality, angle_deg, dist_mm)
+    __slots__ = ('rev', 'index', 'a0', 'a1')
+
+    def __init__(self, t: float, pts: Optional[Sequence[ScanPoint]] = None, capacity: int = 0) -> None:
+        super().__init__(t, pts, capacity)
+        self.rev = 0      # nº de vuelta desde el arranque del scan
+        self.index = 0    # nº de sector dentro de la vuelta
+        self.a0 = 0.0     # grados, inicio del sector (incluido)
+        self.a1 = 360.0   # grados, fin del sector (excluido)
+
+def reassemble(sectors: Iterable[ScanSector]) -> Iterable[ScanFrame]:
+    """
+    Reconstruye vueltas completas a partir de driver.sectors(): une los
+    sectores consecutivos de la misma vuelta en un ScanFrame (t del último
+    sector). La última vuelta se entrega al terminar el stream aunque esté incompleta.
+    Las vueltas se cortan por ángulo (ver SectorAssembler), no por el bit S:
+    en express pueden diferir de frames() en las pocas medidas junto a 0°.
+    """
+    group: List[ScanSector] = []
+    for sec in sectors:
+        if group and sec.rev != group[-1].rev:
+            yield _join(group)
+            group = []
+        group.append(sec)
+    if group:
+        yield _join(group)
+
+def _join(group: List[ScanSector]) -> ScanFrame:
+    q, a, d = np.concatenate([sec._buf[:, :sec.n] for sec in group], axis=1)
+    return ScanFrame.from_columns(group[-1].t, q, a, d)
 
 # ── Umbrales de filtrado (Sensores ajusta estos valores) ─────────────
 # Parámetros físicos del RPLIDAR A1M8. Se declaran globales para fácil ajuste.
@@ -36,6 +173,45 @@ QUALITY_MIN = 10      # descartar puntos con calidad menor (evita ruido en los d
 DIST_MIN_MM = 150.0   # 15 cm → mínimo físico del sensor (puntos más cercanos suelen ser errores ópticos)
 DIST_MAX_MM = 12000.0 # 12 m → máximo especificado por el fabricante en interiores
 
+# ── Lectura por bloques (backend 'bulk') ─────────────────────────────
+BACKENDS = ('rplidar', 'bulk', 'express')
+EXPRESS_PAYLOAD = b'\x00' * 5 # working_mode = 0 (modo express clásico) + 4 bytes reservados
+READ_SIZE = 64 * SCAN_PACKET_LEN # bytes mínimos por lectura del puerto (~28 ms a 115200 bps)
+LIB_BLOCK = 16 # medidas por bloque en sectors(backend='rplidar') (~2 ms a 8000 medidas/s)
+JOIN_TIMEOUT_S = 3.0 # espera máxima al hilo lector al cerrar (> timeout del puerto serie)
+START_TIMEOUT_S = 5.0 # margen para el primer frame en aframes() (arranque del motor)
+
+def valid_mask_mm(quality: np.ndarray, dist_mm: np.ndarray) -> np.ndarray:
+    """
+    Máscara de puntos válidos de un frame (umbrales del driver).
+    Se aplica como una sola operación vectorizada sobre todo el barrido.
+    """
+    # Descartamos distancia 0 o mala calidad, y medidas fuera del rango físico del hardware
+    return (dist_mm > 0) & (quality >= QUALITY_MIN) & (dist_mm >= DIST_MIN_MM) & (dist_mm <= DIST_MAX_MM)
+
+class _RPLidar(RPLidar):
+    """
+    RPLidar de la librería oficial, tolerante a puertos sin líneas de módem.
+    En el A1 el motor se arranca/para con DTR; los puertos virtuales (pty del
+    emulador, socat, algunos adaptadores USB-serie) no lo soportan y pyserial
+    lanza OSError. En ese caso seguimos solo con el comando PWM, que la
+    librería envía igualmente para el A2.
+    """
+
+    def start_motor(self):
+        try:
+            super().start_motor()
+        except OSError:
+            self.set_pwm(DEFAULT_MOTOR_PWM)
+            self.motor_running = True
+
+    def stop_motor(self):
+        try:
+            super().stop_motor()  # el PWM a 0 se envía antes del DTR
+        except OSError:
+            self.motor_running = False
+
+
 class LidarDriver:
     """Interfaz de alto nivel para el RPLIDAR A1M8."""
     
@@ -48,7 +224,13 @@ class LidarDriver:
         """
         self.port = port
         # Inicializamos la librería oficial que abstrae la comunicación serie
-        self.lidar = RPLidar(port) 
+        self.lidar = _RPLidar(port) 
+        # Anillo de la adquisición en segundo plano (solo con frames_threaded)
+        self.ring: Optional[FrameRing] = None
+        # Instrumentación de latencia por etapa (profiling.Profiler); None = desactivada
+        self.profiler = None
+        # Monitor de proximidad (safety_monitor.SafetyMonitor); None = desactivado
+        self.safety = None
         
     def diag(self) -> dict:
         """
@@ -77,42 +259,291 @@ class LidarDriver:
             '_raw_health': health,
         }
         
-    def frames(self, max_buf_meas: int = 500) -> Iterable[ScanFrame]:
+    def frames(self, max_buf_meas: int = 500, backend: str = 'rplidar') -> Iterable[ScanFrame]:
         """
         Generador que produce ScanFrames en tiempo real.
         Se usa `yield` para entregar los datos frame a frame sin bloquear la memoria.
         
         Args:
             max_buf_meas: máximo de medidas en buffer interno (evita lag)
+            backend: 'rplidar' (librería oficial), 'bulk' (decodificador NumPy)
+                o 'express' (scan express decodificado con NumPy)
         
         Yields:
             ScanFrame con timestamp y lista de puntos filtrados.
         """
+        if backend not in BACKENDS:
+            raise ValueError(f'backend desconocido: {backend!r} (opciones: {BACKENDS})')
+        if backend == 'bulk':
+            yield from self._frames_bulk(max_buf_meas)
+            return
+        if backend == 'express':
+            yield from self._frames_bulk(max_buf_meas, express=True)
+            return
+
+        prof = self.profiler
+        safety = self.safety
         # iter_scans() ya nos agrupa los puntos por vueltas completas
         for scan in self.lidar.iter_scans(max_buf_meas=max_buf_meas):
-            pts: List[ScanPoint] = []
-            
-            for q, a, d in scan:
-                # TODO [LiDAR líder]: añadir todos los filtros necesarios
-                # Filtro básico de distancia y calidad para limpiar la nube de puntos:
-                if d <= 0 or q < QUALITY_MIN:
-                    continue  # Ignoramos medidas de distancia 0 o mala calidad
-                    
-                if not (DIST_MIN_MM <= d <= DIST_MAX_MM):
-                    continue  # Ignoramos medidas fuera del rango físico del hardware
-                    
-                # Si pasa los filtros, añadimos el punto (convertido a los tipos correctos)
-                pts.append((int(q), float(a), float(d)))
-                
-            if pts: # Solo emitimos el frame si quedaron puntos válidos tras el filtrado
-                yield ScanFrame(t=time.time(), pts=pts)
-                
+            t_scan = time.perf_counter()
+            # Un frame = una reserva de memoria; NumPy copia la vuelta entera de golpe
+            fr = ScanFrame(t=time.time(), capacity=len(scan))
+            if prof is not None:
+                prof.begin(fr)
+            fr.load(scan)
+            # Con la librería solo vemos vueltas completas: se vigila el frame entero
+            if safety is not None:
+                safety.check_frame(fr, t_scan)
+                if safety.halted:
+                    return
+            # TODO [LiDAR líder]: añadir todos los filtros necesarios
+            # El filtro de distancia y calidad se aplica como máscara, en el propio buffer
+            fr.keep(valid_mask_mm(fr.quality, fr.dist))
+            if prof is not None:
+                prof.stamp(fr, 'filter')
+
+            if fr.n: # Solo emitimos el frame si quedaron puntos válidos tras el filtrado
+                yield fr
+
+    def frames_threaded(self, capacity: int = 4, policy: str = 'drop_oldest',
+                        max_buf_meas: int = 500, backend: str = 'rplidar') -> Iterable[ScanFrame]:
+        """
+        Como frames(), pero un hilo lector vacía el puerto serie continuamente y
+        deja los frames en un anillo acotado (frame_ring.py). Así un consumidor
+        lento no hace crecer el buffer serie: la latencia queda acotada por la
+        capacidad del anillo y la política elegida.
+
+        Args:
+            capacity: nº máximo de frames en espera
+            policy: 'drop_oldest', 'latest' o 'block'
+            max_buf_meas, backend: se pasan a frames()
+
+        Yields:
+            ScanFrame, igual que frames(). Los contadores quedan en self.ring.stats().
+        """
+        ring = FrameRing(capacity, policy)
+        self.ring = ring
+        stop = threading.Event()
+
+        def lector():
+            try:
+                with closing(iter(self.frames(max_buf_meas, backend))) as it:
+                    for fr in it:
+                        if stop.is_set() or not ring.put(fr):
+                            break
+            except Exception as e:
+                # El error se relanza en el hilo consumidor desde ring.get()
+                ring.close(error=e)
+            ring.close()
+
+        th = threading.Thread(target=lector, name='lidar-adquisicion', daemon=True)
+        th.start()
+        try:
+            while (fr := ring.get()) is not None:
+                if self.profiler is not None:
+                    self.profiler.stamp(fr, 'queue')
+                yield fr
+        finally:
+            # Paramos el lector ANTES de que el llamante haga shutdown_safe(),
+            # para que no haya dos hilos usando el puerto serie a la vez
+            stop.set()
+            ring.close()
+            th.join(timeout=JOIN_TIMEOUT_S)
+
+    async def aframes(self, frame_timeout: Optional[float] = 1.0, max_buf_meas: int = 500,
+                      backend: str = 'rplidar', shutdown: bool = True) -> AsyncIterator[ScanFrame]:
+        """
+        Versión asyncio de frames(): `async for frame in driver.aframes()`.
+        Toda la E/S serie (incluida la parada) se ejecuta en un único hilo
+        dedicado, así el bucle de eventos nunca se bloquea y las llamadas al
+        puerto quedan serializadas.
+
+        Args:
+            frame_timeout: segundos máximos entre frames (None = sin límite).
+                El primer frame tiene al menos START_TIMEOUT_S (arranque del motor).
+            max_buf_meas, backend: se pasan a frames()
+            shutdown: ejecutar shutdown_safe() al terminar (por fin, error,
+                timeout o cancelación)
+
+        Yields:
+            ScanFrame, igual que frames().
+
+        Raises:
+            TimeoutError si no llega ningún frame en frame_timeout segundos
+            (p. ej. motor bloqueado), en lugar de colgar el bucle.
+        """
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lidar-async')
+        it = iter(self.frames(max_buf_meas, backend))
+        timeout = None if frame_timeout is None else max(frame_timeout, START_TIMEOUT_S)
+        try:
+            while True:
+                try:
+                    fr = await asyncio.wait_for(loop.run_in_executor(executor, next, it, None), timeout)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f'Sin frames del LiDAR en {timeout} s (¿motor parado?)') from None
+                if fr is None:
+                    return
+                yield fr
+                timeout = frame_timeout
+        finally:
+            # La parada se encola en el MISMO hilo: se ejecuta cuando termine la
+            # lectura en curso, nunca en paralelo con ella. Aunque nos vuelvan a
+            # cancelar mientras esperamos, el trabajo ya encolado se completa.
+            cierre = loop.run_in_executor(executor, self._close_frames, it, shutdown)
+            try:
+                await asyncio.shield(cierre)
+            finally:
+                executor.shutdown(wait=False)
+
+    def _close_frames(self, it, shutdown: bool) -> None:
+        """Cierra el generador de frames y, si se pide, para el sensor (hilo de aframes)."""
+        try:
+            it.close()
+        finally:
+            if shutdown:
+                self.shutdown_safe()
+
+    def _frames_bulk(self, max_buf_meas: int, express: bool = False) -> Iterable[ScanFrame]:
+        """
+        Igual que frames(), pero leyendo el puerto por bloques y decodificando
+        con NumPy (lidar_protocol.py) en lugar de paquete a paquete en Python.
+        Con express=True se usa el scan express (cápsulas de 32 medidas).
+        """
+        splitter = RevolutionSplitter()
+        prof = self.profiler
+        for t_read, measures in self._measure_blocks(max_buf_meas, 'express' if express else 'bulk'):
+            for q, a, d in splitter.push(measures):
+                fr = ScanFrame.from_columns(time.time(), q, a, d)
+                if prof is not None:
+                    prof.begin(fr, t_read)
+                    prof.stamp(fr, 'decode')
+                fr.keep(valid_mask_mm(fr.quality, fr.dist))
+                if prof is not None:
+                    prof.stamp(fr, 'filter')
+                if fr.n:
+                    yield fr
+
+    def sectors(self, width_deg: float = 30.0, max_buf_meas: int = 500,
+                backend: str = 'bulk') -> Iterable[ScanSector]:
+        """
+        Como frames(), pero entrega porciones angulares fijas de cada vuelta en
+        cuanto se completan, sin esperar a los 360°: el dato de un rumbo dado
+        llega con como mucho un sector de retraso en lugar de una vuelta.
+        Para quien necesite vueltas completas, reassemble(driver.sectors()).
+
+        Args:
+            width_deg: ancho de sector (debe dividir 360, p. ej. 30 o 45)
+            max_buf_meas: máximo de medidas en buffer interno (evita lag)
+            backend: 'bulk' o 'express' (bloques del puerto decodificados con
+                NumPy), o 'rplidar' (medidas de iter_measurments() agrupadas
+                de LIB_BLOCK en LIB_BLOCK)
+
+        Yields:
+            ScanSector con los puntos filtrados (los sectores sin puntos válidos no se emiten).
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f'backend desconocido: {backend!r} (opciones: {BACKENDS})')
+        assembler = SectorAssembler(width_deg)
+        prof = self.profiler
+        for t_read, measures in self._measure_blocks(max_buf_meas, backend):
+            for rev, k, q, a, d in assembler.push(measures):
+                sec = ScanSector.from_columns(time.time(), q, a, d)
+                sec.rev, sec.index = rev, k
+                sec.a0, sec.a1 = k * assembler.width, (k + 1) * assembler.width
+                if prof is not None:
+                    prof.begin(sec, t_read)
+                    prof.stamp(sec, 'decode')
+                sec.keep(valid_mask_mm(sec.quality, sec.dist))
+                if prof is not None:
+                    prof.stamp(sec, 'filter')
+                if sec.n:
+                    yield sec
+
+    def _measure_blocks(self, max_buf_meas: int, backend: str) -> Iterable[Tuple[float, MeasureChunk]]:
+        """
+        Arranca el scan y produce (t_read, medidas decodificadas) por cada bloque
+        leído, con t_read = time.perf_counter() al salir del puerto.
+        El monitor de proximidad ve aquí cada bloque según llega, sin esperar a la vuelta.
+        """
+        if backend == 'rplidar':
+            blocks = self._lib_blocks(max_buf_meas)
+        else:
+            if backend == 'express':
+                self._start_raw_scan(EXPRESS_SCAN_BYTE, EXPRESS_PACKET_LEN, EXPRESS_TYPE, EXPRESS_PAYLOAD)
+                decoder = ExpressScanDecoder()
+                chunks = self._read_chunks(EXPRESS_PACKET_LEN, max_buf_meas, EXPRESS_SAMPLES)
+            else:
+                self._start_raw_scan(SCAN_BYTE, SCAN_PACKET_LEN, SCAN_TYPE)
+                decoder = StandardScanDecoder()
+                chunks = self._read_chunks(SCAN_PACKET_LEN, max_buf_meas)
+            blocks = ((time.perf_counter(), decoder.feed(data)) for data in chunks)
+        safety = self.safety
+        for t_read, measures in blocks:
+            if safety is not None:
+                safety.check(measures.quality, measures.angle, measures.dist, t_read)
+                if safety.halted:
+                    return
+            yield t_read, measures
+
+    def _lib_blocks(self, max_buf_meas: int) -> Iterable[Tuple[float, MeasureChunk]]:
+        """Medidas de iter_measurments() (librería oficial) en bloques de LIB_BLOCK."""
+        buf = []
+        for meas in self.lidar.iter_measurments(max_buf_meas=max_buf_meas):
+            buf.append(meas)  # (new_scan, quality, angle, distance)
+            if len(buf) >= LIB_BLOCK:
+                cols = np.array(buf, dtype=np.float64).T
+                yield time.perf_counter(), MeasureChunk(cols[0].astype(bool), cols[1], cols[2], cols[3])
+                buf = []
+
+    def _start_raw_scan(self, cmd: int, packet_len: int, resp_type: int, payload: Optional[bytes] = None) -> None:
+        """
+        Arranca un scan saltándose los iteradores de la librería.
+        Reutilizamos su conexión y sus utilidades de comando/descriptor, y
+        comprobamos la salud del sensor igual que hace iter_measurments().
+        """
+        self.lidar.start_motor()
+        status, error_code = self.lidar.get_health()
+        if status == 'Error':
+            raise RPLidarException(f'RPLidar en estado de error. Código: {error_code}')
+        if payload is None:
+            self.lidar._send_cmd(bytes([cmd]))
+        else:
+            self.lidar._send_payload_cmd(bytes([cmd]), payload)
+        dsize, is_single, dtype = self.lidar._read_descriptor()
+        if dsize != packet_len or is_single or dtype != resp_type:
+            raise RPLidarException(f'Descriptor inesperado: {(dsize, is_single, dtype)}')
+
+    def _read_chunks(self, packet_len: int, max_buf_meas: int, meas_per_packet: int = 1) -> Iterable[bytes]:
+        """
+        Lee el puerto serie en bloques grandes (todo lo disponible, mínimo READ_SIZE).
+        Si se acumulan más de max_buf_meas medidas se descartan, como la librería,
+        en múltiplos del tamaño de paquete para no perder la alineación.
+        """
+        port = self.lidar._serial_port
+        max_bytes = max_buf_meas * packet_len // meas_per_packet
+        while True:
+            waiting = port.in_waiting
+            if max_buf_meas and waiting > max_bytes:
+                print(f'[WARN] Buffer serie lleno ({waiting // packet_len * meas_per_packet} medidas), descartando...')
+                port.read(waiting // packet_len * packet_len)
+                waiting = port.in_waiting
+            data = port.read(max(READ_SIZE, waiting))
+            if not data:
+                raise RPLidarException('Timeout: el sensor no envía datos (¿motor parado?)')
+            yield data
+
     def shutdown_safe(self) -> None:
         """
         Parada segura del sensor.
         SIEMPRE llamar antes de cerrar el programa para evitar quemar el motor.
         Orden obligatorio de la librería: stop() → stop_motor() → disconnect()
+        Si el puerto ya está cerrado (p. ej. tras una parada del safety_monitor)
+        no hace nada.
         """
+        port = self.lidar._serial_port
+        if port is None or not port.is_open:
+            return
         try:
             # 1. Detenemos la emisión del láser y el envío de datos
             self.lidar.stop() 
@@ -134,6 +565,8 @@ if __name__ == '__main__':
     # Configuramos los argumentos de línea de comandos para facilitar las pruebas
     ap = argparse.ArgumentParser()
     ap.add_argument('--port', required=True, help='Puerto serie del sensor')
+    ap.add_argument('--backend', choices=BACKENDS, default='rplidar', help='Backend de lectura')
+    ap.add_argument('--asyncio', action='store_true', help='Leer los frames con aframes() (asyncio)')
     args = ap.parse_args()
     
     # Instanciamos el driver usando el puerto proporcionado
@@ -141,10 +574,26 @@ if __name__ == '__main__':
     print('Diagnóstico:', d.diag())
     print('Leyendo 3 frames...')
     
+    if args.asyncio:
+        # Misma prueba desde un bucle de eventos; aframes() hace la parada segura al salir
+        from contextlib import aclosing
+
+        async def _leer_3():
+            async with aclosing(d.aframes(backend=args.backend)) as frames:
+                count = 0
+                async for fr in frames:
+                    print(f' Frame {count}: {len(fr)} puntos, t={fr.t:.2f}')
+                    count += 1
+                    if count >= 3:
+                        break
+
+        asyncio.run(_leer_3())
+        raise SystemExit(0)
+
     count = 0
     # Probamos la lectura en vivo
-    for fr in d.frames():
-        print(f' Frame {count}: {len(fr.pts)} puntos, t={fr.t:.2f}')
+    for fr in d.frames(backend=args.backend):
+        print(f' Frame {count}: {len(fr)} puntos, t={fr.t:.2f}')
         count += 1
         if count >= 3:
             break # Paramos tras 3 vueltas para probar que funciona
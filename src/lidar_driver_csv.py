@@ -7,20 +7,53 @@ Formato del CSV (header obligatorio):
 Uso:
  samples = read_scan_csv('data/scan_720.csv')
  print(dataset_health(samples))
+Lectura por bloques (grabaciones largas, memoria constante):
+ for chunk in iter_scan_csv('data/scan_larga.csv', chunk_size=65536):
+  procesar(chunk.quality, chunk.angle, chunk.measure_m, chunk.ok)
+ print(dataset_health_chunks(iter_scan_csv('data/scan_larga.csv')))
 """
 from __future__ import annotations
 import csv
 from dataclasses import dataclass
-from typing import List
+from itertools import islice
+from typing import Iterable, Iterator, List
+import numpy as np
+from scan_stats import StreamStats # resumen en una pasada (dataset_health)
 # Header exacto que debe tener el CSV (no modificar)
 CSV_HEADER = ['quality', 'angle', 'measure_m', 'ok']
+# Filas por bloque en la lectura por bloques (~2 MB de columnas por bloque)
+DEFAULT_CHUNK = 65536
 @dataclass
 class LidarSample:
-  """Una muestra individual del CSV (equivale a un ScanPoint + flag ok)."""
+ """Una muestra individual del CSV (equivale a un ScanPoint + flag ok)."""
  quality: int # calidad de la medida [0-255]
  angle: float # ángulo en grados [0, 360)
  measure_m: float # distancia en metros
  ok: int # 1 = válida según el sensor, 0 = sospechosa
+@dataclass
+class ScanChunk:
+ """Bloque de muestras del CSV en columnas NumPy (misma longitud todas)."""
+ quality: np.ndarray # int64
+ angle: np.ndarray # float64, grados
+ measure_m: np.ndarray # float64, metros
+ ok: np.ndarray # int64
+ def __len__(self) -> int:
+  return len(self.quality)
+ def samples(self, mask=None) -> Iterator[LidarSample]:
+  """Filas del bloque como LidarSample (opcionalmente solo las de `mask`)."""
+  cols = (self.quality, self.angle, self.measure_m, self.ok)
+  if mask is not None:
+   cols = tuple(c[mask] for c in cols)
+  for q, a, m, o in zip(*(c.tolist() for c in cols)):
+   yield LidarSample(q, a, m, o)
+def _check_header(fieldnames) -> None:
+ """Lanza ValueError si el header no coincide exactamente con CSV_HEADER."""
+ if list(fieldnames or []) != CSV_HEADER:
+  raise ValueError(
+   f'Header inválido.\n'
+   f'Esperado: {CSV_HEADER}\n'
+   f'Recibido: {fieldnames}'
+  )
 def read_scan_csv(path: str) -> List[LidarSample]:
  """
  Lee el CSV y devuelve una lista de LidarSample.
@@ -28,49 +61,68 @@ def read_scan_csv(path: str) -> List[LidarSample]:
  """
  samples: List[LidarSample] = []
  with open(path, 'r', newline='', encoding='utf-8') as f:
- reader = csv.DictReader(f)
- if list(reader.fieldnames) != CSV_HEADER:
- raise ValueError(
- f'Header inválido.\n'
- f'Esperado: {CSV_HEADER}\n'
- f'Recibido: {reader.fieldnames}'
- )
- for row in reader:
- samples.append(LidarSample(
- quality = int(row['quality']),
- angle = float(row['angle']),
- measure_m = float(row['measure_m']),
- ok = int(row['ok']),
- ))
+  reader = csv.DictReader(f)
+  _check_header(reader.fieldnames)
+  for row in reader:
+   samples.append(LidarSample(
+    quality = int(row['quality']),
+    angle = float(row['angle']),
+    measure_m = float(row['measure_m']),
+    ok = int(row['ok']),
+   ))
  return samples
-  def dataset_health(samples: List[LidarSample]) -> dict:
+def iter_scan_csv(path: str, chunk_size: int = DEFAULT_CHUNK) -> Iterator[ScanChunk]:
+ """
+ Lee el CSV por bloques de `chunk_size` filas y los devuelve como ScanChunk.
+ Misma validación de header que read_scan_csv(), pero sin crear un dict ni
+ un LidarSample por fila: cada bloque se parsea de golpe con np.loadtxt
+ (en C), así que la memoria es constante aunque el archivo no quepa en RAM.
+ """
+ with open(path, 'r', newline='', encoding='utf-8') as f:
+  _check_header(next(csv.reader([f.readline()]), None))
+  while True:
+   lines = list(islice(f, chunk_size))
+   if not lines:
+    return
+   data = np.loadtxt(lines, delimiter=',', dtype=np.float64, ndmin=2)
+   if not len(data):
+    continue # bloque de líneas en blanco
+   yield ScanChunk(
+    quality = data[:, 0].astype(np.int64),
+    angle = np.ascontiguousarray(data[:, 1]),
+    measure_m = np.ascontiguousarray(data[:, 2]),
+    ok = data[:, 3].astype(np.int64),
+   )
+def dataset_health_chunks(chunks: Iterable[ScanChunk]) -> dict:
+ """
+ Igual que dataset_health(), pero acumulando bloque a bloque en una sola
+ pasada (para usar con iter_scan_csv sobre archivos enormes).
+ Devuelve StreamStats.summary(): count, ok_ratio, min/máx/media y además
+ desviación típica y cuantiles aproximados (p5, mediana, p95).
+ """
+ return StreamStats.from_chunks(chunks).summary()
+def dataset_health(samples: List[LidarSample]) -> dict:
  """
  Resumen estadístico del dataset, análogo a get_health() del sensor real.
+ Mismo resumen que dataset_health_chunks() (ver scan_stats.py).
  """
  n = len(samples)
- if n == 0:
- return {'count': 0}
- measures = [s.measure_m for s in samples]
- qualities = [s.quality for s in samples]
- angles = [s.angle for s in samples]
- return {
- 'count': n,
- 'ok_ratio': sum(1 for s in samples if s.ok == 1) / n,
- 'quality_min': min(qualities),
- 'quality_max': max(qualities),
- 'quality_mean': sum(qualities) / n,
- 'measure_min_m': min(measures),
- 'measure_max_m': max(measures),
- 'angle_min_deg': min(angles),
- 'angle_max_deg': max(angles),
- }
+ cols = [np.fromiter((getattr(s, k) for s in samples), dtype=np.float64, count=n) for k in CSV_HEADER]
+ return StreamStats().update(*cols).summary()
 if __name__ == '__main__':
  import argparse
  ap = argparse.ArgumentParser()
- ap.add_argument('--csv', default='data/scan_720.csv')
+ ap.add_argument('--csv', default='data/scan720.csv', help='CSV en cualquier formato de data/ (ver ingest.py)')
+ ap.add_argument('--chunk', type=int, default=DEFAULT_CHUNK, help='Filas por bloque')
  args = ap.parse_args()
- scan = read_scan_csv(args.csv)
- print('Dataset health:', dataset_health(scan))
- # TODO [Sensores]: añadir detección de outliers:
- # measure_m == 0, measure_m > 10, quality < umbral, etc.
-# Generar un informe en docs/ con las métricas y los casos problemáticos.
+ from ingest import iter_scan # detección de formato (iter_scan_csv solo lee el de referencia)
+ # Lectura por bloques: sirve igual para 720 filas que para horas de grabación
+ print('Dataset health:', dataset_health_chunks(iter_scan(args.csv, args.chunk)))
+ #detección de outliers (ver outliers.py): umbrales + mediana angular, puntos aislados y mixed pixels
+ #vuelta a vuelta: los bloques se re-cortan en fronteras de vuelta (salto de ángulo)
+ from outliers import detect_recording, iter_revolution_blocks, reason_counts
+ totales: dict = {}
+ for c in iter_revolution_blocks(iter_scan(args.csv, args.chunk)):
+  for k, v in reason_counts(detect_recording(c.quality, c.angle, c.measure_m)).items():
+   totales[k] = totales.get(k, 0) + v
+ print('Outliers por motivo:', totales)
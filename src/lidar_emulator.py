@@ -0,0 +1,310 @@
+"""
+lidar_emulator.py
+Emulador software del RPLIDAR A1M8 sobre un par pty (sin hardware).
+Propietario: LiDAR líder.
+
+Abre un pseudo-terminal y habla el protocolo serie del sensor por el lado
+"maestro", de forma que LidarDriver (y record_scan.py, view_live.py...) se
+pueden apuntar al lado "esclavo" (/dev/pts/N) sin cambiar nada:
+ - get_info (0x50), get_health (0x52)
+ - scan (0x20), force scan (0x21), scan express (0x82), stop (0x25), reset (0x40)
+ - motor (PWM 0xF0): solo se emiten medidas con el motor en marcha
+Las medidas se sintetizan a partir de un barrido grabado (data/scan720.csv)
+a la frecuencia de rotación y de muestreo pedidas, en tiempo real o más
+rápido (speed > 1, o speed = 0 para ir a la máxima velocidad posible).
+Solo funciona en sistemas POSIX (Linux/Mac).
+
+Uso:
+ python src/lidar_emulator.py --serve                  # imprime el puerto y espera
+ python src/record_scan.py --port /dev/pts/3 --seconds 5
+ python src/lidar_emulator.py --sps 8000 --hz 10 --speed 0 --backend bulk  # stress test
+ python src/lidar_emulator.py --sps 8000 --hz 10 --sector-deg 30 --bearing 90  # latencia frames vs sectores
+"""
+from __future__ import annotations
+import os
+import select
+import threading
+import time
+import tty
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from lidar_protocol import (EXPRESS_SAMPLES, EXPRESS_SCAN_BYTE, EXPRESS_TYPE, SCAN_BYTE,
+                            SCAN_TYPE, SYNC_BYTE, SYNC_BYTE2, encode_express,
+                            encode_standard, load_profile)
+
+# ── Comandos y respuestas del protocolo ──────────────────────────────
+STOP_BYTE = 0x25
+RESET_BYTE = 0x40
+FORCE_SCAN_BYTE = 0x21
+GET_INFO_BYTE = 0x50
+GET_HEALTH_BYTE = 0x52
+SET_PWM_BYTE = 0xF0
+INFO_TYPE = 0x04
+HEALTH_TYPE = 0x06
+
+DEFAULT_PROFILE = Path(__file__).resolve().parent.parent / 'data' / 'scan720.csv'
+TICK_S = 0.002        # periodo del bucle del emulador (granularidad de emisión)
+MAX_BATCH = 4096      # medidas máximas por escritura al pty
+
+
+def _descriptor(length: int, multi: bool, dtype: int) -> bytes:
+    """Descriptor de respuesta: A5 5A + longitud (30 bits) + modo (2 bits) + tipo."""
+    word = length | ((1 if multi else 0) << 30)
+    return bytes([SYNC_BYTE, SYNC_BYTE2]) + word.to_bytes(4, 'little') + bytes([dtype])
+
+
+class LidarEmulator:
+    """
+    Sensor emulado. Se usa como context manager:
+     with LidarEmulator(rotation_hz=5.5, sample_rate=2000) as emu:
+         driver = LidarDriver(emu.port)
+    """
+
+    def __init__(self, profile_csv: str = str(DEFAULT_PROFILE), rotation_hz: float = 5.5,
+                 sample_rate: float = 2000.0, speed: float = 1.0,
+                 model: int = 0x18, firmware: tuple = (1, 29), hardware: int = 7) -> None:
+        """
+        Args:
+            profile_csv: barrido de referencia del que se sacan distancias y calidades
+            rotation_hz: vueltas por segundo del motor emulado
+            sample_rate: medidas por segundo (el A1M8 llega a 8000 en express)
+            speed: factor de tiempo (1 = tiempo real, 4 = 4x, 0 = sin límite)
+            model, firmware, hardware: lo que devuelve get_info()
+        """
+        self.rotation_hz = rotation_hz
+        self.sample_rate = sample_rate
+        self.speed = speed
+        self.model, self.firmware, self.hardware = model, firmware, hardware
+        self.port: Optional[str] = None
+
+        # Una vuelta precalculada: el perfil remuestreado a la resolución pedida
+        q, a, d = load_profile(profile_csv)
+        self.points_per_rev = max(int(round(sample_rate / rotation_hz)), EXPRESS_SAMPLES)
+        self._angle = np.arange(self.points_per_rev) * (360.0 / self.points_per_rev)
+        idx = np.round(self._angle / (a[1] - a[0])).astype(int) % len(a)
+        self._quality, self._dist = q[idx], d[idx]
+
+        # Estado del sensor emulado
+        self.motor_on = False
+        self.mode: Optional[str] = None   # None (idle), 'standard' o 'express'
+        self.sent = 0                     # medidas emitidas desde el último arranque de scan
+        self.commands = []                # histórico de comandos recibidos (depuración)
+        self._t_scan = 0.0
+        self._rx = b''
+        self._tx = bytearray()
+        self._master = self._slave = -1
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ── Ciclo de vida ────────────────────────────────────────────────
+    def start(self) -> 'LidarEmulator':
+        """Crea el par pty y arranca el hilo del emulador. Devuelve self."""
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)          # sin traducción de bytes (\n, ^C...)
+        os.set_blocking(self._master, False)
+        self.port = os.ttyname(self._slave)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='lidar-emulador', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Para el hilo y cierra el pty."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        for fd in (self._master, self._slave):
+            if fd >= 0:
+                os.close(fd)
+        self._master = self._slave = -1
+
+    def __enter__(self) -> 'LidarEmulator':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # ── Bucle principal ──────────────────────────────────────────────
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            wlist = [self._master] if self._tx else []
+            r, w, _ = select.select([self._master], wlist, [], TICK_S)
+            if r:
+                try:
+                    self._rx += os.read(self._master, 4096)
+                except (BlockingIOError, OSError):
+                    pass
+                self._handle_commands()
+            self._emit_measures()
+            if self._tx:
+                try:
+                    n = os.write(self._master, self._tx)
+                    del self._tx[:n]
+                except (BlockingIOError, OSError):
+                    pass  # el cliente no lee: el pty está lleno, reintentamos
+
+    def _handle_commands(self) -> None:
+        """Interpreta los comandos completos acumulados en el buffer de entrada."""
+        while True:
+            i = self._rx.find(bytes([SYNC_BYTE]))
+            if i < 0:
+                self._rx = b''
+                return
+            self._rx = self._rx[i:]
+            if len(self._rx) < 2:
+                return
+            cmd = self._rx[1]
+            payload = b''
+            if cmd & 0x80:
+                # Comandos con payload: A5 cmd size payload checksum
+                if len(self._rx) < 3 or len(self._rx) < 4 + self._rx[2]:
+                    return
+                size = self._rx[2]
+                payload = self._rx[3:3 + size]
+                self._rx = self._rx[4 + size:]
+            else:
+                self._rx = self._rx[2:]
+            self.commands.append(cmd)
+            self._on_command(cmd, payload)
+
+    def _on_command(self, cmd: int, payload: bytes) -> None:
+        if cmd == GET_INFO_BYTE:
+            serial = bytes(range(16))
+            body = bytes([self.model, self.firmware[1], self.firmware[0], self.hardware]) + serial
+            self._tx += _descriptor(len(body), False, INFO_TYPE) + body
+        elif cmd == GET_HEALTH_BYTE:
+            self._tx += _descriptor(3, False, HEALTH_TYPE) + bytes([0, 0, 0])  # 'Good', código 0
+        elif cmd in (SCAN_BYTE, FORCE_SCAN_BYTE):
+            self._tx += _descriptor(5, True, SCAN_TYPE)
+            self._start_scan('standard')
+        elif cmd == EXPRESS_SCAN_BYTE:
+            self._tx += _descriptor(84, True, EXPRESS_TYPE)
+            self._start_scan('express')
+        elif cmd in (STOP_BYTE, RESET_BYTE):
+            self.mode = None
+            self._tx.clear()  # lo que no se haya enviado ya no sale
+        elif cmd == SET_PWM_BYTE and len(payload) == 2:
+            self.motor_on = int.from_bytes(payload, 'little') > 0
+
+    def _start_scan(self, mode: str) -> None:
+        self.mode = mode
+        self.sent = 0
+        self._t_scan = time.perf_counter()
+
+    def bearing_age(self, bearing_deg: float, t: Optional[float] = None) -> float:
+        """
+        Segundos desde que el emulador emitió por última vez la medida del
+        rumbo bearing_deg (según su reloj de emisión, no lo que ya se haya
+        escrito al pty). Sirve para medir cuánto tarda un dato en llegar al
+        consumidor: edad del rumbo en el momento de recibirlo.
+        Args:
+            t: time.perf_counter() de referencia (None = ahora)
+        """
+        if not self.speed:
+            raise ValueError('bearing_age() necesita reloj real (speed > 0)')
+        t = time.perf_counter() if t is None else t
+        rate = self.sample_rate * self.speed
+        now = int((t - self._t_scan) * rate)
+        k = int(round(bearing_deg / 360.0 * self.points_per_rev)) % self.points_per_rev
+        last = now - (now - k) % self.points_per_rev  # último índice emitido con ese rumbo
+        return (t - self._t_scan) - last / rate
+
+    # ── Generación de medidas ────────────────────────────────────────
+    def _emit_measures(self) -> None:
+        """Añade al buffer de salida las medidas que "tocan" según el reloj."""
+        if self.mode is None or not self.motor_on or len(self._tx) > 64 * 1024:
+            return
+        if self.speed:
+            due = int((time.perf_counter() - self._t_scan) * self.sample_rate * self.speed)
+        else:
+            due = self.sent + MAX_BATCH  # sin límite: tanto como acepte el pty
+        n = min(due - self.sent, MAX_BATCH)
+        if self.mode == 'express':
+            n -= n % EXPRESS_SAMPLES  # en express se emiten cápsulas enteras
+        if n <= 0:
+            return
+        idx = np.arange(self.sent, self.sent + n) % self.points_per_rev
+        if self.mode == 'standard':
+            self._tx += encode_standard(self._quality[idx], self._angle[idx], self._dist[idx], idx == 0)
+        else:
+            caps = idx.reshape(-1, EXPRESS_SAMPLES)
+            dist = np.where(self._dist[caps] > 0x3FFF, 0, self._dist[caps])
+            self._tx += encode_express(self._angle[caps[:, 0]], dist, np.zeros(caps.shape),
+                                       first=self.sent == 0)
+        self.sent += n
+
+
+if __name__ == '__main__':
+    import argparse
+
+    ap = argparse.ArgumentParser(description='Emulador del RPLIDAR A1M8 sobre pty')
+    ap.add_argument('--csv', default=str(DEFAULT_PROFILE), help='Barrido de referencia')
+    ap.add_argument('--hz', type=float, default=5.5, help='Frecuencia de rotación (vueltas/s)')
+    ap.add_argument('--sps', type=float, default=2000.0, help='Medidas por segundo')
+    ap.add_argument('--speed', type=float, default=1.0, help='Factor de tiempo (0 = máximo)')
+    ap.add_argument('--serve', action='store_true', help='Solo emular: imprime el puerto y espera')
+    ap.add_argument('--backend', default='bulk', help='Backend de LidarDriver para el stress test')
+    ap.add_argument('--frames', type=int, default=50, help='Frames a leer en el stress test')
+    ap.add_argument('--sector-deg', type=float, default=0.0,
+                    help='Compara la edad de un rumbo al recibirlo con frames() y con sectors() de este ancho')
+    ap.add_argument('--bearing', type=float, default=90.0, help='Rumbo vigilado en la comparación (grados)')
+    args = ap.parse_args()
+
+    emu = LidarEmulator(args.csv, args.hz, args.sps, args.speed).start()
+    try:
+        if args.serve:
+            print(f'[INFO] RPLIDAR emulado en {emu.port} ({emu.points_per_rev} puntos/vuelta). Ctrl+C para salir.')
+            while True:
+                time.sleep(1.0)
+
+        from lidar_driver import LidarDriver
+        if args.sector_deg:
+            # Latencia hasta el primer dato de un rumbo: vuelta completa vs sector
+            def edades_ms(stream, contiene):
+                edades = []
+                for item in stream:
+                    if contiene(item):
+                        edades.append(emu.bearing_age(args.bearing) * 1e3)
+                        if len(edades) >= args.frames:
+                            break
+                return np.array(edades)
+
+            res = {}
+            for nombre in ('frames', 'sectors'):
+                driver = LidarDriver(emu.port)
+                try:
+                    if nombre == 'frames':
+                        res[nombre] = edades_ms(driver.frames(backend=args.backend), lambda fr: True)
+                    else:
+                        res[nombre] = edades_ms(driver.sectors(args.sector_deg, backend=args.backend),
+                                                lambda sec: sec.a0 <= args.bearing % 360.0 < sec.a1)
+                finally:
+                    driver.shutdown_safe()
+            print(f'Edad del rumbo {args.bearing:g}° al recibirlo ({args.frames} entregas, '
+                  f'backend {args.backend!r}, {args.hz:g} Hz):')
+            for nombre, e in res.items():
+                print(f' {nombre:8s} media {e.mean():6.1f} ms | p95 {np.percentile(e, 95):6.1f} ms')
+            raise SystemExit(0)
+
+        # Stress test: LidarDriver sin modificar contra el emulador
+        driver = LidarDriver(emu.port)
+        print('Diagnóstico:', driver.diag())
+        pts, edades = 0, []
+        t0 = time.perf_counter()
+        try:
+            for i, fr in enumerate(driver.frames(max_buf_meas=0, backend=args.backend)):
+                pts += len(fr)
+                edades.append(time.time() - fr.t)
+                if i + 1 >= args.frames:
+                    break
+        finally:
+            driver.shutdown_safe()
+        dt = time.perf_counter() - t0
+        print(f'{args.frames} frames en {dt:.2f} s → {args.frames / dt:.1f} frames/s, '
+              f'{pts / dt:,.0f} puntos/s (backend {args.backend!r})')
+        print(f'Medidas emitidas por el emulador: {emu.sent:,} | comandos: {[hex(c) for c in emu.commands]}')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emu.stop()
@@ -0,0 +1,681 @@
+"""
+lidar_protocol.py
+Decodificador binario del protocolo serie del RPLIDAR A1M8, vectorizado con NumPy.
+Propietario: LiDAR líder.
+
+La librería rplidar decodifica cada paquete de medida (5 bytes) en Python puro,
+uno a uno. Aquí leemos bloques grandes del puerto y decodificamos cientos de
+paquetes de golpe con numpy.frombuffer + operaciones de bits.
+
+Formato de un paquete del scan estándar (respuesta al comando 0x20):
+ byte 0: bit0 = S (inicio de vuelta), bit1 = !S, bits 2-7 = quality
+ byte 1: bit0 = C (check, siempre 1), bits 1-7 = angle_q6 (bits bajos)
+ byte 2: angle_q6 (bits altos) → angle_deg = angle_q6 / 64
+ byte 3-4: distance_q2 (little endian) → dist_mm = distance_q2 / 4
+
+Formato del scan express (comando 0x82, respuesta en cápsulas de 84 bytes):
+ byte 0: bits 4-7 = 0xA (sync1), bits 0-3 = checksum (nibble bajo)
+ byte 1: bits 4-7 = 0x5 (sync2), bits 0-3 = checksum (nibble alto)
+ byte 2-3: start_angle_q6 (15 bits) + bit 15 = S (primera cápsula tras arrancar)
+ byte 4-83: 16 cabinas de 5 bytes, cada una con 2 medidas:
+  u16 distance1 (bits 2-15 = mm, bits 0-1 = bits 4-5 de dθ1)
+  u16 distance2 (ídem para dθ2)
+  u8 bits 0-3 = bits 0-3 de dθ1, bits 4-7 = bits 0-3 de dθ2
+ dθ es un entero con signo de 6 bits en q3 (1/8 de grado). El ángulo de la
+ medida k (0..31) de la cápsula i depende de la cápsula SIGUIENTE:
+  θ_k = ω_i + AngleDiff(ω_i, ω_i+1) / 32 · k − dθ_k
+ El checksum es el XOR de los bytes 2-83.
+
+Uso:
+ dec = StandardScanDecoder()
+ start, quality, angle, dist = dec.feed(bytes_leidos)
+ python src/lidar_protocol.py                 # paridad + benchmark con el fixture
+ python src/lidar_protocol.py --make-fixtures # regenera data/fixtures/
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import List, NamedTuple, Tuple
+import numpy as np
+
+# ── Constantes del protocolo ─────────────────────────────────────────
+SYNC_BYTE = 0xA5
+SYNC_BYTE2 = 0x5A
+SCAN_BYTE = 0x20           # comando de scan estándar
+SCAN_PACKET_LEN = 5        # bytes por medida en el scan estándar
+SCAN_TYPE = 0x81           # tipo de respuesta del scan estándar
+RESYNC_LOOKAHEAD = 4       # paquetes válidos seguidos exigidos para re-alinear
+EXPRESS_SCAN_BYTE = 0x82   # comando de scan express
+EXPRESS_PACKET_LEN = 84    # bytes por cápsula express
+EXPRESS_TYPE = 0x82        # tipo de respuesta del scan express
+EXPRESS_SAMPLES = 32       # medidas por cápsula (16 cabinas x 2)
+EXPRESS_QUALITY = 0x2F     # el modo express no envía calidad; el SDK usa este valor fijo
+
+# Fixture por defecto (generado a partir de data/scan720.csv)
+FIXTURES_DIR = Path(__file__).resolve().parent.parent / 'data' / 'fixtures'
+STANDARD_FIXTURE = FIXTURES_DIR / 'standard_scan720.bin'
+EXPRESS_FIXTURE = FIXTURES_DIR / 'express_scan720.bin'
+
+
+class MeasureChunk(NamedTuple):
+    """Medidas decodificadas de un bloque de bytes, en columnas."""
+    start: np.ndarray    # bool: True si la medida abre una vuelta nueva
+    quality: np.ndarray  # uint8 [0-63]
+    angle: np.ndarray    # float64, grados [0, 360)
+    dist: np.ndarray     # float64, milímetros (0 = medida inválida)
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+
+def _empty_chunk() -> MeasureChunk:
+    return MeasureChunk(np.empty(0, bool), np.empty(0, np.uint8),
+                        np.empty(0, np.float64), np.empty(0, np.float64))
+
+
+def _concat(chunks: List[MeasureChunk]) -> MeasureChunk:
+    if not chunks:
+        return _empty_chunk()
+    if len(chunks) == 1:
+        return chunks[0]
+    return MeasureChunk(*(np.concatenate(cols) for cols in zip(*chunks)))
+
+
+def _standard_ok(pk: np.ndarray) -> np.ndarray:
+    """Comprueba los bits de control (S != !S y C == 1) de una matriz (N, 5) de paquetes."""
+    b0 = pk[:, 0]
+    return ((b0 & 1) != ((b0 >> 1) & 1)) & ((pk[:, 1] & 1) == 1)
+
+
+def decode_standard_packets(pk: np.ndarray) -> MeasureChunk:
+    """
+    Decodifica una matriz (N, 5) uint8 de paquetes YA alineados y validados.
+    Es el equivalente vectorizado de rplidar._process_scan().
+    """
+    b0 = pk[:, 0]
+    start = (b0 & 1).astype(bool)
+    quality = b0 >> 2
+    angle_q6 = (pk[:, 1] >> 1).astype(np.uint16) | (pk[:, 2].astype(np.uint16) << 7)
+    dist_q2 = pk[:, 3].astype(np.uint16) | (pk[:, 4].astype(np.uint16) << 8)
+    return MeasureChunk(start, quality, angle_q6 / 64.0, dist_q2 / 4.0)
+
+
+class StandardScanDecoder:
+    """
+    Decodificador incremental del scan estándar.
+    Se le pasan bloques de bytes tal cual llegan del puerto serie (de cualquier
+    tamaño); guarda internamente los bytes sobrantes de un paquete incompleto
+    y se re-sincroniza solo si encuentra bytes corruptos.
+    """
+
+    def __init__(self) -> None:
+        self._pending = b''   # bytes de un paquete que aún no ha llegado entero
+        self.bad_bytes = 0    # bytes descartados por pérdida de sincronía
+        self.packets = 0      # paquetes decodificados correctamente
+
+    def feed(self, data: bytes) -> MeasureChunk:
+        """
+        Decodifica todos los paquetes completos de `pending + data`.
+        Returns:
+            MeasureChunk con las medidas decodificadas (puede estar vacío).
+        """
+        buf = np.frombuffer(self._pending + bytes(data), dtype=np.uint8)
+        out: List[MeasureChunk] = []
+        pos = 0
+        while len(buf) - pos >= SCAN_PACKET_LEN:
+            n = (len(buf) - pos) // SCAN_PACKET_LEN
+            pk = buf[pos:pos + n * SCAN_PACKET_LEN].reshape(n, SCAN_PACKET_LEN)
+            ok = _standard_ok(pk)
+            if ok.all():
+                # Caso normal: todo el bloque está alineado
+                out.append(decode_standard_packets(pk))
+                pos += n * SCAN_PACKET_LEN
+                break
+            bad = int(np.argmin(ok))
+            if bad:
+                out.append(decode_standard_packets(pk[:bad]))
+                pos += bad * SCAN_PACKET_LEN
+            # Paquete corrupto: buscamos el siguiente desplazamiento desde el
+            # que varios paquetes seguidos pasan los bits de control
+            skip = self._resync(buf, pos)
+            if skip is None:
+                break  # no hay bytes suficientes para decidir; esperamos al siguiente bloque
+            self.bad_bytes += skip
+            pos += skip
+        self._pending = buf[pos:].tobytes()
+        chunk = _concat(out)
+        self.packets += len(chunk)
+        return chunk
+
+    @staticmethod
+    def _resync(buf: np.ndarray, pos: int):
+        """Nº de bytes a saltar desde `pos` para recuperar la alineación (None si faltan datos)."""
+        need = RESYNC_LOOKAHEAD * SCAN_PACKET_LEN
+        for skip in range(1, SCAN_PACKET_LEN + 1):
+            window = buf[pos + skip:pos + skip + need]
+            if len(window) < need:
+                return None
+            if _standard_ok(window.reshape(RESYNC_LOOKAHEAD, SCAN_PACKET_LEN)).all():
+                return skip
+        return SCAN_PACKET_LEN
+
+
+class RevolutionSplitter:
+    """
+    Agrupa medidas decodificadas en vueltas completas usando el bit de inicio S.
+    Equivale a rplidar.iter_scans(): descarta medidas con quality 0 o
+    distancia 0 y las vueltas con `min_len` medidas o menos.
+    """
+
+    def __init__(self, min_len: int = 5) -> None:
+        self.min_len = min_len
+        self._parts: List[MeasureChunk] = []  # trozos de la vuelta en curso
+        self._started = False                 # aún no hemos visto el primer bit S
+
+    def push(self, chunk: MeasureChunk) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Añade un bloque de medidas.
+        Returns:
+            Lista de vueltas completadas, cada una como (quality, angle, dist).
+        """
+        revs = []
+        starts = np.flatnonzero(chunk.start)
+        prev = 0
+        for i in starts:
+            if self._started:
+                self._parts.append(MeasureChunk(*(c[prev:i] for c in chunk)))
+                rev = self._close()
+                if rev is not None:
+                    revs.append(rev)
+            # La vuelta parcial anterior al primer bit S se descarta
+            self._parts = []
+            self._started = True
+            prev = i
+        if self._started:
+            self._parts.append(MeasureChunk(*(c[prev:] for c in chunk)))
+        return revs
+
+    def _close(self):
+        rev = _concat(self._parts)
+        keep = (rev.quality > 0) & (rev.dist > 0)
+        if np.count_nonzero(keep) <= self.min_len:
+            return None
+        return rev.quality[keep], rev.angle[keep], rev.dist[keep]
+
+
+class SectorAssembler:
+    """
+    Agrupa medidas decodificadas en sectores angulares fijos de cada vuelta
+    (sector k = [k, k + 1) * width_deg) y entrega cada sector en cuanto llega
+    la primera medida del siguiente, sin esperar a cerrar la vuelta.
+    Las vueltas se cuentan por el ángulo y no por el bit S: en express la
+    medida con S suele venir a ~359.6° y el ángulo oscila alrededor de 0°
+    antes y después de ella, así que cortar por S mete ángulos de 0° en el
+    último sector (y de 359° en el primero). El ángulo se desenrolla: un
+    retroceso de hasta JITTER_DEG es jitter y cualquier otro paso es un
+    avance (aunque sea de casi una vuelta, p. ej. medidas descartadas con el
+    buffer lleno). El bit S decide la vuelta: cada S cae en el cero más
+    cercano de su ángulo desenrollado y, si queda en la misma vuelta que el
+    S anterior (el salto se tomó por jitter), se suma la vuelta perdida.
+    Cada medida cae en floor(ángulo desenrollado / width_deg); la vuelta 0
+    es la del primer bit S y lo anterior se descarta.
+    El sector no retrocede: una medida con jitter hacia atrás en un borde se
+    queda en el sector en curso. Como RevolutionSplitter, se quitan las
+    medidas con quality 0 o distancia 0.
+    """
+
+    JITTER_DEG = 5.0  # retroceso máximo del ángulo entre medidas seguidas que no es un salto
+
+    def __init__(self, width_deg: float) -> None:
+        n = int(round(360.0 / width_deg))
+        if n < 1 or abs(n * width_deg - 360.0) > 1e-9:
+            raise ValueError(f'width_deg={width_deg} no divide 360°')
+        self.width = float(width_deg)
+        self.n = n
+        self._angle = None                    # último ángulo recibido (grados)
+        self._unwrapped = 0.0                 # ...y su valor desenrollado
+        self._turn = None                     # vuelta desenrollada del último bit S (None: aún sin S)
+        self._origin = 0                      # nº de sector desenrollado de la vuelta 0
+        self._key = -1                        # rev * n + sector del sector en curso
+        self._parts: List[MeasureChunk] = []  # trozos del sector en curso
+
+    def push(self, chunk: MeasureChunk) -> List[Tuple[int, int, np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Añade un bloque de medidas.
+        Returns:
+            Lista de sectores completados: (rev, sector, quality, angle, dist).
+        """
+        if not len(chunk):
+            return []
+        if self._angle is None:
+            self._angle = self._unwrapped = float(chunk.angle[0])
+        j = self.JITTER_DEG
+        step = (np.diff(np.r_[self._angle, chunk.angle]) + j) % 360.0 - j
+        unwrapped = self._unwrapped + np.cumsum(step)
+        for i in np.flatnonzero(chunk.start).tolist():
+            turn = int(round(unwrapped[i] / 360.0))
+            if self._turn is None:
+                self._origin = turn * self.n
+            elif turn <= self._turn:
+                unwrapped[i:] += (self._turn + 1 - turn) * 360.0
+                turn = self._turn + 1
+            self._turn = turn
+        self._angle, self._unwrapped = float(chunk.angle[-1]), float(unwrapped[-1])
+        if self._turn is None:
+            return []  # aún sin bit S: se descarta, como en RevolutionSplitter
+        key = np.floor(unwrapped / self.width).astype(np.int64) - self._origin
+        key = np.maximum.accumulate(np.maximum(key, self._key))
+        first = int(np.searchsorted(key, 0))  # key no decrece: lo anterior a la vuelta 0 es un prefijo
+        if first:
+            chunk = MeasureChunk(*(c[first:] for c in chunk))
+            key = key[first:]
+        if not len(chunk):
+            return []
+        sectors = []
+        prev = 0
+        for i in np.flatnonzero(np.diff(np.r_[self._key, key]) != 0):
+            if self._parts or i > prev:
+                self._parts.append(MeasureChunk(*(c[prev:i] for c in chunk)))
+                done = self._close()
+                if done is not None:
+                    sectors.append(done)
+            self._parts = []
+            self._key = int(key[i])
+            prev = i
+        self._parts.append(MeasureChunk(*(c[prev:] for c in chunk)))
+        return sectors
+
+    def _close(self):
+        if self._key < 0:
+            return None
+        part = _concat(self._parts)
+        keep = (part.quality > 0) & (part.dist > 0)
+        if not keep.any():
+            return None
+        rev, sector = divmod(self._key, self.n)
+        return rev, sector, part.quality[keep], part.angle[keep], part.dist[keep]
+
+
+# ── Scan express ─────────────────────────────────────────────────────
+
+def _express_ok(pk: np.ndarray) -> np.ndarray:
+    """Comprueba sync y checksum de una matriz (N, 84) de cápsulas."""
+    sync = ((pk[:, 0] >> 4) == 0xA) & ((pk[:, 1] >> 4) == 0x5)
+    checksum = (pk[:, 0] & 0xF) | ((pk[:, 1] & 0xF) << 4)
+    return sync & (np.bitwise_xor.reduce(pk[:, 2:], axis=1) == checksum)
+
+
+def _parse_express(pk: np.ndarray):
+    """
+    Extrae de una matriz (N, 84) de cápsulas validadas:
+    start_angle (N,) en grados, flag S (N,), dist_mm (N, 32) y dθ (N, 32) en grados.
+    """
+    start_angle = (pk[:, 2].astype(np.uint16) | ((pk[:, 3].astype(np.uint16) & 0x7F) << 8)) / 64.0
+    flag = (pk[:, 3] >> 7).astype(bool)
+    cab = pk[:, 4:].reshape(len(pk), 16, 5).astype(np.uint16)
+    d1 = cab[:, :, 0] | (cab[:, :, 1] << 8)
+    d2 = cab[:, :, 2] | (cab[:, :, 3] << 8)
+    off1 = (cab[:, :, 4] & 0xF) | ((d1 & 0x3) << 4)
+    off2 = (cab[:, :, 4] >> 4) | ((d2 & 0x3) << 4)
+    # Intercalamos las dos medidas de cada cabina: orden k = 0, 1, ..., 31
+    dist = np.stack((d1 >> 2, d2 >> 2), axis=2).reshape(len(pk), EXPRESS_SAMPLES)
+    off = np.stack((off1, off2), axis=2).reshape(len(pk), EXPRESS_SAMPLES).astype(np.int16)
+    # Extensión de signo del entero de 6 bits (q3 → grados)
+    dtheta = np.where(off >= 32, off - 64, off) / 8.0
+    return start_angle, flag, dist.astype(np.float64), dtheta
+
+
+def _express_measures(start_angle, dist, dtheta, next_start) -> MeasureChunk:
+    """
+    Calcula los ángulos de N cápsulas conociendo el ángulo inicial de la
+    cápsula siguiente a cada una (`next_start`), todo en una pasada.
+    """
+    # Incremento angular entre medidas: AngleDiff(ω_i, ω_i+1) / 32
+    inc = ((next_start - start_angle) % 360.0) / EXPRESS_SAMPLES
+    k = np.arange(EXPRESS_SAMPLES)
+    raw = start_angle[:, None] + inc[:, None] * k
+    angle = (raw - dtheta) % 360.0
+    # Nueva vuelta: el ángulo sin compensar acaba de cruzar los 360°
+    start = (raw % 360.0) < inc[:, None]
+    quality = np.where(dist > 0, EXPRESS_QUALITY, 0).astype(np.uint8)
+    return MeasureChunk(start.ravel(), quality.ravel(), angle.ravel(), dist.ravel())
+
+
+class ExpressScanDecoder:
+    """
+    Decodificador incremental del scan express (cápsulas de 84 bytes).
+    Como los ángulos de una cápsula dependen del ángulo inicial de la
+    siguiente, la última cápsula recibida se retiene hasta el próximo bloque.
+    """
+
+    def __init__(self) -> None:
+        self._pending = b''   # bytes de una cápsula incompleta
+        self._prev = None     # última cápsula válida, pendiente de decodificar
+        self.bad_bytes = 0    # bytes descartados por pérdida de sincronía
+        self.packets = 0      # cápsulas decodificadas correctamente
+
+    def feed(self, data: bytes) -> MeasureChunk:
+        """
+        Decodifica todas las cápsulas completas de `pending + data`.
+        Returns:
+            MeasureChunk con las medidas de las cápsulas cerradas (32 por cápsula).
+        """
+        buf = np.frombuffer(self._pending + bytes(data), dtype=np.uint8)
+        valid: List[np.ndarray] = []
+        pos = 0
+        while len(buf) - pos >= EXPRESS_PACKET_LEN:
+            n = (len(buf) - pos) // EXPRESS_PACKET_LEN
+            pk = buf[pos:pos + n * EXPRESS_PACKET_LEN].reshape(n, EXPRESS_PACKET_LEN)
+            ok = _express_ok(pk)
+            if ok.all():
+                valid.append(pk)
+                pos += n * EXPRESS_PACKET_LEN
+                break
+            bad = int(np.argmin(ok))
+            if bad:
+                valid.append(pk[:bad])
+                pos += bad * EXPRESS_PACKET_LEN
+            skip = self._resync(buf, pos)
+            if skip is None:
+                break
+            self.bad_bytes += skip
+            pos += skip
+        self._pending = buf[pos:].tobytes()
+
+        if self._prev is not None:
+            valid.insert(0, self._prev)
+        if not valid:
+            return _empty_chunk()
+        pk = np.concatenate(valid)
+        start_angle, flag, dist, dtheta = _parse_express(pk)
+        # El bit S marca un rearranque del scan: la cápsula anterior no tiene sucesora
+        restart = np.flatnonzero(flag[1:])
+        closable = np.ones(len(pk) - 1, dtype=bool)
+        closable[restart] = False
+        self._prev = pk[-1:].copy()
+        sel = np.flatnonzero(closable)
+        self.packets += len(sel)
+        if not len(sel):
+            return _empty_chunk()
+        return _express_measures(start_angle[sel], dist[sel], dtheta[sel], start_angle[sel + 1])
+
+    @staticmethod
+    def _resync(buf: np.ndarray, pos: int):
+        """Nº de bytes a saltar hasta la siguiente cápsula válida (None si faltan datos)."""
+        tail = buf[pos + 1:]
+        cand = np.flatnonzero(((tail[:-1] >> 4) == 0xA) & ((tail[1:] >> 4) == 0x5)) + 1
+        for c in cand:
+            pk = buf[pos + c:pos + c + EXPRESS_PACKET_LEN]
+            if len(pk) < EXPRESS_PACKET_LEN:
+                return c - 1 if c > 1 else None
+            if _express_ok(pk[None, :])[0]:
+                return int(c)
+        # Ningún candidato: conservamos solo el último byte (puede ser un sync1)
+        return max(len(buf) - pos - 1, 1) if len(buf) - pos > 1 else None
+
+
+def decode_express_scalar(raw: bytes) -> List[Tuple[bool, int, float, float]]:
+    """
+    Decodificador de referencia, cápsula a cápsula y en Python puro (como lo
+    haría una librería sin NumPy). Solo para paridad y benchmark: espera un
+    flujo ya alineado y sin errores.
+    Returns:
+        Lista de (new_scan, quality, angle_deg, dist_mm).
+    """
+    caps = []
+    for i in range(0, len(raw) - EXPRESS_PACKET_LEN + 1, EXPRESS_PACKET_LEN):
+        p = raw[i:i + EXPRESS_PACKET_LEN]
+        start_angle = (p[2] | ((p[3] & 0x7F) << 8)) / 64.0
+        meas = []
+        for c in range(4, EXPRESS_PACKET_LEN, 5):
+            d1 = p[c] | (p[c + 1] << 8)
+            d2 = p[c + 2] | (p[c + 3] << 8)
+            for d, off in ((d1, (p[c + 4] & 0xF) | ((d1 & 0x3) << 4)),
+                           (d2, (p[c + 4] >> 4) | ((d2 & 0x3) << 4))):
+                meas.append((d >> 2, (off - 64 if off >= 32 else off) / 8.0))
+        caps.append((start_angle, meas))
+    out = []
+    for (w, meas), (w_next, _) in zip(caps, caps[1:]):
+        inc = ((w_next - w) % 360.0) / EXPRESS_SAMPLES
+        for k, (d, dtheta) in enumerate(meas):
+            raw_angle = w + inc * k
+            out.append(((raw_angle % 360.0) < inc, EXPRESS_QUALITY if d else 0,
+                        (raw_angle - dtheta) % 360.0, float(d)))
+    return out
+
+
+def encode_standard(quality, angle, dist, start) -> bytes:
+    """
+    Operación inversa: codifica columnas como paquetes del scan estándar.
+    Sirve para generar fixtures y para el emulador (sin sensor).
+    quality se satura a 6 bits; angle y dist se redondean a q6 / q2.
+    """
+    quality = np.clip(np.asarray(quality), 0, 63).astype(np.uint8)
+    angle_q6 = np.round(np.asarray(angle, dtype=np.float64) * 64).astype(np.uint32) % (360 * 64)
+    dist_q2 = np.clip(np.round(np.asarray(dist, dtype=np.float64) * 4), 0, 0xFFFF).astype(np.uint32)
+    s = np.asarray(start).astype(np.uint8)
+    pk = np.empty((len(quality), SCAN_PACKET_LEN), dtype=np.uint8)
+    pk[:, 0] = (quality << 2) | ((1 - s) << 1) | s
+    pk[:, 1] = ((angle_q6 & 0x7F) << 1) | 1
+    pk[:, 2] = angle_q6 >> 7
+    pk[:, 3] = dist_q2 & 0xFF
+    pk[:, 4] = dist_q2 >> 8
+    return pk.tobytes()
+
+
+def encode_express(start_angle, dist, dtheta, first: bool = True) -> bytes:
+    """
+    Codifica cápsulas express.
+    Args:
+        start_angle: (N,) ángulo inicial de cada cápsula en grados
+        dist: (N, 32) distancias en mm (se truncan a 14 bits enteros)
+        dtheta: (N, 32) compensación angular en grados (se redondea a q3, ±4°)
+        first: marcar la primera cápsula con el bit S (inicio de scan)
+    """
+    n = len(start_angle)
+    start_q6 = np.round(np.asarray(start_angle, dtype=np.float64) * 64).astype(np.uint16) % (360 * 64)
+    dist = np.clip(np.asarray(dist, dtype=np.float64), 0, 0x3FFF).astype(np.uint16).reshape(n, 16, 2)
+    off = (np.round(np.asarray(dtheta, dtype=np.float64) * 8).astype(np.int16) & 0x3F).astype(np.uint16)
+    off = off.reshape(n, 16, 2)
+    d1 = (dist[:, :, 0] << 2) | (off[:, :, 0] >> 4)
+    d2 = (dist[:, :, 1] << 2) | (off[:, :, 1] >> 4)
+    pk = np.zeros((n, EXPRESS_PACKET_LEN), dtype=np.uint8)
+    pk[:, 2] = start_q6 & 0xFF
+    pk[:, 3] = start_q6 >> 8
+    if first and n:
+        pk[0, 3] |= 0x80
+    cab = pk[:, 4:].reshape(n, 16, 5)
+    cab[:, :, 0] = d1 & 0xFF
+    cab[:, :, 1] = d1 >> 8
+    cab[:, :, 2] = d2 & 0xFF
+    cab[:, :, 3] = d2 >> 8
+    cab[:, :, 4] = (off[:, :, 0] & 0xF) | ((off[:, :, 1] & 0xF) << 4)
+    checksum = np.bitwise_xor.reduce(pk[:, 2:], axis=1)
+    pk[:, 0] = 0xA0 | (checksum & 0xF)
+    pk[:, 1] = 0x50 | (checksum >> 4)
+    return pk.tobytes()
+
+
+def load_profile(path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Lee un barrido de referencia de data/ como columnas (quality, angle_deg, dist_mm).
+    Acepta data/scan720.csv (quality,angle_deg,distance_m,is_valid_hint).
+    Las distancias vacías (sin eco) se devuelven como 0, igual que el sensor.
+    """
+    data = np.genfromtxt(path, delimiter=',', names=True)
+    dist_mm = np.nan_to_num(data['distance_m'], nan=0.0) * 1000.0
+    return data['quality'], data['angle_deg'], dist_mm
+
+
+def express_reference(samples_per_rev: int = 1440, revs: int = 3, seed: int = 0):
+    """
+    Flujo express sintético a partir de data/scan720.csv: `revs` vueltas de
+    `samples_per_rev` medidas (más una cápsula final para cerrar la última),
+    con compensaciones dθ aleatorias. Devuelve (bytes, ángulos, distancias)
+    esperados tras decodificar, para comprobar el decodificador.
+    """
+    _, prof_a, prof_d = load_profile(str(FIXTURES_DIR.parent / 'scan720.csv'))
+    caps = samples_per_rev * revs // EXPRESS_SAMPLES + 1
+    step = 360.0 / samples_per_rev
+    start_angle = (np.arange(caps) * EXPRESS_SAMPLES * step) % 360.0
+    rng = np.random.default_rng(seed)
+    dtheta = rng.integers(-4, 5, size=(caps, EXPRESS_SAMPLES)) / 8.0
+    raw = start_angle[:, None] + step * np.arange(EXPRESS_SAMPLES)
+    angle = (raw - dtheta) % 360.0
+    # Distancia del perfil de referencia en el ángulo más cercano
+    idx = np.round(angle / (prof_a[1] - prof_a[0])).astype(int) % len(prof_a)
+    dist = np.floor(prof_d[idx])
+    dist[dist > 0x3FFF] = 0  # fuera del rango de 14 bits: el sensor no da eco
+    stream = encode_express(start_angle, dist, dtheta)
+    return stream, angle[:-1].ravel(), dist[:-1].ravel()
+
+
+def make_fixtures() -> None:
+    """Genera los fixtures binarios a partir de data/scan720.csv."""
+    q, a, d = load_profile(str(FIXTURES_DIR.parent / 'scan720.csv'))
+    revs = 3
+    start = np.zeros(len(a) * revs, dtype=bool)
+    start[::len(a)] = True
+    stream = encode_standard(np.tile(q, revs), np.tile(a, revs), np.tile(d, revs), start)
+    # Dos bytes basura delante: simula conectarse con el sensor ya emitiendo
+    FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+    STANDARD_FIXTURE.write_bytes(b'\x3c\x01' + stream)
+    print(f'[OK] {STANDARD_FIXTURE} ({revs} vueltas, {len(start)} paquetes)')
+    stream, angle, _ = express_reference()
+    # Tres bytes basura delante para ejercitar la re-sincronización
+    EXPRESS_FIXTURE.write_bytes(b'\xa5\x5a\x54' + stream)
+    print(f'[OK] {EXPRESS_FIXTURE} ({len(stream) // EXPRESS_PACKET_LEN} cápsulas, {len(angle)} medidas)')
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    from rplidar import _process_scan
+
+    ap = argparse.ArgumentParser(description='Paridad y benchmark del decodificador binario')
+    ap.add_argument('--fixture', default=str(STANDARD_FIXTURE))
+    ap.add_argument('--express-fixture', default=str(EXPRESS_FIXTURE))
+    ap.add_argument('--make-fixtures', action='store_true', help='Regenerar data/fixtures/')
+    ap.add_argument('--repeat', type=int, default=20, help='Repeticiones del fixture en el benchmark')
+    args = ap.parse_args()
+
+    if args.make_fixtures:
+        make_fixtures()
+        raise SystemExit(0)
+
+    raw = Path(args.fixture).read_bytes()
+
+    # 1. Paridad contra la librería oficial, paquete a paquete
+    dec = StandardScanDecoder()
+    # Lo alimentamos en trozos irregulares para ejercitar los bytes pendientes
+    chunks = [dec.feed(raw[i:i + 777]) for i in range(0, len(raw), 777)]
+    got = _concat(chunks)
+    aligned = raw[dec.bad_bytes:]
+    ref = [_process_scan(aligned[i:i + 5]) for i in range(0, len(aligned) - 4, 5)]
+    assert len(ref) == len(got), (len(ref), len(got))
+    assert got.start.tolist() == [r[0] for r in ref]
+    assert got.quality.tolist() == [r[1] for r in ref]
+    assert got.angle.tolist() == [r[2] for r in ref]
+    assert got.dist.tolist() == [r[3] for r in ref]
+    revs = RevolutionSplitter().push(got)
+    print(f'Paridad OK: {len(got)} medidas, {dec.bad_bytes} bytes de resync, '
+          f'{len(revs)} vueltas cerradas')
+
+    def check_sectors(got: MeasureChunk, revs, width: float = 30.0, step: int = 333) -> str:
+        """
+        Sectores (en trozos irregulares): solo ángulos de su rango (salvo jitter
+        hacia atrás en el borde), vueltas completas y el mismo flujo de medidas
+        que las vueltas por bit S, en el mismo orden. Con un hueco de ~10° a
+        ~300° en la vuelta 1 (buffer lleno) cada medida que queda va a la misma
+        vuelta y sector que sin hueco.
+        """
+        def assemble(chunk: MeasureChunk):
+            asm = SectorAssembler(width)
+            secs = [sec for i in range(0, len(chunk), step)
+                    for sec in asm.push(MeasureChunk(*(c[i:i + step] for c in chunk)))]
+            for r, k, q, a, d in secs:
+                off = (a - k * width) % 360.0
+                assert np.all((off < width) | (off > 359.0)), (r, k, a.min(), a.max())
+            return asm, secs
+
+        asm, secs = assemble(got)
+        closed = [r for r, k, *_ in secs if r < secs[-1][0]]
+        assert closed and all(closed.count(r) == asm.n for r in set(closed)), closed
+        flat = np.concatenate([a for q, a, d in revs])
+        mine = np.concatenate([sec[3] for sec in secs])
+        head = int(np.flatnonzero(flat == mine[0])[0])  # cabeza de la vuelta 0 (~360°, descartada)
+        m = min(len(mine), len(flat) - head)
+        assert head < 8 and m > len(flat) - len(revs[-1][1]) and np.array_equal(mine[:m], flat[head:head + m])
+
+        # Hueco: la distancia pasa a ser el índice de la medida para seguirla
+        tag = MeasureChunk(got.start, got.quality, got.angle,
+                           np.where(got.dist > 0, np.arange(1, len(got) + 1), 0).astype(np.float64))
+        s1 = int(np.flatnonzero(got.start)[1])
+        i0 = s1 + int(np.argmax((got.angle[s1:] > 10.0) & (got.angle[s1:] < 90.0)))
+        i1 = i0 + int(np.argmax(got.angle[i0:] > 300.0))
+        labels = []
+        for chunk in (tag, MeasureChunk(*(np.r_[c[:i0], c[i1:]] for c in tag))):
+            gap_secs = assemble(chunk)[1]
+            labels.append((np.concatenate([np.full(len(d), r * asm.n + k) for r, k, q, a, d in gap_secs]),
+                           np.concatenate([d for *_, d in gap_secs])))
+        (key, idx), (key_gap, idx_gap) = labels
+        kept = (idx <= i0) | (idx > i1)
+        assert np.array_equal(idx[kept], idx_gap) and np.array_equal(key[kept], key_gap)
+        return (f'{len(secs)} sectores de {width:g}°, {len(set(closed))} vueltas con sus {asm.n} sectores, '
+                f'hueco de {i1 - i0} medidas')
+
+    print('Sectores OK:', check_sectors(got, revs))
+
+    # 2. Benchmark: medidas/s con cada camino (sin puerto serie de por medio)
+    stream = raw[dec.bad_bytes:] * args.repeat
+    n_meas = len(stream) // SCAN_PACKET_LEN
+
+    t0 = time.perf_counter()
+    scan, n_scans = [], 0
+    for i in range(0, len(stream), SCAN_PACKET_LEN):
+        # Lo mismo que hacen iter_measurments() + iter_scans() por cada paquete
+        new_scan, quality, angle, distance = _process_scan(stream[i:i + SCAN_PACKET_LEN])
+        if new_scan:
+            n_scans += len(scan) > 5
+            scan = []
+        if quality > 0 and distance > 0:
+            scan.append((quality, angle, distance))
+    t_lib = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    dec, splitter, n_revs = StandardScanDecoder(), RevolutionSplitter(), 0
+    for i in range(0, len(stream), 4096):
+        n_revs += len(splitter.push(dec.feed(stream[i:i + 4096])))
+    t_np = time.perf_counter() - t0
+
+    print(f'rplidar (_process_scan): {n_meas / t_lib:12,.0f} medidas/s')
+    print(f'NumPy (bloques de 4 KB): {n_meas / t_np:12,.0f} medidas/s  ({t_lib / t_np:.0f}x)')
+
+    # 3. Scan express: paridad con la referencia escalar y con los valores generados
+    raw = Path(args.express_fixture).read_bytes()
+    stream, exp_angle, exp_dist = express_reference()
+    assert raw.endswith(stream), 'el fixture express no coincide con express_reference()'
+    dec = ExpressScanDecoder()
+    got = _concat([dec.feed(raw[i:i + 500]) for i in range(0, len(raw), 500)])
+    ref = decode_express_scalar(raw[dec.bad_bytes:])
+    assert len(got) == len(ref) == len(exp_angle), (len(got), len(ref), len(exp_angle))
+    assert got.start.tolist() == [r[0] for r in ref]
+    assert np.allclose(got.angle, [r[2] for r in ref]) and got.dist.tolist() == [r[3] for r in ref]
+    err = np.abs((got.angle - exp_angle + 180.0) % 360.0 - 180.0)
+    assert err.max() < 1e-9 and np.array_equal(got.dist, exp_dist)
+    revs = RevolutionSplitter().push(got)
+    print(f'Paridad express OK: {len(got)} medidas, {dec.bad_bytes} bytes de resync, '
+          f'{len(revs)} vueltas cerradas ({len(revs[0][0]) if revs else 0} puntos/vuelta)')
+    print('Sectores express OK:', check_sectors(got, revs, step=200))
+
+    stream = stream * args.repeat
+    n_meas = (len(stream) // EXPRESS_PACKET_LEN - 1) * EXPRESS_SAMPLES
+    t0 = time.perf_counter()
+    decode_express_scalar(stream)
+    t_py = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    dec = ExpressScanDecoder()
+    for i in range(0, len(stream), 4200):
+        dec.feed(stream[i:i + 4200])
+    t_np = time.perf_counter() - t0
+    print(f'Express Python puro:     {n_meas / t_py:12,.0f} medidas/s')
+    print(f'Express NumPy (4.2 KB):  {n_meas / t_np:12,.0f} medidas/s  ({t_py / t_np:.0f}x)')
@@ -0,0 +1,317 @@
+"""
+live_renderer.py
+Render en tiempo real con blitting de matplotlib para view_live / view_live_csv.
+Propietario: Visión Artificial.
+
+fig.canvas.draw() redibuja en cada frame ejes, cuadrícula, leyenda y textos,
+aunque no cambien: con eso no se pasa de ~8 Hz. Con blitting:
+ - el fondo estático (todo lo que no cambia) se dibuja una vez y se guarda
+   como imagen (copy_from_bbox)
+ - en cada frame se restaura esa imagen y solo se dibujan encima los artistas
+   dinámicos (scatter del frame, texto de información) → canvas.blit()
+ - si la ventana cambia de tamaño, matplotlib redibuja todo y el fondo se
+   vuelve a capturar solo (evento 'draw_event')
+Para nubes que solo crecen (modo --animate de view_live_csv) IncrementalScatter
+"hornea" cada bloque nuevo en el fondo: cada paso cuesta lo que el bloque, no
+lo que toda la nube acumulada.
+El renderer mide los FPS conseguidos y el tiempo de dibujo por frame y los
+añade al texto de información; FrameAgeMeter mide la edad de lo que se ve
+(captura → píxeles) en ms y en vueltas del sensor.
+
+Uso:
+ scat = ax.scatter([], [], s=4)
+ hud = ax.text(...)
+ renderer = BlitRenderer(fig, [scat], hud=hud)
+ scat.set_offsets(xy); renderer.render('Frame: 12')
+ python src/live_renderer.py     # compara draw() completo vs blitting (sin ventana)
+"""
+from __future__ import annotations
+import time
+from typing import Callable, List, Optional, Sequence
+import numpy as np
+
+FPS_SMOOTHING = 0.1  # peso de la última medida en la media móvil de FPS y ms
+
+
+class BlitRenderer:
+    """Redibuja solo los artistas dinámicos sobre un fondo cacheado."""
+
+    def __init__(self, fig, dynamic: Sequence = (), hud=None, show_stats: bool = True) -> None:
+        """
+        Args:
+            fig: figura de matplotlib
+            dynamic: artistas que cambian en cada frame (scatter, líneas...)
+            hud: artista de texto para la información (se redibuja siempre)
+            show_stats: añadir FPS y ms de dibujo al texto del hud
+        """
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.hud = hud
+        self.show_stats = show_stats
+        self.blit = bool(getattr(self.canvas, 'supports_blit', False))
+        self._dynamic: List = []
+        self._on_background: List[Callable[[], None]] = []
+        self._bg = None
+        self._saving = False
+        for artist in dynamic:
+            self.add(artist)
+        if hud is not None:
+            hud.set_animated(self.blit)
+        # Medidas
+        self.frames = 0
+        self.fps = 0.0
+        self.draw_ms = 0.0
+        self._t_last: Optional[float] = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def add(self, artist) -> None:
+        """Registra un artista dinámico (se excluye del fondo y se redibuja en cada frame)."""
+        artist.set_animated(self.blit)
+        self._dynamic.append(artist)
+
+    def on_background(self, fn: Callable[[], None]) -> None:
+        """Registra una función que dibuja contenido persistente encima del fondo tras cada redibujado completo."""
+        self._on_background.append(fn)
+
+    def _on_draw(self, event) -> None:
+        """Tras un redibujado completo (inicio, resize...): capturar el fondo de nuevo."""
+        if not self.blit or self._saving or (event is not None and event.canvas is not self.canvas):
+            return
+        for fn in self._on_background:
+            fn()
+        self._bg = self.canvas.copy_from_bbox(self.fig.bbox)
+
+    def _ensure_background(self) -> None:
+        if self._bg is None:
+            self.canvas.draw()  # dispara _on_draw
+
+    def bake(self, artist) -> None:
+        """
+        Dibuja un artista y lo incorpora al fondo cacheado: a partir de ahora
+        sale "gratis" en cada frame (para contenido que ya no va a cambiar).
+        """
+        if not self.blit:
+            return
+        self._ensure_background()
+        self.canvas.restore_region(self._bg)
+        self.fig.draw_artist(artist)
+        self._bg = self.canvas.copy_from_bbox(self.fig.bbox)
+
+    def render(self, text: Optional[str] = None) -> None:
+        """Pinta un frame: fondo cacheado + artistas dinámicos + texto (y procesa eventos GUI)."""
+        t0 = time.perf_counter()
+        if self.hud is not None and text is not None:
+            if self.show_stats:
+                text = f'{text}\n{self.fps:.1f} FPS | dibujo {self.draw_ms:.1f} ms'
+            self.hud.set_text(text)
+        if self.blit:
+            self._ensure_background()
+            self.canvas.restore_region(self._bg)
+            for artist in self._dynamic:
+                self.fig.draw_artist(artist)
+            if self.hud is not None:
+                self.fig.draw_artist(self.hud)
+            self.canvas.blit(self.fig.bbox)
+        else:
+            self.canvas.draw()
+        self.canvas.flush_events()
+        t1 = time.perf_counter()
+        self._measure(t0, t1)
+
+    def _measure(self, t0: float, t1: float) -> None:
+        ms = (t1 - t0) * 1e3
+        self.draw_ms = ms if self.frames == 0 else self.draw_ms + FPS_SMOOTHING * (ms - self.draw_ms)
+        if self._t_last is not None and t1 > self._t_last:
+            fps = 1.0 / (t1 - self._t_last)
+            self.fps = fps if self.fps == 0 else self.fps + FPS_SMOOTHING * (fps - self.fps)
+        self._t_last = t1
+        self.frames += 1
+
+    def savefig(self, path: str, **kwargs) -> None:
+        """
+        Guarda una captura completa (savefig sí dibuja los artistas animados).
+        El redibujado de savefig no debe tomarse como fondo nuevo: lo ignoramos
+        y el fondo se vuelve a capturar en el siguiente frame.
+        """
+        self._saving = True
+        try:
+            for fn in self._on_background:
+                fn()  # sincroniza el contenido persistente (p. ej. la nube acumulada)
+            self.fig.savefig(path, **kwargs)
+        finally:
+            self._saving = False
+            self._bg = None
+
+    def stats(self) -> dict:
+        return {'frames': self.frames, 'fps': round(self.fps, 1), 'draw_ms': round(self.draw_ms, 2),
+                'blit': self.blit}
+
+
+class FrameAgeMeter:
+    """
+    Edad extremo a extremo de lo que se ve: desde que el driver completa el
+    frame (ScanFrame.t) hasta que sus píxeles están en pantalla. También
+    estima el periodo de vuelta del sensor para expresar la edad en vueltas.
+    """
+
+    def __init__(self) -> None:
+        self.frames = 0        # frames mostrados
+        self.age_ms = 0.0      # edad del último frame mostrado
+        self.max_age_ms = 0.0
+        self.period_s = 0.0    # periodo de vuelta estimado (media móvil)
+        self.stale = 0         # frames mostrados con más de una vuelta de edad
+        self._t_prev: Optional[float] = None
+        self._dropped_prev = 0
+
+    def shown(self, t_capture: float, dropped: int = 0) -> float:
+        """
+        Llamar justo después de pintar un frame.
+        Args:
+            t_capture: ScanFrame.t del frame pintado (time.time())
+            dropped: contador acumulado de frames saltados (ring.dropped)
+        Returns:
+            Edad del frame en ms.
+        """
+        self.age_ms = (time.time() - t_capture) * 1e3
+        self.max_age_ms = max(self.max_age_ms, self.age_ms)
+        if self._t_prev is not None and t_capture > self._t_prev:
+            # Entre dos frames mostrados hay 1 + (saltados entre medias) vueltas
+            period = (t_capture - self._t_prev) / (1 + dropped - self._dropped_prev)
+            self.period_s = period if self.period_s == 0 else \
+                self.period_s + FPS_SMOOTHING * (period - self.period_s)
+        self._t_prev, self._dropped_prev = t_capture, dropped
+        if self.period_s and self.age_ms > self.period_s * 1e3:
+            self.stale += 1
+        self.frames += 1
+        return self.age_ms
+
+    @property
+    def age_revs(self) -> float:
+        """Edad del último frame en vueltas del sensor (0 si aún no se conoce el periodo)."""
+        return self.age_ms / (self.period_s * 1e3) if self.period_s else 0.0
+
+    def text(self) -> str:
+        return f'Edad: {self.age_ms:.0f} ms ({self.age_revs:.2f} vueltas, máx. {self.max_age_ms:.0f} ms)'
+
+    def stats(self) -> dict:
+        return {'frames': self.frames, 'age_ms': round(self.age_ms, 1),
+                'max_age_ms': round(self.max_age_ms, 1), 'period_ms': round(self.period_s * 1e3, 1),
+                'stale': self.stale}
+
+
+class IncrementalScatter:
+    """
+    Nube de puntos que solo crece. Cada extend() dibuja únicamente los puntos
+    nuevos y los hornea en el fondo del renderer; la nube completa vive en un
+    buffer NumPy preasignado (sin listas) y solo se vuelve a dibujar entera si
+    matplotlib redibuja la figura (resize, savefig...).
+    """
+
+    def __init__(self, ax, renderer: BlitRenderer, capacity: int = 1024, **scatter_kw) -> None:
+        self.renderer = renderer
+        self._buf = np.empty((max(capacity, 1), 2), dtype=np.float64)
+        self.n = 0
+        # _all: toda la nube (redibujados completos); _new: solo el último bloque
+        self._all = ax.scatter([], [], **scatter_kw)
+        self._new = ax.scatter([], [], **{k: v for k, v in scatter_kw.items() if k != 'label'})
+        self._all.set_animated(renderer.blit)
+        self._new.set_animated(True)
+        renderer.on_background(self._draw_all)
+        if not renderer.blit:
+            renderer.add(self._all)  # sin blitting: la nube entera se redibuja cada vez
+
+    @property
+    def artist(self):
+        """Artista con la nube completa (para leyendas)."""
+        return self._all
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """Vista de los puntos acumulados (n×2)."""
+        return self._buf[:self.n]
+
+    def extend(self, x, y) -> None:
+        """Añade un bloque de puntos y lo dibuja sobre el fondo (coste proporcional al bloque)."""
+        k = len(x)
+        if self.n + k > len(self._buf):
+            grown = np.empty((max(2 * len(self._buf), self.n + k), 2), dtype=np.float64)
+            grown[:self.n] = self._buf[:self.n]
+            self._buf = grown
+        self._buf[self.n:self.n + k, 0] = x
+        self._buf[self.n:self.n + k, 1] = y
+        self.n += k
+        if self.renderer.blit:
+            self._new.set_offsets(self._buf[self.n - k:self.n])
+            self.renderer.bake(self._new)
+            self._new.set_offsets(np.empty((0, 2)))  # ya está en el fondo
+        else:
+            self._all.set_offsets(self.offsets)
+
+    def _draw_all(self) -> None:
+        self._all.set_offsets(self.offsets)
+        if self.renderer.blit and not self.renderer._saving:
+            self.renderer.fig.draw_artist(self._all)
+
+
+if __name__ == '__main__':
+    # Comparativa sin ventana (backend Agg): draw() completo vs blitting,
+    # con la misma figura que view_live y frames sintéticos de una vuelta.
+    import argparse
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    ap = argparse.ArgumentParser(description='Benchmark del render de view_live')
+    ap.add_argument('--frames', type=int, default=100)
+    ap.add_argument('--points', type=int, default=1454, help='Puntos por frame')
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    ang = np.linspace(0, 2 * np.pi, args.points, endpoint=False)
+
+    def figura():
+        fig, ax = plt.subplots(figsize=(7, 7))
+        ax.set_aspect('equal', 'box')
+        ax.set_xlim(-6, 6)
+        ax.set_ylim(-6, 6)
+        ax.set_title('RPLIDAR A1M8 — Vista en tiempo real')
+        ax.grid(True, alpha=0.3)
+        ax.plot(0, 0, 'r^', markersize=10, label='Sensor')
+        ax.legend()
+        scat = ax.scatter([], [], s=4, c='cyan', alpha=0.8)
+        hud = ax.text(-5.9, 5.7, '', fontsize=9, color='white',
+                      bbox=dict(boxstyle='round', facecolor='black', alpha=0.5))
+        return fig, ax, scat, hud
+
+    resultados = {}
+    for modo in ('draw', 'blit'):
+        fig, ax, scat, hud = figura()
+        renderer = BlitRenderer(fig, [scat], hud=hud) if modo == 'blit' else None
+        t0 = time.perf_counter()
+        for i in range(args.frames):
+            r = 3 + rng.normal(0, 0.05, args.points)
+            scat.set_offsets(np.c_[r * np.cos(ang), r * np.sin(ang)])
+            if renderer is not None:
+                renderer.render(f'Frame: {i}')
+            else:
+                hud.set_text(f'Frame: {i}')
+                fig.canvas.draw()
+                fig.canvas.flush_events()
+        resultados[modo] = (time.perf_counter() - t0) / args.frames * 1e3
+        plt.close(fig)
+        print(f'{modo:5}: {resultados[modo]:6.2f} ms/frame → {1e3 / resultados[modo]:6.1f} FPS máx.'
+              + (f' | {renderer.stats()}' if renderer is not None else ''))
+    print(f'Blitting {resultados["draw"] / resultados["blit"]:.1f}x más rápido')
+
+    # Nube acumulada (view_live_csv --animate): coste por paso con 20 puntos nuevos
+    fig, ax, _, hud = figura()
+    renderer = BlitRenderer(fig, hud=hud)
+    trail = IncrementalScatter(ax, renderer, s=6, c='cyan')
+    tiempos = []
+    for i in range(0, 20000, 20):
+        t0 = time.perf_counter()
+        trail.extend(rng.uniform(-5, 5, 20), rng.uniform(-5, 5, 20))
+        renderer.render(f'Puntos: {trail.n}')
+        tiempos.append(time.perf_counter() - t0)
+    print(f'Incremental: {np.mean(tiempos[:50]) * 1e3:.2f} ms/paso al principio, '
+          f'{np.mean(tiempos[-50:]) * 1e3:.2f} ms/paso con {trail.n} puntos')
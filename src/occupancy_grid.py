@@ -0,0 +1,274 @@
+"""
+occupancy_grid.py
+Mapa de ocupación 2D incremental (log-odds) alimentado con ScanFrames.
+Propietario: Computación.
+
+En lugar de apilar puntos en matplotlib (inservible tras unos miles de
+frames), cada barrido actualiza una rejilla NumPy de log-odds:
+ - celdas atravesadas por cada rayo (sensor → punto): libres (l_free)
+ - celda del punto medido: ocupada (l_occ)
+ - saturación en [l_min, l_max] para que el mapa pueda corregirse
+El trazado de rayos está vectorizado: todos los rayos del frame se muestrean
+a paso de una celda de golpe (np.repeat + aritmética de índices), y cada
+celda libre se actualiza una sola vez por frame aunque la crucen varios rayos.
+
+La rejilla crece sola por teselas (tile_cells x tile_cells celdas) cuando el
+sensor o los puntos salen de ella, así que no hace falta conocer el tamaño
+del entorno de antemano. Celda (i, j) = fila y, columna x; las coordenadas
+de mundo de la celda [0, 0] están en `origin`.
+
+La pose del sensor es (x_m, y_m, theta_rad) en el marco del mapa; los
+puntos de entrada están en el marco del sensor (como los da polar_to_xy).
+
+Uso:
+ grid = OccupancyGrid(resolution_m=0.05)
+ for fr in driver.frames():
+     grid.update_frame(fr, pose=(0.0, 0.0, 0.0))
+ grid.save('docs/mapa.npz')
+ grid = OccupancyGrid.load('docs/mapa.npz')
+ plt.imshow(grid.probability(), origin='lower', extent=grid.extent(), cmap='gray_r')
+ python src/occupancy_grid.py --png docs/capturas/occupancy.png
+"""
+from __future__ import annotations
+from typing import Optional, Tuple
+import numpy as np
+from lidar_processing import DIST_MAX_M, DIST_MIN_M, QUALITY_MIN, project_xy
+
+Pose = Tuple[float, float, float]  # (x_m, y_m, theta_rad)
+
+# Valores por defecto del modelo inverso del sensor (log-odds)
+L_OCC = 0.85    # ≈ p 0.70 por impacto
+L_FREE = -0.40  # ≈ p 0.40 por paso de rayo
+L_MIN = -4.0
+L_MAX = 4.0
+GRID_FORMAT = 1
+
+
+class OccupancyGrid:
+    """Rejilla de log-odds que crece por teselas; 0 = desconocido."""
+
+    def __init__(self, resolution_m: float = 0.05, tile_cells: int = 64,
+                 l_occ: float = L_OCC, l_free: float = L_FREE,
+                 l_min: float = L_MIN, l_max: float = L_MAX,
+                 max_range_m: float = DIST_MAX_M) -> None:
+        """
+        Args:
+            resolution_m: lado de una celda
+            tile_cells: la rejilla crece en múltiplos de tile_cells celdas por lado
+            l_occ, l_free: incremento de log-odds por impacto / por paso de rayo
+            l_min, l_max: saturación de log-odds
+            max_range_m: los puntos más lejanos no se integran
+        """
+        if not l_min < 0 < l_max:
+            raise ValueError('se necesita l_min < 0 < l_max')
+        self.resolution = float(resolution_m)
+        self.tile = int(tile_cells)
+        self.l_occ, self.l_free = float(l_occ), float(l_free)
+        self.l_min, self.l_max = float(l_min), float(l_max)
+        self.max_range = float(max_range_m)
+        self.logodds = np.zeros((0, 0), dtype=np.float32)
+        self._origin_cell = np.zeros(2, dtype=np.int64)  # (col, fila) de mundo de la celda [0, 0]
+        self.updates = 0
+
+    # ── Geometría ────────────────────────────────────────────────────
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.logodds.shape
+
+    @property
+    def origin(self) -> Tuple[float, float]:
+        """Coordenadas de mundo (m) de la esquina inferior izquierda de la celda [0, 0]."""
+        return (float(self._origin_cell[0]) * self.resolution, float(self._origin_cell[1]) * self.resolution)
+
+    def extent(self) -> Tuple[float, float, float, float]:
+        """(x_min, x_max, y_min, y_max) en metros, para imshow(origin='lower')."""
+        x0, y0 = self.origin
+        h, w = self.shape
+        return (x0, x0 + w * self.resolution, y0, y0 + h * self.resolution)
+
+    def world_to_cell(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(fila, col) de la rejilla actual para puntos de mundo (pueden caer fuera)."""
+        col = np.floor(np.asarray(x) / self.resolution).astype(np.int64) - self._origin_cell[0]
+        row = np.floor(np.asarray(y) / self.resolution).astype(np.int64) - self._origin_cell[1]
+        return row, col
+
+    def _ensure(self, cx_min: int, cx_max: int, cy_min: int, cy_max: int) -> None:
+        """Amplía la rejilla (por teselas) para cubrir las celdas de mundo dadas (inclusive)."""
+        t = self.tile
+        h, w = self.shape
+        ox, oy = (int(v) for v in self._origin_cell)
+        if h and w and ox <= cx_min and cx_max < ox + w and oy <= cy_min and cy_max < oy + h:
+            return
+        if h and w:
+            cx_min, cy_min = min(cx_min, ox), min(cy_min, oy)
+            cx_max, cy_max = max(cx_max, ox + w - 1), max(cy_max, oy + h - 1)
+        # Bordes alineados a teselas de mundo: crecer nunca mueve las celdas existentes
+        nx0, ny0 = (cx_min // t) * t, (cy_min // t) * t
+        nx1, ny1 = (cx_max // t + 1) * t, (cy_max // t + 1) * t
+        grown = np.zeros((ny1 - ny0, nx1 - nx0), dtype=np.float32)
+        if h and w:
+            grown[oy - ny0:oy - ny0 + h, ox - nx0:ox - nx0 + w] = self.logodds
+        self.logodds = grown
+        self._origin_cell[:] = (nx0, ny0)
+
+    # ── Actualización ────────────────────────────────────────────────
+    def update(self, x: np.ndarray, y: np.ndarray, pose: Pose = (0.0, 0.0, 0.0)) -> None:
+        """
+        Integra un barrido de puntos ya filtrados.
+        Args:
+            x, y: impactos en el marco del sensor (m), p. ej. de filter_and_project_batch
+            pose: (x_m, y_m, theta_rad) del sensor en el marco del mapa
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        keep = np.hypot(x, y) <= self.max_range
+        x, y = x[keep], y[keep]
+        px, py, th = (float(v) for v in pose)
+        c, s = np.cos(th), np.sin(th)
+        wx = px + c * x - s * y
+        wy = py + s * x + c * y
+
+        res = self.resolution
+        sx, sy = int(np.floor(px / res)), int(np.floor(py / res))
+        ex = np.floor(wx / res).astype(np.int64)
+        ey = np.floor(wy / res).astype(np.int64)
+        if len(ex):
+            self._ensure(min(sx, int(ex.min())), max(sx, int(ex.max())),
+                         min(sy, int(ey.min())), max(sy, int(ey.max())))
+        else:
+            self._ensure(sx, sx, sy, sy)
+        h, w = self.shape
+        ox, oy = (int(v) for v in self._origin_cell)
+
+        # Rayos: muestras a paso de una celda desde el sensor hasta antes del impacto
+        gx, gy = px / res - ox, py / res - oy             # sensor en celdas (continuo)
+        dx, dy = wx / res - ox - gx, wy / res - oy - gy
+        steps = np.ceil(np.maximum(np.abs(dx), np.abs(dy))).astype(np.int64)
+        total = int(steps.sum())
+        free = np.zeros(h * w, dtype=bool)
+        if total:
+            ray = np.repeat(np.arange(len(steps)), steps)
+            k = np.arange(total) - np.repeat(np.cumsum(steps) - steps, steps)
+            t = (k / steps[ray]).astype(np.float32)
+            fx = (gx + t * dx[ray].astype(np.float32)).astype(np.int64)
+            fy = (gy + t * dy[ray].astype(np.float32)).astype(np.int64)
+            free[fy * w + fx] = True
+        hits = (ey - oy) * w + (ex - ox)
+        free[hits] = False   # un impacto gana a un rayo que pasa por la misma celda
+
+        flat = self.logodds.reshape(-1)
+        flat[free] += self.l_free
+        hits = np.unique(hits)
+        flat[hits] += self.l_occ
+        np.clip(flat, self.l_min, self.l_max, out=flat)
+        self.updates += 1
+
+    def update_frame(self, fr, pose: Pose = (0.0, 0.0, 0.0), trig=None) -> None:
+        """
+        Integra un ScanFrame del driver: mismos umbrales de calidad y distancia
+        que valid_mask() (el frame no trae flag ok) y proyección de project_xy().
+        """
+        r = fr.dist / 1000.0
+        keep = (fr.quality >= QUALITY_MIN) & (r > DIST_MIN_M) & (r <= DIST_MAX_M)
+        x, y = project_xy(fr.angle[keep], r[keep], trig)
+        self.update(x, y, pose)
+
+    # ── Resultados ───────────────────────────────────────────────────
+    def probability(self) -> np.ndarray:
+        """Probabilidad de ocupación por celda (0.5 = desconocido)."""
+        return 1.0 - 1.0 / (1.0 + np.exp(self.logodds))
+
+    def occupied(self, threshold: float = 0.65) -> np.ndarray:
+        """Máscara de celdas con probabilidad de ocupación >= threshold."""
+        return self.logodds >= np.log(threshold / (1.0 - threshold))
+
+    # ── Persistencia ─────────────────────────────────────────────────
+    def save(self, path: str) -> None:
+        """Guarda la rejilla en un .npz comprimido (las zonas desconocidas son ceros)."""
+        np.savez_compressed(
+            path, logodds=self.logodds, origin_cell=self._origin_cell,
+            params=np.array([GRID_FORMAT, self.resolution, self.tile, self.l_occ, self.l_free,
+                             self.l_min, self.l_max, self.max_range, self.updates]))
+
+    @classmethod
+    def load(cls, path: str) -> 'OccupancyGrid':
+        with np.load(path) as data:
+            p = data['params']
+            if int(p[0]) != GRID_FORMAT:
+                raise ValueError(f'{path}: formato de rejilla {int(p[0])} no soportado')
+            grid = cls(resolution_m=float(p[1]), tile_cells=int(p[2]), l_occ=float(p[3]), l_free=float(p[4]),
+                       l_min=float(p[5]), l_max=float(p[6]), max_range_m=float(p[7]))
+            grid.updates = int(p[8])
+            grid.logodds = data['logodds'].astype(np.float32)
+            grid._origin_cell[:] = data['origin_cell']
+        return grid
+
+
+def _room_scan(pose: Pose, n: int, rng: np.random.Generator, half: float = 4.0) -> Tuple[np.ndarray, np.ndarray]:
+    """Barrido sintético (marco del sensor) de una sala cuadrada de lado 2*half con una columna."""
+    px, py, th = pose
+    ang = np.sort(rng.uniform(0, 2 * np.pi, n))
+    dx, dy = np.cos(ang + th), np.sin(ang + th)
+    with np.errstate(divide='ignore'):
+        tx = np.where(dx > 0, (half - px) / dx, (-half - px) / dx)
+        ty = np.where(dy > 0, (half - py) / dy, (-half - py) / dy)
+    r = np.minimum(np.abs(tx), np.abs(ty))
+    # columna circular de radio 0.4 m en (1.5, 1.0)
+    cx, cy, rad = 1.5 - px, 1.0 - py, 0.4
+    b = dx * cx + dy * cy
+    disc = b * b - (cx * cx + cy * cy - rad * rad)
+    hit = (disc > 0) & (b > 0)
+    r = np.where(hit, np.minimum(r, b - np.sqrt(np.maximum(disc, 0))), r)
+    r = r + rng.normal(0, 0.01, n)
+    return r * np.cos(ang), r * np.sin(ang)
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import tempfile
+    import time
+
+    ap = argparse.ArgumentParser(description='Demo: mapa de una sala sintética recorrida por el sensor')
+    ap.add_argument('--frames', type=int, default=60)
+    ap.add_argument('--points', type=int, default=8000, help='Puntos por barrido')
+    ap.add_argument('--png', default=None, help='Guardar una imagen del mapa')
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    grid = OccupancyGrid(resolution_m=0.05)
+    times = []
+    for i in range(args.frames):
+        # El sensor recorre un círculo de 2 m de radio girando sobre sí mismo
+        a = 2 * np.pi * i / args.frames
+        pose = (2.0 * np.cos(a) - 0.5, 2.0 * np.sin(a) - 0.5, a)
+        x, y = _room_scan(pose, args.points, rng)
+        t0 = time.perf_counter()
+        grid.update(x, y, pose)
+        times.append(time.perf_counter() - t0)
+    t = np.array(times) * 1e3
+    print(f'{args.frames} barridos de {args.points} puntos: mediana {np.median(t):.1f} ms, '
+          f'máx {t.max():.1f} ms por actualización (periodo de una vuelta ~150 ms)')
+    print(f'Rejilla {grid.shape[1]}x{grid.shape[0]} celdas de {grid.resolution * 100:.0f} cm, '
+          f'extensión {grid.extent()}; ocupadas {int(grid.occupied().sum())}, '
+          f'libres {int((grid.logodds < 0).sum())}')
+
+    path = os.path.join(tempfile.mkdtemp(), 'mapa.npz')
+    grid.save(path)
+    back = OccupancyGrid.load(path)
+    assert np.array_equal(back.logodds, grid.logodds) and back.origin == grid.origin
+    print(f'Guardado/cargado: {os.path.getsize(path) / 1024:.1f} KB '
+          f'(en memoria {grid.logodds.nbytes / 1024:.0f} KB)')
+
+    if args.png:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(figsize=(7, 7))
+        ax.imshow(grid.probability(), origin='lower', extent=grid.extent(), cmap='gray_r', vmin=0, vmax=1)
+        ax.set_title(f'Mapa de ocupación ({grid.updates} barridos)')
+        ax.set_xlabel('x (m)')
+        ax.set_ylabel('y (m)')
+        os.makedirs(os.path.dirname(args.png) or '.', exist_ok=True)
+        fig.savefig(args.png)
+        print(f'[INFO] Imagen guardada en: {args.png}')
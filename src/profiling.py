@@ -0,0 +1,187 @@
+"""
+profiling.py
+Instrumentación de latencia por etapa del pipeline de frames.
+Propietario: LiDAR líder.
+
+Cada ScanFrame puede llevar una lista de marcas de tiempo (ScanFrame.stamps,
+reloj monótono time.perf_counter) que cada etapa añade al terminar:
+ read    → el driver tiene la vuelta completa (origen de tiempos del frame)
+ decode  → decodificada a columnas (backends 'bulk' / 'express')
+ filter  → máscara de calidad/distancia aplicada (LidarDriver.frames)
+ queue   → sale del anillo del hilo lector (frames_threaded)
+ project / render (view_live), write (record_scan)...
+La duración de una etapa es su marca menos la anterior; 'total' va de 'read'
+a la última marca. El Profiler acumula ventanas móviles por etapa (p50, p95,
+p99, máx.) y contadores de frames/s y puntos/s, y los exporta como líneas
+JSON periódicas y/o un volcado final.
+
+Coste cero si está desactivado: sin profiler, ScanFrame.stamps es None y el
+driver solo hace una comprobación `is not None` por frame (no por punto).
+
+Uso:
+ prof = Profiler(export='docs/profile.jsonl', interval_s=5.0)
+ driver.profiler = prof               # el driver marca read/decode/filter/queue
+ for fr in driver.frames():
+     ...
+     prof.stamp(fr, 'render')
+     prof.finish(fr)                  # agrega el frame a las estadísticas
+ prof.close()                         # volcado final
+ print(prof.report())
+"""
+from __future__ import annotations
+import json
+import sys
+import time
+from typing import Dict, Optional, TextIO, Union
+import numpy as np
+
+DEFAULT_WINDOW = 1000   # frames en la ventana móvil de cada etapa
+PERCENTILES = (50, 95, 99)
+
+
+class _Window:
+    """Ventana móvil de tamaño fijo (array circular NumPy, sin reservas por muestra)."""
+    __slots__ = ('buf', 'n', 'i')
+
+    def __init__(self, size: int) -> None:
+        self.buf = np.empty(size, dtype=np.float64)
+        self.n = 0
+        self.i = 0
+
+    def add(self, value: float) -> None:
+        self.buf[self.i] = value
+        self.i = (self.i + 1) % len(self.buf)
+        self.n = min(self.n + 1, len(self.buf))
+
+    def values(self) -> np.ndarray:
+        return self.buf[:self.n]
+
+
+class Profiler:
+    """Agrega las marcas de los frames en percentiles por etapa y tasas."""
+
+    def __init__(self, window: int = DEFAULT_WINDOW, export: Union[str, TextIO, None] = None,
+                 interval_s: float = 5.0) -> None:
+        """
+        Args:
+            window: nº de frames de la ventana móvil (percentiles y tasas)
+            export: ruta o fichero abierto para las líneas JSON (None = no exportar)
+            interval_s: cada cuántos segundos se escribe una línea JSON
+        """
+        self.window = window
+        self.interval_s = interval_s
+        self._stages: Dict[str, _Window] = {}
+        self._t_done = _Window(window)    # instante de fin de cada frame (para tasas)
+        self._points = _Window(window)    # puntos de cada frame
+        self.frames = 0
+        self.points = 0
+        self._t_start = time.perf_counter()
+        self._t_export = self._t_start
+        if isinstance(export, str):
+            self._out: Optional[TextIO] = open(export, 'a', encoding='utf-8')
+            self._own_out = True
+        else:
+            self._out, self._own_out = export, False
+
+    # ── Marcas (las llaman el driver y los consumidores) ─────────────
+    @staticmethod
+    def begin(fr, t: Optional[float] = None) -> None:
+        """Abre las marcas del frame con 'read' (t = instante en que la vuelta estaba completa)."""
+        fr.stamps = [('read', time.perf_counter() if t is None else t)]
+
+    @staticmethod
+    def stamp(fr, stage: str) -> None:
+        """Marca el fin de `stage` para este frame (no hace nada si el frame no está instrumentado)."""
+        if fr.stamps is not None:
+            fr.stamps.append((stage, time.perf_counter()))
+
+    def finish(self, fr) -> None:
+        """Cierra el frame: suma sus duraciones por etapa y sus puntos a las estadísticas."""
+        stamps = fr.stamps
+        if not stamps:
+            return
+        for (_, t_prev), (stage, t) in zip(stamps, stamps[1:]):
+            self._window(stage).add(t - t_prev)
+        self._window('total').add(stamps[-1][1] - stamps[0][1])
+        now = time.perf_counter()
+        self._t_done.add(now)
+        self._points.add(len(fr))
+        self.frames += 1
+        self.points += len(fr)
+        if self._out is not None and now - self._t_export >= self.interval_s:
+            self._t_export = now
+            self._write(self.snapshot())
+
+    def _window(self, stage: str) -> _Window:
+        w = self._stages.get(stage)
+        if w is None:
+            w = self._stages[stage] = _Window(self.window)
+        return w
+
+    # ── Resultados ───────────────────────────────────────────────────
+    def snapshot(self) -> dict:
+        """Estado actual: tasas y percentiles (ms) de cada etapa en la ventana móvil."""
+        t_done = self._t_done.values()
+        fps = pps = 0.0
+        if len(t_done) > 1:
+            span = float(t_done.max() - t_done.min())
+            if span > 0:
+                fps = (len(t_done) - 1) / span
+                pps = fps * float(self._points.values().mean())
+        stages = {}
+        for stage, w in self._stages.items():
+            v = w.values() * 1e3
+            p = np.percentile(v, PERCENTILES)
+            stages[stage] = {'n': int(w.n), **{f'p{q}_ms': round(float(x), 3) for q, x in zip(PERCENTILES, p)},
+                             'max_ms': round(float(v.max()), 3)}
+        return {
+            'ts': round(time.time(), 3),
+            'uptime_s': round(time.perf_counter() - self._t_start, 3),
+            'frames': self.frames,
+            'points': self.points,
+            'fps': round(fps, 2),
+            'points_per_s': round(pps, 1),
+            'stages': stages,
+        }
+
+    def report(self) -> str:
+        """Tabla de texto con los percentiles por etapa (para la consola)."""
+        snap = self.snapshot()
+        lines = [f"{snap['frames']} frames | {snap['fps']:.1f} frames/s | "
+                 f"{snap['points_per_s']:,.0f} puntos/s",
+                 f"{'etapa':10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'máx ms':>9}"]
+        for stage, st in snap['stages'].items():
+            lines.append(f"{stage:10} {st['p50_ms']:9.3f} {st['p95_ms']:9.3f} "
+                         f"{st['p99_ms']:9.3f} {st['max_ms']:9.3f}")
+        return '\n'.join(lines)
+
+    def _write(self, snap: dict) -> None:
+        self._out.write(json.dumps(snap) + '\n')
+        self._out.flush()
+
+    def close(self) -> dict:
+        """Volcado final (línea JSON con 'final': true si hay exportación). Devuelve el snapshot."""
+        snap = dict(self.snapshot(), final=True)
+        if self._out is not None:
+            self._write(snap)
+            if self._own_out:
+                self._out.close()
+            self._out = None
+        return snap
+
+
+if __name__ == '__main__':
+    # Demo sin sensor: frames sintéticos con etapas de duración conocida
+    from lidar_driver import ScanFrame
+
+    prof = Profiler(export=sys.stdout, interval_s=0.5)
+    for i in range(60):
+        fr = ScanFrame.from_columns(time.time(), np.full(500, 30.0), np.linspace(0, 360, 500), np.full(500, 1000.0))
+        prof.begin(fr)
+        time.sleep(0.001)
+        prof.stamp(fr, 'filter')
+        time.sleep(0.004 if i % 10 else 0.02)  # un render lento de vez en cuando
+        prof.stamp(fr, 'render')
+        prof.finish(fr)
+    prof.close()
+    print(prof.report())
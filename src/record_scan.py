@@ -6,8 +6,16 @@ Propietario: Computación
 Formato CSV de salida:
     t, quality, angle_deg, dist_mm
 
+Con --format bin se graba en el formato binario de scan_binary.py (5 bytes
+por punto, sin formatear texto); se convierte a CSV con:
+    python src/scan_binary.py to-csv data/scan_X.bin data/scan_X.csv
+
+Cada grabación lleva al lado su índice de frames (scan_X.csv.idx), que usa
+scan_index.py para ir a un instante concreto o reproducir una ventana.
+
 Uso:
     python src/record_scan.py --port /dev/ttyUSB0 --seconds 10 --out data
+    python src/record_scan.py --port /dev/ttyUSB0 --seconds 600 --format bin
 """
 
 from __future__ import annotations   # Permite usar anotaciones de tipos modernas
@@ -16,12 +24,69 @@ import csv                           # Para escribir archivos CSV
 import time                          # Para manejo de tiempo y timestamps
 from pathlib import Path             # Para manejar rutas de archivos de forma segura
 from lidar_driver import LidarDriver # Driver personalizado para comunicarse con el LIDAR
+from scan_binary import BinaryScanWriter  # Grabación binaria (--format bin)
+from scan_index import IndexWriter        # Índice de frames para seek/replay
+from profiling import Profiler            # Latencia por etapa (--profile)
+
+
+def decimation_slice(seen_pts: int, n: int, decimation: int) -> slice:
+    """
+    Slice (sin copia) de los puntos de un frame de n puntos que toca guardar.
+    Con el contador global seen_pts calculamos dónde cae el primer punto
+    a guardar dentro de este frame, para que la decimación siga entre frames.
+    """
+    return slice(-(seen_pts + 1) % decimation, n, decimation)
+
+
+def write_frame_csv(writer, fr, seen_pts: int, decimation: int):
+    """
+    Escribe las filas de un frame en el CSV aplicando la decimación.
+
+    Args:
+        writer: csv.writer del archivo de salida
+        fr: ScanFrame con las columnas quality, angle, dist
+        seen_pts: puntos vistos hasta ahora (contador global de la decimación)
+        decimation: guardar solo 1 de cada N puntos
+
+    Returns:
+        (puntos escritos, nuevo valor de seen_pts)
+    """
+    # Cada frame trae sus columnas como arrays (fr.quality, fr.angle, fr.dist)
+    n = len(fr)
+
+    # Aplicamos la decimación: guardar solo 1 de cada N puntos
+    sel = decimation_slice(seen_pts, n, decimation)
+
+    t_txt = f'{fr.t:.4f}'  # tiempo del frame con 4 decimales
+    rows = zip(
+        fr.quality[sel].astype(int).tolist(),  # calidad de la medición
+        fr.angle[sel].tolist(),                # ángulo en grados
+        fr.dist[sel].tolist(),                 # distancia en mm
+    )
+
+    # Escribimos todas las filas del frame de una vez
+    # (ángulo con 3 decimales, distancia con 1 decimal)
+    writer.writerows([t_txt, q, f'{a:.3f}', f'{d:.1f}'] for q, a, d in rows)
+    return len(range(*sel.indices(n))), seen_pts + n
+
+
+def write_frame_bin(writer, fr, seen_pts: int, decimation: int):
+    """
+    Igual que write_frame_csv() pero para un BinaryScanWriter: el frame se
+    empaqueta directamente desde sus columnas, sin pasar por texto.
+
+    Returns:
+        (puntos escritos, nuevo valor de seen_pts)
+    """
+    n = len(fr)
+    written = writer.write_frame(fr, decimation_slice(seen_pts, n, decimation))
+    return written, seen_pts + n
 
 
 def main():
 
     # Creamos el parser para argumentos de línea de comandos
-    ap = argparse.ArgumentParser(description='Grabación de escaneo RPLIDAR a CSV')
+    ap = argparse.ArgumentParser(description='Grabación de escaneo RPLIDAR a CSV o binario')
 
     # Puerto serie obligatorio
     ap.add_argument('--port', required=True, help='Puerto serie')
@@ -40,6 +105,20 @@ def main():
         help='Guardar solo 1 de cada N puntos (1 = guardar todos)'
     )
 
+    # Adquisición en segundo plano: un hilo vacía el puerto mientras escribimos
+    ap.add_argument('--threaded', action='store_true',
+                    help='Leer el sensor en un hilo aparte con un anillo acotado de frames')
+    ap.add_argument('--policy', default='drop_oldest', choices=['drop_oldest', 'latest', 'block'],
+                    help='Política del anillo si se llena (solo con --threaded)')
+    ap.add_argument('--ring', type=int, default=16, help='Capacidad del anillo (solo con --threaded)')
+
+    # Formato de salida: CSV (texto) o binario compacto (scan_binary.py)
+    ap.add_argument('--format', default='csv', choices=['csv', 'bin'], help='Formato de salida')
+
+    # Instrumentación: latencia por etapa (lectura, filtro, cola, escritura)
+    ap.add_argument('--profile', action='store_true', help='Medir la latencia por etapa y mostrarla al final')
+    ap.add_argument('--profile-out', default=None, help='Exportar las medidas como líneas JSON (cada 5 s + final)')
+
     # Parseamos los argumentos
     args = ap.parse_args()
 
@@ -52,12 +131,16 @@ def main():
     out_dir.mkdir(parents=True, exist_ok=True)
 
     # Creamos un nombre de archivo único usando timestamp
-    # Ejemplo: scan_20260219_153012.csv
-    filename = out_dir / f"scan_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+    # Ejemplo: scan_20260219_153012.csv (o .bin con --format bin)
+    filename = out_dir / f"scan_{time.strftime('%Y%m%d_%H%M%S')}.{args.format}"
 
     # Creamos el driver del LIDAR indicando el puerto serie
     driver = LidarDriver(args.port)
 
+    # Con --profile cada frame lleva marcas de tiempo por etapa
+    prof = Profiler(export=args.profile_out) if args.profile or args.profile_out else None
+    driver.profiler = prof
+
     # Guardamos el tiempo de inicio
     t0 = time.time()
 
@@ -70,48 +153,70 @@ def main():
     print(f'[INFO] Grabando {args.seconds}s → {filename}')
     print(f'[INFO] Decimación: 1 de cada {args.decimation} puntos')
 
+    # Generador de frames (no lee nada hasta que empezamos a iterar).
+    # Con --threaded los lee un hilo aparte y aquí solo consumimos.
+    if args.threaded:
+        frames = driver.frames_threaded(capacity=args.ring, policy=args.policy)
+    else:
+        frames = driver.frames()
+
     try:
 
         # Abrimos el archivo en modo escritura
-        with filename.open('w', newline='') as f:
+        if args.format == 'bin':
+            out_file = BinaryScanWriter(str(filename), meta={
+                'port': args.port, 'decimation': args.decimation})
+            writer, write_frame = out_file, write_frame_bin
+        else:
+            out_file = filename.open('w', newline='')
 
             # Creamos el escritor CSV
-            writer = csv.writer(f)
+            writer, write_frame = csv.writer(out_file), write_frame_csv
 
             # Escribimos la cabecera del archivo
             writer.writerow(['t', 'quality', 'angle_deg', 'dist_mm'])
 
+        # Junto a la grabación va su índice de frames (scan_X.csv.idx / .bin.idx)
+        with out_file, IndexWriter(filename) as index:
+
             # driver.frames() genera frames continuamente
-            for fr in driver.frames():
+            for fr in frames:
 
-                # Cada frame contiene múltiples puntos (fr.pts)
-                for q, a, d in fr.pts:
+                # Posición del frame dentro del archivo, para el índice
+                offset = out_file.offset if args.format == 'bin' else out_file.tell()
 
-                    # Aplicamos la decimación
-                    # Guardar solo 1 de cada N puntos
-                    seen_pts += 1
-                    if (seen_pts % args.decimation) != 0:
-                        continue
+                # Escribimos el frame aplicando la decimación
+                written, seen_pts = write_frame(writer, fr, seen_pts, args.decimation)
+                total_pts += written  # Incrementamos contador de guardados
 
-                    # Escribimos una fila en el CSV
-                    writer.writerow([
-                        f'{fr.t:.4f}',  # tiempo del frame con 4 decimales
-                        q,              # calidad de la medición
-                        f'{a:.3f}',     # ángulo en grados (3 decimales)
-                        f'{d:.1f}'      # distancia en mm (1 decimal)
-                    ])
+                # En el CSV el t queda con 4 decimales y un frame sin filas no existe
+                if args.format == 'bin':
+                    index.append(fr.t, offset, written)
+                elif written:
+                    index.append(float(f'{fr.t:.4f}'), offset, written)
 
-                    total_pts += 1  # Incrementamos contador de guardados
+                if prof is not None:
+                    prof.stamp(fr, 'write')
+                    prof.finish(fr)
 
                 # Si ya pasaron los segundos indicados, salimos del bucle
                 if time.time() - t0 >= args.seconds:
                     break
 
     finally:
+        # Cerramos el generador (si había hilo lector, se para antes de tocar el puerto)
+        frames.close()
         # Cerramos el LIDAR correctamente aunque ocurra un error
         driver.shutdown_safe()
 
-    print(f'[OK] Guardado: {filename}  ({total_pts} puntos guardados)')
+    if driver.ring is not None:
+        print(f'[INFO] Anillo de adquisición: {driver.ring.stats()}')
+
+    if prof is not None:
+        prof.close()
+        print(f'[INFO] Latencia por etapa:\n{prof.report()}')
+
+    print(f'[OK] Guardado: {filename}  ({total_pts} puntos guardados, índice {index.path.name})')
 
 
 # Punto de entrada del script
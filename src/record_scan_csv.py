@@ -10,35 +10,75 @@ Salidas generadas en --out:
 
 Propietario: Computación
 
+El CSV se procesa por bloques (ingest.iter_scan), así que la memoria no depende
+del tamaño del archivo: sirve igual para 720 filas que para horas de grabación.
+Se acepta cualquier formato conocido por ingest.py (se detecta por el header);
+la primera vez se guarda una caché binaria junto al CSV y las siguientes
+ejecuciones leen de ella sin parsear texto (--no-cache para desactivarla).
+Por bloque se calcula una sola máscara de motivos (FilterPipeline): de ella
+salen los válidos, los inválidos con su motivo y los recuentos del informe.
+Con --outliers, los bloques se cortan en fronteras de vuelta
+(outliers.iter_revolution_blocks) para que la etapa de outliers compare cada
+punto solo con su propia vuelta.
+
 Uso:
-    python src/record_scan_csv.py --csv data/scan_720.csv --out docs
+    python src/record_scan_csv.py --csv data/scan720.csv --out docs
+    python src/record_scan_csv.py --csv data/larga.csv --chunk 200000
+    python src/record_scan_csv.py --csv data/scan720.csv --outliers   # + outliers.py
+
+Modo lote: si --csv es una carpeta o un patrón glob, cada archivo se procesa
+en un proceso aparte (--workers, por defecto uno por núcleo) y escribe sus
+salidas en --out/<nombre del archivo>/. Al final se genera --out/batch_report.md
+con las estadísticas combinadas (StreamStats.merge) y el rendimiento de cada
+archivo. Un archivo que falle (header inválido, etc.) queda anotado en el
+informe sin detener el resto.
+    python src/record_scan_csv.py --csv data/ --out docs/lote --workers 4
+    python src/record_scan_csv.py --csv "data/scan_2026*.csv" --out docs/lote
 """
 
 from __future__ import annotations  # Permite anotaciones modernas de tipos
 import argparse                      # Para leer argumentos desde la CLI
+import glob                          # Patrones de archivos en modo lote
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path             # Para manejar rutas de forma robusta
+from typing import List, Optional
+
+import numpy as np
+
+# Lee el CSV grabado por el script de adquisición (record_scan.py u otro similar):
+# detección de formato y caché binaria en ingest.py
+from lidar_driver_csv import DEFAULT_CHUNK
+from ingest import detect_schema, iter_scan
+from outliers import OUT_MEDIAN, iter_revolution_blocks
 
-# Lee el CSV grabado por el script de adquisición (record_scan.py u otro similar)
-from lidar_driver_csv import read_scan_csv
+# Funciones del módulo compartido (CONTRATO: no modificar).
+# FilterPipeline aplica el mismo criterio que is_valid() (motivos REJECT_*)
+# y project_xy la misma proyección que polar_to_xy()
+from lidar_processing import DIST_MAX_M, DIST_MIN_M, QUALITY_MIN, FilterPipeline, project_xy
 
-# Funciones del módulo compartido (CONTRATO: no modificar)
-from lidar_processing import is_valid, polar_to_xy
+# Estadísticas combinables entre archivos (modo lote)
+from scan_stats import StreamStats, format_summary
 
 
-def _reject_reason(s) -> str:
+def _write_rows(f, fmt: str, cols) -> None:
     """
-    Motivo simple de descarte.
+    Escribe las columnas `cols` (misma longitud) como filas CSV con el
+    formato de fila `fmt`: una sola operación de formato para todo el bloque
+    en lugar de un f-string por línea.
     """
-    if s.ok != 1:
-        return "ok!=1"
-    if s.quality < 20:
-        return "quality<20"
-    if not (0.20 < s.measure_m <= 10.0):
-        return "measure_fuera_rango"
-    return "unknown"
+    n = len(cols[0])
+    if n == 0:
+        return
+    flat = np.empty(n * len(cols), dtype=object)
+    for j, c in enumerate(cols):
+        flat[j::len(cols)] = c.tolist() if isinstance(c, np.ndarray) else c
+    f.write((fmt * n) % tuple(flat))
 
 
-def main(csv_in: str, out_dir_str: str):
+def main(csv_in: str, out_dir_str: str, chunk_size: int = DEFAULT_CHUNK,
+         pipeline: Optional[FilterPipeline] = None, quiet: bool = False, cache: bool = True) -> dict:
     """
     Procesa el archivo CSV de entrada, filtra puntos válidos, guarda los puntos
     proyectados a XY en un CSV y genera un informe en Markdown.
@@ -46,62 +86,96 @@ def main(csv_in: str, out_dir_str: str):
     Args:
         csv_in: ruta al archivo CSV de escaneo (entrada)
         out_dir_str: carpeta donde se escribirán los resultados (salida)
+        chunk_size: filas por bloque (solo afecta a la memoria, no al resultado)
+        pipeline: etapas de filtrado (None = criterio de is_valid())
+        quiet: no imprimir las rutas generadas (modo lote)
+        cache: leer/crear la caché binaria de ingest.py junto al CSV
+    Returns:
+        Resumen para el modo lote: csv, rows, valid, counts, primary, stats, seconds.
     """
+    t0 = time.perf_counter()
+    pipeline = pipeline or FilterPipeline()
 
-    out = Path(out_dir_str)
-    out.mkdir(parents=True, exist_ok=True)  # crea la carpeta si no existe
-
-    # Si el CSV no existe, parar con error claro
+    # Si el CSV no existe o su header no es de un formato conocido, parar con
+    # error claro antes de crear ninguna salida
     csv_path = Path(csv_in)
     if not csv_path.exists():
         raise SystemExit(f'[ERROR] No existe el archivo CSV: {csv_in}')
+    schema = detect_schema(csv_in)
 
-    # read_scan_csv() devuelve una lista de samples (ok, quality, angle, measure_m)
-    samples = read_scan_csv(csv_in)
-    n = len(samples)  # total de lecturas
-
-    # Usamos is_valid(s) del módulo compartido (criterio oficial).
-    valid = [s for s in samples if is_valid(s)]
-    invalid = [s for s in samples if not is_valid(s)]
+    out = Path(out_dir_str)
+    out.mkdir(parents=True, exist_ok=True)  # crea la carpeta si no existe
 
-    # ── Guardar puntos filtrados ──────────────────────────────────────
+    # ── Filtrar bloque a bloque y volcar cada bloque a disco ─────────
     filtered_csv = out / 'filtered_points.csv'
-
-    with filtered_csv.open('w', encoding='utf-8') as f:
-        f.write('x_m,y_m,quality,angle_deg,measure_m\n')
-
-        for s in valid:
-            x, y = polar_to_xy(s)
-            # (Quité el espacio antes del salto de línea para dejar CSV limpio)
-            f.write(f'{x:.6f},{y:.6f},{s.quality},{s.angle:.3f},{s.measure_m:.4f}\n')
-
-    # Exportar inválidas con motivo 
     invalid_csv = out / 'invalid_points.csv'
-    with invalid_csv.open('w', encoding='utf-8') as f:
-        f.write('quality,angle_deg,measure_m,ok,reason\n')
-        for s in invalid:
-            reason = _reject_reason(s)
-            f.write(f'{s.quality},{s.angle:.3f},{s.measure_m:.4f},{s.ok},{reason}\n')
+    n = n_ok = n_valid = 0  # contadores para el informe
+    counts = dict.fromkeys(pipeline.names.values(), 0)   # muestras con cada motivo
+    primary = dict.fromkeys(pipeline.names.values(), 0)  # ...y como motivo principal
+    stats = StreamStats()
+
+    with filtered_csv.open('w', encoding='utf-8') as fv, \
+         invalid_csv.open('w', encoding='utf-8') as fi:
+        fv.write('x_m,y_m,quality,angle_deg,measure_m\n')
+        fi.write('quality,angle_deg,measure_m,ok,reason\n')
+
+        blocks = iter_scan(csv_in, chunk_size, cache)
+        if OUT_MEDIAN in pipeline.names:  # etapa de outliers: vueltas enteras en cada bloque
+            blocks = iter_revolution_blocks(blocks)
+        for chunk in blocks:
+            # Una sola pasada: máscara de motivos de todo el bloque (0 = válida)
+            reasons = pipeline.reasons(chunk.quality, chunk.angle, chunk.measure_m, chunk.ok)
+            mask = reasons == 0
+            inv = ~mask
+            n += len(chunk)
+            n_ok += int(np.count_nonzero(chunk.ok == 1))
+            n_valid += int(np.count_nonzero(mask))
+            stats.update_chunk(chunk)
+            for name, c in pipeline.counts(reasons).items():
+                counts[name] += c
+            first = pipeline.first_reason(reasons[inv])
+            names, c = np.unique(first, return_counts=True)
+            for name, c in zip(names.tolist(), c.tolist()):
+                primary[name] += c
+
+            # Puntos válidos proyectados a XY
+            x, y = project_xy(chunk.angle[mask], chunk.measure_m[mask])
+            _write_rows(fv, '%.6f,%.6f,%d,%.3f,%.4f\n',
+                        (x, y, chunk.quality[mask], chunk.angle[mask], chunk.measure_m[mask]))
+
+            # Exportar inválidas con su motivo principal
+            _write_rows(fi, '%d,%.3f,%.4f,%d,%s\n',
+                        (chunk.quality[inv], chunk.angle[inv], chunk.measure_m[inv], chunk.ok[inv], first))
+
+    n_invalid = n - n_valid
 
     # ── Generar informe markdown ──────────────────────────────────────
-    ok_ratio = sum(1 for s in samples if s.ok == 1) / n if n else 0
-    valid_ratio = len(valid) / n if n else 0
+    ok_ratio = n_ok / n if n else 0
+    valid_ratio = n_valid / n if n else 0
 
     report = out / 'report_scan.md'
+    reason_rows = '\n'.join(f'| {name} | {counts[name]} | {primary[name]} |' for name in counts)
 
     report.write_text(
         f"""# Informe de scan CSV
 
-**Archivo de entrada:** `{csv_in}`
+**Archivo de entrada:** `{csv_in}` (formato {schema.name})
 **Total de lecturas:** {n}
 **ok == 1:** {ok_ratio:.2%}
-**Válidas tras filtro (lidar_processing):** {valid_ratio:.2%}  ({len(valid)} puntos)
-**Inválidas:** {len(invalid)} puntos
+**Válidas tras filtro (lidar_processing):** {valid_ratio:.2%}  ({n_valid} puntos)
+**Inválidas:** {n_invalid} puntos
 
 ## Criterio de filtrado (lidar_processing.py)
 - ok == 1
-- quality >= 20
-- 0.20 m < measure_m <= 10.0 m
+- quality >= {QUALITY_MIN}
+- {DIST_MIN_M:.2f} m < measure_m <= {DIST_MAX_M:.1f} m
+
+## Motivos de descarte
+Una lectura puede tener varios motivos; el principal es el del primer filtro que la descarta.
+
+| Motivo | Lecturas | Como motivo principal |
+|---|---|---|
+{reason_rows}
 
 ## Archivos generados
 - `{filtered_csv.name}`: nube de puntos válidos (x, y, quality, angle, r)
@@ -112,22 +186,194 @@ def main(csv_in: str, out_dir_str: str):
     )
 
     # MENSAJES POR CONSOLA
-    print(f'[OK] Generados:')
-    print(f'     {filtered_csv}')
-    print(f'     {invalid_csv}')
-    print(f'     {report}')
+    if not quiet:
+        print(f'[OK] Generados:')
+        print(f'     {filtered_csv}')
+        print(f'     {invalid_csv}')
+        print(f'     {report}')
+
+    return {'csv': str(csv_in), 'rows': n, 'valid': n_valid, 'counts': counts, 'primary': primary,
+            'stats': stats, 'seconds': time.perf_counter() - t0}
+
+
+# ── Modo lote ─────────────────────────────────────────────────────────
+def collect_inputs(spec: str) -> List[Path]:
+    """Archivos CSV de --csv: un archivo, una carpeta (todos sus *.csv) o un patrón glob."""
+    p = Path(spec)
+    if p.is_dir():
+        return sorted(p.glob('*.csv'))
+    if glob.has_magic(spec):
+        return sorted(Path(f) for f in glob.glob(spec) if f.endswith('.csv'))
+    return [p]
+
+
+def _batch_worker(csv_in: str, out_dir: str, chunk_size: int, outliers: bool, cache: bool) -> dict:
+    """Procesa un archivo en un proceso del pool; los errores se devuelven, no se lanzan."""
+    t0 = time.perf_counter()
+    try:
+        pipeline = FilterPipeline()
+        if outliers:
+            # La etapa lleva un cierre (no se puede enviar al proceso): se crea aquí
+            from outliers import outlier_stage
+            pipeline = pipeline.then(outlier_stage())
+        return main(csv_in, out_dir, chunk_size, pipeline, quiet=True, cache=cache)
+    except (Exception, SystemExit) as e:
+        return {'csv': csv_in, 'error': f'{type(e).__name__}: {e}',
+                'seconds': time.perf_counter() - t0}
+
+
+def run_batch(inputs: List[Path], out_dir: str, workers: Optional[int] = None,
+              chunk_size: int = DEFAULT_CHUNK, outliers: bool = False, cache: bool = True) -> List[dict]:
+    """
+    Procesa varios CSV en paralelo (un archivo por tarea) y escribe batch_report.md.
+    Args:
+        workers: procesos del pool (None = nº de núcleos; 1 = sin pool, en este proceso)
+    Returns:
+        Lista de resúmenes de main() (o {'csv', 'error'}) en el orden de `inputs`.
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    # Una carpeta de salida por archivo (con sufijo si dos se llaman igual)
+    dirs, seen = [], set()
+    for p in inputs:
+        name = p.stem
+        i = 1
+        while name in seen:
+            i += 1
+            name = f'{p.stem}_{i}'
+        seen.add(name)
+        dirs.append(str(out / name))
+
+    t0 = time.perf_counter()
+    results: List[Optional[dict]] = [None] * len(inputs)
+    jobs = [(str(p), d, chunk_size, outliers, cache) for p, d in zip(inputs, dirs)]
+    if workers == 1 or len(inputs) == 1:
+        for i, job in enumerate(jobs):
+            results[i] = _batch_worker(*job)
+            _print_result(results[i])
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(inputs))) as pool:
+            futures = {pool.submit(_batch_worker, *job): i for i, job in enumerate(jobs)}
+            for fut in as_completed(futures):
+                results[futures[fut]] = fut.result()
+                _print_result(results[futures[fut]])
+    wall = time.perf_counter() - t0
+
+    report = out / 'batch_report.md'
+    report.write_text(_batch_report(results, dirs, wall, workers), encoding='utf-8')
+    n_err = sum('error' in r for r in results)
+    print(f'[OK] {len(results) - n_err}/{len(results)} archivos en {wall:.2f} s '
+          f'con {workers} procesos → {report}')
+    return results
+
+
+def _print_result(r: dict) -> None:
+    if 'error' in r:
+        print(f'[ERROR] {r["csv"]}: {r["error"]}')
+    else:
+        print(f'[OK] {r["csv"]}: {r["rows"]} filas en {r["seconds"]:.2f} s')
+
+
+def _md_cell(text: str) -> str:
+    """Texto apto para una celda de tabla markdown: sin saltos de línea y con '|' escapado."""
+    return ' '.join(str(text).split()).replace('|', r'\|')
+
+
+def _batch_report(results: List[dict], dirs: List[str], wall: float, workers: int) -> str:
+    """Informe markdown del lote: totales, estadísticas combinadas y tabla por archivo."""
+    ok = [r for r in results if 'error' not in r]
+    total = StreamStats()
+    counts: dict = {}
+    primary: dict = {}
+    for r in ok:
+        total.merge(r['stats'])
+        for name, c in r['counts'].items():
+            counts[name] = counts.get(name, 0) + c
+        for name, c in r['primary'].items():
+            primary[name] = primary.get(name, 0) + c
+    rows = sum(r['rows'] for r in ok)
+    valid = sum(r['valid'] for r in ok)
+    cpu = sum(r['seconds'] for r in results)
+    s = total.summary()
+
+    lines = [
+        '# Informe de lote (record_scan_csv)',
+        '',
+        f'**Archivos:** {len(results)} ({len(results) - len(ok)} con error)',
+        f'**Procesos:** {workers}',
+        f'**Tiempo total:** {wall:.2f} s (suma de los tiempos por archivo {cpu:.2f} s, concurrencia media {cpu / max(wall, 1e-9):.1f})',
+        f'**Total de lecturas:** {rows} ({rows / max(wall, 1e-9):,.0f} filas/s)',
+        f'**Válidas tras filtro (lidar_processing):** {valid / rows if rows else 0:.2%}  ({valid} puntos)',
+        '',
+        '## Estadísticas combinadas',
+        format_summary(s),
+        '',
+    ]
+    if rows:
+        lines += [
+            '| Magnitud | mín | p5 | mediana | p95 | máx | media ± std |',
+            '|---|---|---|---|---|---|---|',
+            f"| distancia (m) | {s['measure_min_m']:.3f} | {s['measure_p5_m']:.3f} | {s['measure_median_m']:.3f} | "
+            f"{s['measure_p95_m']:.3f} | {s['measure_max_m']:.3f} | {s['measure_mean_m']:.3f} ± {s['measure_std_m']:.3f} |",
+            f"| calidad | {s['quality_min']} | {s['quality_p5']:.0f} | {s['quality_median']:.0f} | "
+            f"{s['quality_p95']:.0f} | {s['quality_max']} | {s['quality_mean']:.1f} ± {s['quality_std']:.1f} |",
+            '',
+            '## Motivos de descarte',
+            '',
+            '| Motivo | Lecturas | Como motivo principal |',
+            '|---|---|---|',
+            *(f'| {name} | {counts[name]} | {primary[name]} |' for name in counts),
+            '',
+        ]
+    lines += [
+        '## Por archivo',
+        '',
+        '| Archivo | Lecturas | Válidas | s | filas/s | Salida / error |',
+        '|---|---|---|---|---|---|',
+    ]
+    for r, d in zip(results, dirs):
+        if 'error' in r:
+            lines.append(f"| `{_md_cell(r['csv'])}` | - | - | {r['seconds']:.2f} | - | ERROR: {_md_cell(r['error'])} |")
+        else:
+            lines.append(f"| `{_md_cell(r['csv'])}` | {r['rows']} | {r['valid'] / r['rows'] if r['rows'] else 0:.1%} | "
+                         f"{r['seconds']:.2f} | {r['rows'] / max(r['seconds'], 1e-9):,.0f} | `{d}` |")
+    return '\n'.join(lines) + '\n'
 
 
 if __name__ == '__main__':
     # Parser simple para usar el script desde consola
     ap = argparse.ArgumentParser()
 
-    # Ruta del CSV de entrada (por defecto data/scan_720.csv)
-    ap.add_argument('--csv', default='data/scan_720.csv')
+    # Ruta del CSV de entrada (por defecto data/scan720.csv); carpeta o glob = modo lote
+    ap.add_argument('--csv', default='data/scan720.csv')
 
     # Directorio de salida (por defecto docs)
     ap.add_argument('--out', default='docs')
 
+    # Filas por bloque (memoria constante; no cambia el resultado)
+    ap.add_argument('--chunk', type=int, default=DEFAULT_CHUNK)
+
+    # Sin caché binaria (parsear siempre el texto)
+    ap.add_argument('--no-cache', action='store_true')
+
+    # Procesos en modo lote (por defecto uno por núcleo)
+    ap.add_argument('--workers', type=int, default=None)
+
+    # Etapa extra de outliers (mediana, aislados, mixed pixels; ver outliers.py),
+    # vuelta a vuelta: las vueltas se separan por el salto de ángulo
+    ap.add_argument('--outliers', action='store_true')
+
     # Parsear argumentos y ejecutar
     args = ap.parse_args()
-    main(args.csv, args.out)
+    if Path(args.csv).is_dir() or glob.has_magic(args.csv):
+        inputs = collect_inputs(args.csv)
+        if not inputs:
+            raise SystemExit(f'[ERROR] Ningún CSV en: {args.csv}')
+        run_batch(inputs, args.out, args.workers, args.chunk, args.outliers, not args.no_cache)
+    else:
+        pipeline = FilterPipeline()
+        if args.outliers:
+            from outliers import outlier_stage
+            pipeline = pipeline.then(outlier_stage())
+        main(args.csv, args.out, args.chunk, pipeline, cache=not args.no_cache)
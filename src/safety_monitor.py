@@ -0,0 +1,235 @@
+"""
+safety_monitor.py
+Monitor de proximidad por sectores angulares conectado a la FSM (utils.py).
+Propietario: Equipo de Actuadores.
+
+El giro completo del A1M8 tarda 100–180 ms; esperar al frame entero para
+detectar un obstáculo añade esa latencia a la parada. El monitor revisa
+cada bloque de medidas según llega del puerto (backends 'bulk' y 'express'
+del driver, y también 'rplidar' con driver.sectors(); frames() con
+'rplidar' solo ve frames completos):
+ - distancia mínima por sector (360 / sector_deg sectores) con una
+   reducción vectorizada (np.minimum.at), sin bucles por punto
+ - zonas de protección por sector: stop_m (parada controlada, evento
+   'stop') y error_m (más cerca: fallo crítico, evento 'error')
+ - al invadirse una zona (min_hits medidas dentro en el mismo bloque, para
+   no saltar por un punto espurio) emite el evento a utils.transition() y
+   ejecuta la acción: on_breach(breach) (p. ej. retener el movimiento) o,
+   si no se da, LidarDriver.shutdown_safe() y fin del stream de frames
+ - latencia de detección: desde que el bloque sale del puerto serie
+   (time.perf_counter en el driver) hasta que se emite el evento
+Tras disparar, el monitor sigue actualizando los mínimos pero no emite más
+eventos hasta rearm() (la FSM no tiene transición STOP → SCAN).
+
+Uso:
+ zones = SafetyZones.from_arcs([(-30, 30, 0.5, 0.25)], default_stop_m=0.3)  # frente más amplio
+ driver.safety = SafetyMonitor(zones, driver=driver)
+ for fr in driver.frames(backend='bulk'):   # el stream termina si se dispara la parada
+     ...
+ print(driver.safety.report())
+ python src/safety_monitor.py                                   # obstáculo sintético
+ python src/safety_monitor.py --port /dev/ttyUSB0 --stop-m 0.5  # sensor en vivo
+"""
+from __future__ import annotations
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+import numpy as np
+from lidar_driver import DIST_MIN_MM, QUALITY_MIN
+from utils import State, transition
+
+DEFAULT_SECTOR_DEG = 10.0
+
+
+@dataclass
+class Breach:
+    """Invasión de una zona de protección."""
+    event: str              # 'stop' o 'error' (evento enviado a transition)
+    state: State            # estado de la FSM tras el evento
+    sectors: np.ndarray     # sectores invadidos
+    min_m: float            # distancia mínima medida dentro de la zona
+    latency_s: float        # llegada del bloque al driver → evento emitido
+    t: float                # time.time() del evento
+
+
+class SafetyZones:
+    """Distancias de protección por sector angular (sector i = [i, i + 1) * sector_deg)."""
+
+    def __init__(self, stop_m, error_m=0.0, sector_deg: float = DEFAULT_SECTOR_DEG) -> None:
+        """
+        Args:
+            stop_m: distancia de parada (m), escalar o una por sector
+            error_m: distancia de fallo crítico (m), escalar o una por sector (0 = sin zona)
+            sector_deg: ancho de sector; debe dividir 360
+        """
+        n = int(round(360.0 / sector_deg))
+        if n < 1 or abs(n * sector_deg - 360.0) > 1e-9:
+            raise ValueError(f'sector_deg={sector_deg} no divide 360°')
+        self.sector_deg = float(sector_deg)
+        self.n = n
+        self.stop_m = np.broadcast_to(np.asarray(stop_m, dtype=np.float64), (n,)).copy()
+        self.error_m = np.broadcast_to(np.asarray(error_m, dtype=np.float64), (n,)).copy()
+
+    @classmethod
+    def from_arcs(cls, arcs: Sequence[Tuple[float, ...]], default_stop_m: float = 0.0,
+                  default_error_m: float = 0.0, sector_deg: float = DEFAULT_SECTOR_DEG) -> 'SafetyZones':
+        """
+        Zonas por arcos: cada arco (desde_deg, hasta_deg, stop_m[, error_m])
+        se aplica a los sectores cuyo centro cae dentro (admite cruzar 0°,
+        p. ej. (-30, 30, ...)); los demás sectores llevan los valores por defecto.
+        """
+        zones = cls(default_stop_m, default_error_m, sector_deg)
+        centers = (np.arange(zones.n) + 0.5) * zones.sector_deg
+        for arc in arcs:
+            a0, a1, stop = arc[0], arc[1], arc[2]
+            inside = ((centers - a0) % 360.0) < ((a1 - a0) % 360.0 or 360.0)
+            zones.stop_m[inside] = stop
+            if len(arc) > 3:
+                zones.error_m[inside] = arc[3]
+        return zones
+
+    def sector_of(self, angle_deg: np.ndarray) -> np.ndarray:
+        return (np.asarray(angle_deg) * (self.n / 360.0)).astype(np.int64) % self.n
+
+
+class SafetyMonitor:
+    """Mínimos por sector y disparo de la parada; se conecta al driver con driver.safety = monitor."""
+
+    def __init__(self, zones: SafetyZones, driver=None, on_breach: Optional[Callable[[Breach], None]] = None,
+                 state: State = State.SCAN, min_hits: int = 2) -> None:
+        """
+        Args:
+            zones: zonas de protección
+            driver: LidarDriver; sin on_breach, la acción es driver.shutdown_safe()
+            on_breach: acción propia (p. ej. retener el movimiento); el stream sigue
+            state: estado de la FSM al empezar a vigilar
+            min_hits: medidas dentro de la zona (en un mismo bloque) para disparar
+        """
+        self.zones = zones
+        self.driver = driver
+        self.on_breach = on_breach
+        self.state = state
+        self.min_hits = min_hits
+        self.sector_min = np.full(zones.n, np.inf)   # última distancia mínima (m) de cada sector
+        self.sector_t = np.zeros(zones.n)            # perf_counter de esa medida
+        self.breaches: List[Breach] = []
+        self.halted = False      # se llamó a shutdown_safe(): el driver corta el stream
+        self.checks = 0
+        self.check_s = 0.0       # tiempo total dentro de check()
+
+    @property
+    def tripped(self) -> bool:
+        return self.state != State.SCAN
+
+    def rearm(self, state: State = State.SCAN) -> None:
+        """Vuelve a vigilar tras una parada (decisión del operador, no automática)."""
+        self.state = state
+        self.halted = False
+
+    def check(self, quality: np.ndarray, angle: np.ndarray, dist_mm: np.ndarray,
+              t_arrival: Optional[float] = None) -> Optional[Breach]:
+        """
+        Revisa un bloque de medidas (frame completo o parcial, distancias en mm).
+        Args:
+            t_arrival: perf_counter de llegada del bloque (None = ahora)
+        Returns:
+            Breach si este bloque ha disparado la parada, None si no.
+        """
+        t0 = time.perf_counter()
+        t_arrival = t0 if t_arrival is None else t_arrival
+        self.checks += 1
+        z = self.zones
+        # Umbrales de valid_mask_mm() salvo el máximo: por debajo de DIST_MIN_MM son errores ópticos
+        keep = (quality >= QUALITY_MIN) & (dist_mm >= DIST_MIN_MM)
+        sec = z.sector_of(angle[keep])
+        d = dist_mm[keep] / 1000.0
+        mins = np.full(z.n, np.inf)
+        np.minimum.at(mins, sec, d)
+        seen = np.isfinite(mins)
+        self.sector_min[seen] = mins[seen]
+        self.sector_t[seen] = t_arrival
+        breach = None
+        if not self.tripped and len(d):
+            in_error = np.bincount(sec[d < z.error_m[sec]], minlength=z.n) >= self.min_hits
+            in_stop = np.bincount(sec[d < z.stop_m[sec]], minlength=z.n) >= self.min_hits
+            if in_error.any() or in_stop.any():
+                event = 'error' if in_error.any() else 'stop'
+                sectors = np.flatnonzero(in_error if in_error.any() else in_stop)
+                self.state = transition(self.state, event)
+                breach = Breach(event, self.state, sectors, float(mins[sectors].min()),
+                                time.perf_counter() - t_arrival, time.time())
+                self.breaches.append(breach)
+        self.check_s += time.perf_counter() - t0
+        if breach is not None:
+            self._act(breach)
+        return breach
+
+    def check_frame(self, fr, t_arrival: Optional[float] = None) -> Optional[Breach]:
+        """check() sobre un ScanFrame."""
+        return self.check(fr.quality, fr.angle, fr.dist, t_arrival)
+
+    def _act(self, breach: Breach) -> None:
+        if self.on_breach is not None:
+            self.on_breach(breach)
+        elif self.driver is not None:
+            self.driver.shutdown_safe()
+            self.halted = True
+
+    def report(self) -> str:
+        """Resumen para la consola: bloques revisados, coste y disparos con su latencia."""
+        lines = [f'{self.checks} bloques revisados | {self.check_s / max(self.checks, 1) * 1e6:.0f} µs por bloque | '
+                 f'estado {self.state.name}']
+        for b in self.breaches:
+            secs = ', '.join(f'{s * self.zones.sector_deg:.0f}°' for s in b.sectors[:6])
+            lines.append(f" {b.event!r}: sectores [{secs}{', ...' if len(b.sectors) > 6 else ''}] | "
+                         f'mínimo {b.min_m:.3f} m | latencia {b.latency_s * 1e3:.3f} ms')
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    ap = argparse.ArgumentParser(description='Monitor de proximidad: obstáculo sintético o sensor en vivo')
+    ap.add_argument('--port', default=None, help='Puerto del sensor')
+    ap.add_argument('--backend', default='bulk', help='Backend del driver (bulk/express revisan bloques parciales)')
+    ap.add_argument('--stop-m', type=float, default=0.5, help='Distancia de parada en todos los sectores')
+    ap.add_argument('--seconds', type=float, default=10.0)
+    args = ap.parse_args()
+
+    if args.port is None:
+        # 8000 medidas/s a 10 Hz en bloques de 64 (READ_SIZE del driver). Pared a
+        # 2 m; en la vuelta 3 aparece una persona a 0.35 m entre 80° y 95°.
+        zones = SafetyZones.from_arcs([(-45, 45, 0.6, 0.2)], default_stop_m=args.stop_m, default_error_m=0.1)
+        holds = []
+        mon = SafetyMonitor(zones, on_breach=holds.append)  # retener el movimiento, sin sensor
+        per_rev, block = 800, 64
+        ang = np.arange(per_rev) * (360.0 / per_rev)
+        for rev in range(6):
+            dist = np.full(per_rev, 2000.0)
+            if rev >= 3:
+                dist[(ang >= 80) & (ang < 95)] = 350.0
+            q = np.full(per_rev, 40.0)
+            for i in range(0, per_rev, block):
+                b = mon.check(q[i:i + block], ang[i:i + block], dist[i:i + block])
+                if b is not None:
+                    print(f'[PARADA] vuelta {rev}, bloque {i // block}: evento {b.event!r} → {b.state.name}')
+        assert len(holds) == 1 and holds[0].state == State.STOP
+        print(mon.report())
+        print('Mínimo por sector (m):', np.round(mon.sector_min, 2))
+    else:
+        from lidar_driver import LidarDriver
+        driver = LidarDriver(args.port)
+        driver.safety = SafetyMonitor(SafetyZones(args.stop_m), driver=driver)
+        t_end = time.time() + args.seconds
+        n = 0
+        try:
+            for fr in driver.frames(backend=args.backend):
+                n += 1
+                if time.time() >= t_end:
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            driver.shutdown_safe()
+        print(f'{n} frames leídos')
+        print(driver.safety.report())
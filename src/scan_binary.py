@@ -0,0 +1,323 @@
+"""
+scan_binary.py
+Formato binario compacto para las grabaciones de record_scan.py.
+Propietario: Computación.
+
+El CSV de record_scan.py gasta ~34 bytes de texto por punto y formatear cada
+número cuesta tiempo de CPU en plena captura. Aquí cada punto ocupa 5 bytes,
+en la misma resolución que manda el sensor (ángulo en q6 = 1/64°, distancia
+en q2 = 1/4 mm), y cada frame se vuelca tal cual desde su buffer.
+
+Estructura del archivo (.bin, little endian):
+ cabecera:
+  8 bytes  MAGIC (b'RPLSCAN\\0')
+  u16      versión del formato (FORMAT_VERSION)
+  u32      longitud de la cabecera JSON
+  JSON     esquema (dtypes, unidades) + metadatos de la grabación
+ bloques de frame, uno tras otro hasta el final del archivo:
+  f8 t (epoch, s) | u4 n | n registros de 5 bytes:
+   u1 quality | u2 angle_q6 (ángulo · 64) | u2 dist_q2 (distancia mm · 4)
+No hay contador de frames en la cabecera: si la grabación se corta a medias,
+el lector simplemente ignora el último bloque incompleto.
+
+El lector mapea el archivo con np.memmap: records(i) es una vista sin copia
+del frame i, y solo se decodifica (a float) lo que se pide.
+
+Uso:
+ with BinaryScanWriter('data/scan.bin', meta={'port': '/dev/ttyUSB0'}) as w:
+     w.write_frame(fr)
+ rd = BinaryScanReader('data/scan.bin')
+ for fr in rd: ...                              # ScanFrames, como driver.frames()
+ t, q, a, d = rd.columns()                       # todo el archivo en columnas
+ python src/scan_binary.py info data/scan.bin
+ python src/scan_binary.py to-csv data/scan.bin data/scan.csv
+ python src/scan_binary.py to-bin data/scan.csv data/scan.bin
+"""
+from __future__ import annotations
+import json
+import struct
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+import numpy as np
+from lidar_driver import ScanFrame
+
+MAGIC = b'RPLSCAN\x00'
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct('<8sHI')   # magic, versión, longitud del JSON
+
+# Cabecera de cada frame y registro de cada punto (sin relleno: 12 y 5 bytes)
+FRAME_DTYPE = np.dtype([('t', '<f8'), ('n', '<u4')])
+RECORD_DTYPE = np.dtype([('quality', 'u1'), ('angle_q6', '<u2'), ('dist_q2', '<u2')])
+ANGLE_SCALE = 64.0     # angle_q6 = ángulo_deg · 64
+DIST_SCALE = 4.0       # dist_q2 = distancia_mm · 4
+ANGLE_WRAP = 360 * 64  # 23040: ángulo q6 siempre en [0, 360)
+
+# Formato CSV de record_scan.py (para los conversores)
+CSV_HEADER = ['t', 'quality', 'angle_deg', 'dist_mm']
+CSV_FMT = ('%.4f', '%d', '%.3f', '%.1f')
+CSV_CHUNK = 65536
+
+
+def _schema() -> dict:
+    """Descripción del formato que se guarda en la cabecera JSON."""
+    return {
+        'format': 'rplidar-scan',
+        'version': FORMAT_VERSION,
+        'frame': FRAME_DTYPE.descr,
+        'record': RECORD_DTYPE.descr,
+        'units': {'t': 's (epoch)', 'angle_q6': 'deg * 64', 'dist_q2': 'mm * 4'},
+    }
+
+
+def read_header(path: str) -> Tuple[dict, int]:
+    """
+    Lee y valida la cabecera.
+    Returns:
+        (cabecera JSON como dict, offset en bytes del primer bloque de frame)
+    Raises:
+        ValueError si el archivo no es una grabación binaria o la versión no se soporta.
+    """
+    with open(path, 'rb') as f:
+        pre = f.read(_PREAMBLE.size)
+        if len(pre) < _PREAMBLE.size:
+            raise ValueError(f'{path}: archivo demasiado corto para ser una grabación binaria')
+        magic, version, size = _PREAMBLE.unpack(pre)
+        if magic != MAGIC:
+            raise ValueError(f'{path}: no es una grabación binaria (magic {magic!r})')
+        if version > FORMAT_VERSION:
+            raise ValueError(f'{path}: versión de formato {version} no soportada '
+                             f'(máx. {FORMAT_VERSION})')
+        header = json.loads(f.read(size).decode('utf-8'))
+    return header, _PREAMBLE.size + size
+
+
+def encode_records(quality, angle, dist) -> np.ndarray:
+    """Empaqueta columnas (quality, angle_deg, dist_mm) en registros de RECORD_DTYPE."""
+    rec = np.empty(len(angle), dtype=RECORD_DTYPE)
+    rec['quality'] = np.clip(quality, 0, 255)
+    rec['angle_q6'] = np.rint(np.asarray(angle) * ANGLE_SCALE).astype(np.int64) % ANGLE_WRAP
+    rec['dist_q2'] = np.clip(np.rint(np.asarray(dist) * DIST_SCALE), 0, 0xFFFF)
+    return rec
+
+
+def decode_records(rec: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Registros → columnas float64 (quality, angle_deg, dist_mm), como las de ScanFrame."""
+    return (rec['quality'].astype(np.float64),
+            rec['angle_q6'] / ANGLE_SCALE,
+            rec['dist_q2'] / DIST_SCALE)
+
+
+class BinaryScanWriter:
+    """Escribe una grabación binaria frame a frame (append-only)."""
+
+    def __init__(self, path: str, meta: Optional[dict] = None) -> None:
+        """
+        Args:
+            path: archivo de salida (se sobrescribe)
+            meta: metadatos libres de la grabación (puerto, decimación...)
+        """
+        self.path = Path(path)
+        self.frames = 0   # frames escritos
+        self.points = 0   # puntos escritos
+        header = dict(_schema(), created=time.strftime('%Y-%m-%dT%H:%M:%S'), meta=meta or {})
+        blob = json.dumps(header).encode('utf-8')
+        self._f = self.path.open('wb')
+        self._f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(blob)))
+        self._f.write(blob)
+        self.offset = self._f.tell()  # offset donde empieza el siguiente bloque
+
+    def write_frame(self, fr: ScanFrame, sel: slice = slice(None)) -> int:
+        """
+        Añade un frame (opcionalmente solo los puntos de `sel`, p. ej. decimación).
+        Returns:
+            Nº de puntos escritos.
+        """
+        rec = encode_records(fr.quality[sel], fr.angle[sel], fr.dist[sel])
+        head = np.array([(fr.t, len(rec))], dtype=FRAME_DTYPE)
+        self._f.write(head.tobytes())
+        self._f.write(rec.tobytes())
+        self.offset += head.nbytes + rec.nbytes
+        self.frames += 1
+        self.points += len(rec)
+        return len(rec)
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def close(self) -> None:
+        if not self._f.closed:
+            self._f.close()
+
+    def __enter__(self) -> 'BinaryScanWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class BinaryScanReader:
+    """
+    Lector de grabaciones binarias sobre np.memmap (no carga el archivo en RAM).
+    Al abrir recorre las cabeceras de frame (12 bytes cada una) para construir
+    la tabla t / offset / n, salvo que se le pase el índice; los puntos no se
+    tocan hasta que se piden.
+    """
+
+    def __init__(self, path: str, index: Optional[np.ndarray] = None) -> None:
+        """
+        Args:
+            path: grabación .bin
+            index: tabla de frames ya conocida (campos t, offset = inicio del
+                bloque, n; ver scan_index.py). Si se pasa, no se recorre el archivo.
+        """
+        self.path = Path(path)
+        self.header, data_offset = read_header(path)
+        self.meta = self.header.get('meta', {})
+        self._mm = np.memmap(self.path, dtype=np.uint8, mode='r')
+        if index is None:
+            self.t, self.offsets, self.counts = self._scan_frames(data_offset)
+        else:
+            self.t = np.asarray(index['t'], dtype=np.float64)
+            self.offsets = np.asarray(index['offset'], dtype=np.int64) + FRAME_DTYPE.itemsize
+            self.counts = np.asarray(index['n'], dtype=np.int64)
+
+    def _scan_frames(self, pos: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Recorre los bloques de frame. Un bloque final incompleto se ignora."""
+        size = len(self._mm)
+        t, offsets, counts = [], [], []
+        while pos + FRAME_DTYPE.itemsize <= size:
+            head = np.frombuffer(self._mm, FRAME_DTYPE, 1, pos)[0]
+            start = pos + FRAME_DTYPE.itemsize
+            end = start + int(head['n']) * RECORD_DTYPE.itemsize
+            if end > size:
+                break
+            t.append(float(head['t']))
+            offsets.append(start)
+            counts.append(int(head['n']))
+            pos = end
+        return (np.array(t, dtype=np.float64), np.array(offsets, dtype=np.int64),
+                np.array(counts, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    @property
+    def points(self) -> int:
+        """Nº total de puntos de la grabación."""
+        return int(self.counts.sum())
+
+    def records(self, i: int) -> np.ndarray:
+        """Registros crudos del frame i: vista de solo lectura sobre el memmap (sin copia)."""
+        return np.frombuffer(self._mm, RECORD_DTYPE, int(self.counts[i]), int(self.offsets[i]))
+
+    def frame(self, i: int) -> ScanFrame:
+        """Frame i decodificado como ScanFrame (quality, angle_deg, dist_mm)."""
+        return ScanFrame.from_columns(float(self.t[i]), *decode_records(self.records(i)))
+
+    def __iter__(self) -> Iterator[ScanFrame]:
+        for i in range(len(self)):
+            yield self.frame(i)
+
+    def columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Toda la grabación en columnas (t, quality, angle_deg, dist_mm), una fila por punto."""
+        if not len(self):
+            return tuple(np.empty(0) for _ in range(4))
+        rec = np.concatenate([self.records(i) for i in range(len(self))])
+        return (np.repeat(self.t, self.counts), *decode_records(rec))
+
+    def close(self) -> None:
+        """Libera el mapeo (las vistas devueltas por records() dejan de ser válidas)."""
+        self._mm = None
+
+
+# ── Conversores CSV ↔ binario ────────────────────────────────────────
+def bin_to_csv(bin_path: str, csv_path: str) -> int:
+    """
+    Convierte una grabación binaria al CSV de record_scan.py (t, quality,
+    angle_deg, dist_mm, mismos decimales). Devuelve el nº de puntos escritos.
+    """
+    rd = BinaryScanReader(bin_path)
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        f.write(','.join(CSV_HEADER) + '\r\n')  # csv.writer usa \r\n
+        for i in range(len(rd)):
+            q, a, d = decode_records(rd.records(i))
+            np.savetxt(f, np.column_stack((np.full(len(a), rd.t[i]), q, a, d)),
+                       fmt=CSV_FMT, delimiter=',', newline='\r\n')
+    n = rd.points
+    rd.close()
+    return n
+
+
+def _iter_record_csv(path: str, chunk_size: int) -> Iterator[np.ndarray]:
+    """Bloques (n×4) del CSV de record_scan.py, validando el header."""
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        header = f.readline().strip().split(',')
+        if header != CSV_HEADER:
+            raise ValueError(
+                f'Header inválido.\n'
+                f'Esperado: {CSV_HEADER}\n'
+                f'Recibido: {header}'
+            )
+        while lines := list(islice(f, chunk_size)):
+            data = np.loadtxt(lines, delimiter=',', dtype=np.float64, ndmin=2)
+            if len(data):
+                yield data
+
+
+def csv_to_bin(csv_path: str, bin_path: str, chunk_size: int = CSV_CHUNK,
+               meta: Optional[dict] = None) -> int:
+    """
+    Convierte un CSV de record_scan.py a binario. Las filas consecutivas con el
+    mismo t forman un frame. Lee por bloques (memoria constante).
+    Returns:
+        Nº de puntos escritos.
+    """
+    with BinaryScanWriter(bin_path, meta=dict(meta or {}, source=str(csv_path))) as w:
+        pending = np.empty((0, 4))
+        for data in _iter_record_csv(csv_path, chunk_size):
+            data = np.concatenate((pending, data)) if len(pending) else data
+            # Índices donde cambia t = inicio de un frame nuevo
+            starts = np.flatnonzero(np.diff(data[:, 0])) + 1
+            bounds = np.concatenate(([0], starts))
+            # El último grupo puede continuar en el siguiente bloque: lo guardamos
+            for s, e in zip(bounds[:-1], bounds[1:]):
+                w.write_frame(ScanFrame.from_columns(data[s, 0], *data[s:e, 1:].T))
+            pending = data[bounds[-1]:]
+        if len(pending):
+            w.write_frame(ScanFrame.from_columns(pending[0, 0], *pending[:, 1:].T))
+        return w.points
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+
+    ap = argparse.ArgumentParser(description='Grabaciones binarias de record_scan.py')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('info', help='Cabecera y resumen de una grabación binaria')
+    p.add_argument('bin')
+    p = sub.add_parser('to-csv', help='Binario → CSV (t, quality, angle_deg, dist_mm)')
+    p.add_argument('bin')
+    p.add_argument('csv')
+    p = sub.add_parser('to-bin', help='CSV de record_scan.py → binario')
+    p.add_argument('csv')
+    p.add_argument('bin')
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    if args.cmd == 'info':
+        rd = BinaryScanReader(args.bin)
+        print(json.dumps(rd.header, indent=1))
+        dur = rd.t[-1] - rd.t[0] if len(rd) > 1 else 0.0
+        print(f'{len(rd)} frames, {rd.points:,} puntos, {dur:.1f} s '
+              f'({os.path.getsize(args.bin) / max(rd.points, 1):.2f} bytes/punto)')
+    elif args.cmd == 'to-csv':
+        n = bin_to_csv(args.bin, args.csv)
+        print(f'[OK] {n:,} puntos → {args.csv}')
+    else:
+        n = csv_to_bin(args.csv, args.bin)
+        print(f'[OK] {n:,} puntos → {args.bin} '
+              f'({os.path.getsize(args.csv) / max(os.path.getsize(args.bin), 1):.1f}x más pequeño)')
+    print(f'[INFO] {time.perf_counter() - t0:.2f} s')
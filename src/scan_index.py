@@ -0,0 +1,239 @@
+"""
+scan_index.py
+Índice temporal de frames para las grabaciones de record_scan.py (CSV o .bin).
+Propietario: Computación.
+
+Junto a cada grabación record_scan.py escribe un archivo lateral
+<grabación>.idx con una entrada por frame: t (inicio del frame), offset en
+bytes dentro de la grabación y nº de puntos. Con él:
+ - ir al frame N o al instante t = X es una búsqueda binaria (O(log n))
+   y un seek, sin leer el resto del archivo
+ - replay() reproduce una ventana de tiempo como un generador de ScanFrame
+   (igual que LidarDriver.frames()) a 1x, Nx o a la máxima velocidad
+
+Formato del .idx (little endian):
+ 8 bytes INDEX_MAGIC + entradas de 20 bytes (f8 t | u8 offset | u4 n)
+ offset = inicio de la primera fila del frame (CSV) o de su bloque (.bin).
+Se añade una entrada por frame mientras se graba; si la grabación se corta,
+una entrada final incompleta se ignora. Para grabaciones antiguas sin índice,
+build_index() lo reconstruye leyendo el archivo una vez.
+
+Uso:
+ rec = IndexedRecording('data/scan_X.bin')        # crea el .idx si no existe
+ fr = rec.frame(rec.frame_at(t_incidente))
+ for fr in replay('data/scan_X.csv', start=t0, end=t0 + 5, speed=2.0): ...
+ python src/scan_index.py build data/scan_X.csv
+ python src/scan_index.py replay data/scan_X.bin --start 30 --end 40 --speed 0
+"""
+from __future__ import annotations
+import time
+from pathlib import Path
+from typing import Iterator, Optional, Union
+import numpy as np
+from lidar_driver import ScanFrame
+from scan_binary import FRAME_DTYPE, BinaryScanReader
+
+INDEX_MAGIC = b'RPLIDX1\x00'
+INDEX_DTYPE = np.dtype([('t', '<f8'), ('offset', '<u8'), ('n', '<u4')])
+INDEX_SUFFIX = '.idx'
+
+PathLike = Union[str, Path]
+
+
+def index_path(recording: PathLike) -> Path:
+    """Ruta del índice de una grabación: scan_X.csv → scan_X.csv.idx."""
+    recording = Path(recording)
+    return recording.with_name(recording.name + INDEX_SUFFIX)
+
+
+def _is_binary(recording: PathLike) -> bool:
+    return Path(recording).suffix == '.bin'
+
+
+class IndexWriter:
+    """Añade entradas al índice a medida que se graba (una por frame)."""
+
+    def __init__(self, recording: PathLike) -> None:
+        self.path = index_path(recording)
+        self._f = self.path.open('wb')
+        self._f.write(INDEX_MAGIC)
+        self.entries = 0
+
+    def append(self, t: float, offset: int, n: int) -> None:
+        """Registra un frame que empieza en `offset` (bytes) con `n` puntos."""
+        self._f.write(np.array([(t, offset, n)], dtype=INDEX_DTYPE).tobytes())
+        self.entries += 1
+
+    def close(self) -> None:
+        if not self._f.closed:
+            self._f.close()
+
+    def __enter__(self) -> 'IndexWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def load_index(recording: PathLike) -> np.ndarray:
+    """
+    Lee el índice de una grabación (memmap de solo lectura, campos t, offset, n).
+    Raises:
+        FileNotFoundError si no hay .idx; ValueError si no es un índice válido.
+    """
+    path = index_path(recording)
+    with path.open('rb') as f:
+        if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            raise ValueError(f'{path}: no es un índice de grabación')
+    n = (path.stat().st_size - len(INDEX_MAGIC)) // INDEX_DTYPE.itemsize
+    if n == 0:
+        return np.empty(0, dtype=INDEX_DTYPE)
+    return np.memmap(path, dtype=INDEX_DTYPE, mode='r', offset=len(INDEX_MAGIC), shape=(n,))
+
+
+def build_index(recording: PathLike) -> np.ndarray:
+    """
+    Reconstruye el índice leyendo la grabación entera una vez y lo guarda en
+    <grabación>.idx. En el CSV, las filas consecutivas con el mismo t son un frame.
+    Returns:
+        El índice (array de INDEX_DTYPE).
+    """
+    with IndexWriter(recording) as w:
+        if _is_binary(recording):
+            rd = BinaryScanReader(str(recording))
+            for t, off, n in zip(rd.t.tolist(), rd.offsets.tolist(), rd.counts.tolist()):
+                w.append(t, off - FRAME_DTYPE.itemsize, n)
+            rd.close()
+        else:
+            with open(recording, 'rb') as f:
+                pos = len(f.readline())  # header
+                prefix, start, n = None, pos, 0
+                for line in f:
+                    # Todas las filas de un frame empiezan por el mismo texto de t
+                    if prefix is None or not line.startswith(prefix):
+                        if n:
+                            w.append(float(prefix[:-1]), start, n)
+                        prefix, start, n = line[:line.index(b',') + 1], pos, 0
+                    n += 1
+                    pos += len(line)
+                if n:
+                    w.append(float(prefix[:-1]), start, n)
+    return load_index(recording)
+
+
+class IndexedRecording:
+    """Acceso aleatorio a una grabación (CSV o .bin) a través de su índice."""
+
+    def __init__(self, recording: PathLike, build: bool = True) -> None:
+        """
+        Args:
+            recording: grabación de record_scan.py (.csv o .bin)
+            build: si no existe el .idx, reconstruirlo (si no, FileNotFoundError)
+        """
+        self.path = Path(recording)
+        if not index_path(self.path).exists() and build:
+            build_index(self.path)
+        self.index = load_index(self.path)
+        self.t = np.asarray(self.index['t'])
+        self._bin = BinaryScanReader(str(self.path), self.index) if _is_binary(self.path) else None
+        self._csv = None if self._bin is not None else self.path.open('rb')
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def duration(self) -> float:
+        """Segundos entre el primer y el último frame."""
+        return float(self.t[-1] - self.t[0]) if len(self) > 1 else 0.0
+
+    def frame_at(self, t: float) -> int:
+        """Índice del frame que estaba en curso en el instante t (epoch), en O(log n)."""
+        i = int(np.searchsorted(self.t, t, side='right')) - 1
+        return min(max(i, 0), len(self) - 1)
+
+    def frame_range(self, start: Optional[float] = None, end: Optional[float] = None) -> range:
+        """Frames cuyo t está en [start, end) (None = sin límite por ese lado)."""
+        i0 = 0 if start is None else int(np.searchsorted(self.t, start, side='left'))
+        i1 = len(self) if end is None else int(np.searchsorted(self.t, end, side='left'))
+        return range(i0, max(i0, i1))
+
+    def frame(self, i: int) -> ScanFrame:
+        """Frame i como ScanFrame (quality, angle_deg, dist_mm), leyendo solo sus bytes."""
+        if self._bin is not None:
+            return self._bin.frame(i)
+        e = self.index[i]
+        self._csv.seek(int(e['offset']))
+        lines = [self._csv.readline() for _ in range(int(e['n']))]
+        data = np.loadtxt(lines, delimiter=',', dtype=np.float64, ndmin=2)
+        return ScanFrame.from_columns(float(e['t']), *data[:, 1:].T)
+
+    def close(self) -> None:
+        if self._bin is not None:
+            self._bin.close()
+        else:
+            self._csv.close()
+
+    def __enter__(self) -> 'IndexedRecording':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def replay(recording: PathLike, start: Optional[float] = None, end: Optional[float] = None,
+           speed: float = 1.0) -> Iterator[ScanFrame]:
+    """
+    Reproduce una ventana [start, end) de la grabación (t en epoch) frame a frame.
+    Args:
+        speed: 1 = tiempo real, N = N veces más rápido, 0 = sin esperas (máximo)
+    Yields:
+        ScanFrame con el t original de la grabación, como LidarDriver.frames().
+    """
+    with IndexedRecording(recording) as rec:
+        frames = rec.frame_range(start, end)
+        if not frames:
+            return
+        t_rec0 = float(rec.t[frames[0]])
+        t_wall0 = time.perf_counter()
+        for i in frames:
+            if speed:
+                # Esperamos hasta la hora "de grabación" del frame, escalada
+                delay = (float(rec.t[i]) - t_rec0) / speed - (time.perf_counter() - t_wall0)
+                if delay > 0:
+                    time.sleep(delay)
+            yield rec.frame(i)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    ap = argparse.ArgumentParser(description='Índice temporal y replay de grabaciones')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('build', help='(Re)construir el .idx de una grabación')
+    p.add_argument('recording')
+    p = sub.add_parser('replay', help='Reproducir una ventana de la grabación')
+    p.add_argument('recording')
+    p.add_argument('--start', type=float, default=None, help='Segundos desde el inicio')
+    p.add_argument('--end', type=float, default=None, help='Segundos desde el inicio')
+    p.add_argument('--speed', type=float, default=1.0, help='1 = tiempo real, 0 = máximo')
+    args = ap.parse_args()
+
+    if args.cmd == 'build':
+        t0 = time.perf_counter()
+        idx = build_index(args.recording)
+        print(f'[OK] {index_path(args.recording)}: {len(idx)} frames '
+              f'({time.perf_counter() - t0:.2f} s)')
+    else:
+        with IndexedRecording(args.recording) as rec:
+            t_first = float(rec.t[0]) if len(rec) else 0.0
+            print(f'[INFO] {len(rec)} frames, {rec.duration:.1f} s grabados')
+        start = None if args.start is None else t_first + args.start
+        end = None if args.end is None else t_first + args.end
+        t0 = time.perf_counter()
+        frames = pts = 0
+        for fr in replay(args.recording, start, end, args.speed):
+            frames += 1
+            pts += len(fr)
+        dt = time.perf_counter() - t0
+        print(f'{frames} frames, {pts:,} puntos en {dt:.2f} s '
+              f'({frames / max(dt, 1e-9):.1f} frames/s, {pts / max(dt, 1e-9):,.0f} puntos/s)')
@@ -0,0 +1,293 @@
+"""
+scan_stats.py
+Estadísticas en streaming del dataset (una sola pasada, memoria acotada).
+Propietario: Sensores.
+
+StreamStats acumula bloque a bloque (ScanChunk de iter_scan_csv o de
+ingest.iter_scan) o frame a frame (ScanFrame de LidarDriver.frames()) sin
+guardar las muestras:
+ - count y ok_ratio (solo de las muestras con flag ok: los frames del
+   driver llegan ya filtrados y no aportan ok_ratio)
+ - min / máx / media / desviación típica de distancia y calidad
+   (Welford; cada bloque se combina con la fórmula de Chan, vectorizado)
+ - cuantiles aproximados (p5, mediana, p95) con histogramas de tamaño fijo:
+   distancia en cubos de 1 cm entre 0 y 16.384 m (error ≤ 5 mm; lo que
+   quede por encima se cuenta aparte y se resuelve con el máximo),
+   calidad en cubos de 1 unidad (0–255)
+Dos acumuladores se combinan con merge() (el resultado es el mismo que
+haber pasado todos los datos por uno solo), así que se puede calcular por
+archivo o por proceso y juntar al final, o llevar un resumen continuo de
+un stream en vivo.
+
+Uso:
+ st = StreamStats()
+ for chunk in iter_scan('data/scan720.csv'):   # ingest.py: cualquier formato de data/
+     st.update_chunk(chunk)
+ print(st.summary())
+ total = StreamStats().merge(st_a).merge(st_b)
+ python src/scan_stats.py --csv data/scan720.csv
+ python src/scan_stats.py --port /dev/ttyUSB0 --seconds 30    # resumen en vivo
+"""
+from __future__ import annotations
+from typing import Iterable, Optional
+import numpy as np
+
+# Rango y resolución de los histogramas (memoria fija: ~15 KB por acumulador)
+DIST_HIST_MAX_M = 16.384   # máximo representable por el sensor (q2 de 16 bits, en m)
+DIST_HIST_RES_M = 0.01
+QUALITY_HIST_MAX = 256
+QUANTILES = (0.05, 0.5, 0.95)
+
+
+class _Moments:
+    """Media y varianza (Welford / Chan) más mínimo y máximo de una magnitud."""
+    __slots__ = ('n', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self) -> None:
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0           # suma de cuadrados de las desviaciones a la media
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def _combine(self, n: int, mean: float, m2: float, lo: float, hi: float) -> None:
+        if n == 0:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+        self.min = min(self.min, lo)
+        self.max = max(self.max, hi)
+
+    def update(self, x: np.ndarray) -> None:
+        """Añade un bloque de valores (sus momentos se calculan de golpe en NumPy)."""
+        if len(x) == 0:
+            return
+        mean = float(x.mean())
+        d = x - mean
+        self._combine(len(x), mean, float(np.dot(d, d)), float(x.min()), float(x.max()))
+
+    def merge(self, other: '_Moments') -> None:
+        self._combine(other.n, other.mean, other.m2, other.min, other.max)
+
+    @property
+    def std(self) -> float:
+        """Desviación típica poblacional."""
+        return (self.m2 / self.n) ** 0.5 if self.n else 0.0
+
+
+class _Histogram:
+    """Histograma de cubos fijos en [lo, hi) + desbordamiento, para cuantiles aproximados."""
+    __slots__ = ('lo', 'res', 'counts', 'over')
+
+    def __init__(self, lo: float, hi: float, res: float) -> None:
+        self.lo = lo
+        self.res = res
+        self.counts = np.zeros(int(round((hi - lo) / res)), dtype=np.int64)
+        self.over = 0   # valores ≥ hi (su posición exacta no se guarda)
+
+    def update(self, x: np.ndarray) -> None:
+        if len(x) == 0:
+            return
+        idx = np.floor((x - self.lo) / self.res).astype(np.int64)
+        np.maximum(idx, 0, out=idx)  # por debajo del rango: primer cubo
+        inside = idx < len(self.counts)
+        self.over += len(x) - int(np.count_nonzero(inside))
+        self.counts += np.bincount(idx[inside], minlength=len(self.counts))
+
+    def merge(self, other: '_Histogram') -> None:
+        self.counts += other.counts
+        self.over += other.over
+
+    def quantile(self, q: float, vmin: float, vmax: float) -> float:
+        """
+        Cuantil q interpolando dentro del cubo que lo contiene (error ≤ res).
+        Si cae en el desbordamiento se devuelve vmax; el resultado se acota a [vmin, vmax].
+        """
+        total = int(self.counts.sum()) + self.over
+        if total == 0:
+            return float('nan')
+        target = q * total
+        cum = np.cumsum(self.counts)
+        i = int(np.searchsorted(cum, target, side='left'))
+        if i >= len(cum):
+            return vmax
+        below = cum[i] - self.counts[i]
+        frac = (target - below) / self.counts[i] if self.counts[i] else 0.0
+        return float(min(max(self.lo + (i + frac) * self.res, vmin), vmax))
+
+
+class StreamStats:
+    """Resumen del dataset acumulado en una pasada; combinable con merge()."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.n_flagged = 0      # muestras con flag ok (base de ok_ratio)
+        self.n_ok = 0
+        self.measure = _Moments()
+        self.quality = _Moments()
+        self.angle_min = float('inf')
+        self.angle_max = float('-inf')
+        self._measure_hist = _Histogram(0.0, DIST_HIST_MAX_M, DIST_HIST_RES_M)
+        # Calidad entera: cubos centrados en cada valor
+        self._quality_hist = _Histogram(-0.5, QUALITY_HIST_MAX - 0.5, 1.0)
+
+    # ── Acumulación ──────────────────────────────────────────────────
+    def update(self, quality: np.ndarray, angle: np.ndarray, measure_m: np.ndarray,
+               ok: Optional[np.ndarray] = None) -> 'StreamStats':
+        """
+        Añade un bloque de muestras en columnas (misma longitud).
+        Args:
+            ok: flag del sensor (1 = válida); None = sin flag (no cuenta para ok_ratio)
+        """
+        n = len(quality)
+        if n == 0:
+            return self
+        quality = np.asarray(quality, dtype=np.float64)
+        measure_m = np.asarray(measure_m, dtype=np.float64)
+        self.count += n
+        if ok is not None:
+            self.n_flagged += n
+            self.n_ok += int(np.count_nonzero(np.asarray(ok) == 1))
+        self.measure.update(measure_m)
+        self.quality.update(quality)
+        self._measure_hist.update(measure_m)
+        self._quality_hist.update(quality)
+        self.angle_min = min(self.angle_min, float(np.min(angle)))
+        self.angle_max = max(self.angle_max, float(np.max(angle)))
+        return self
+
+    def update_chunk(self, chunk) -> 'StreamStats':
+        """Añade un ScanChunk de iter_scan_csv()."""
+        return self.update(chunk.quality, chunk.angle, chunk.measure_m, chunk.ok)
+
+    def update_frame(self, fr) -> 'StreamStats':
+        """
+        Añade un ScanFrame del driver. El sensor no da flag ok por punto y el
+        driver ya ha descartado los inválidos (valid_mask_mm), así que los
+        frames no cuentan para ok_ratio.
+        """
+        return self.update(fr.quality, fr.angle, fr.dist / 1000.0)
+
+    def merge(self, other: 'StreamStats') -> 'StreamStats':
+        """Suma otro acumulador a este (p. ej. el de otro archivo u otro proceso)."""
+        self.count += other.count
+        self.n_flagged += other.n_flagged
+        self.n_ok += other.n_ok
+        self.measure.merge(other.measure)
+        self.quality.merge(other.quality)
+        self._measure_hist.merge(other._measure_hist)
+        self._quality_hist.merge(other._quality_hist)
+        self.angle_min = min(self.angle_min, other.angle_min)
+        self.angle_max = max(self.angle_max, other.angle_max)
+        return self
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable) -> 'StreamStats':
+        st = cls()
+        for c in chunks:
+            st.update_chunk(c)
+        return st
+
+    # ── Resultados ───────────────────────────────────────────────────
+    def _quantiles(self, hist: _Histogram, m: _Moments) -> dict:
+        names = {0.05: 'p5', 0.5: 'median', 0.95: 'p95'}
+        return {names[q]: hist.quantile(q, m.min, m.max) for q in QUANTILES}
+
+    def summary(self) -> dict:
+        """
+        Mismas claves que dataset_health() (count, ok_ratio, min/máx/media)
+        más desviación típica y cuantiles aproximados de calidad y distancia.
+        ok_ratio es None si ninguna muestra traía flag ok (frames del driver).
+        """
+        if self.count == 0:
+            return {'count': 0}
+        mq = self._quantiles(self._measure_hist, self.measure)
+        qq = self._quantiles(self._quality_hist, self.quality)
+        return {
+            'count': self.count,
+            'ok_ratio': self.n_ok / self.n_flagged if self.n_flagged else None,
+            'quality_min': int(self.quality.min),
+            'quality_max': int(self.quality.max),
+            'quality_mean': self.quality.mean,
+            'quality_std': self.quality.std,
+            'quality_p5': qq['p5'],
+            'quality_median': qq['median'],
+            'quality_p95': qq['p95'],
+            'measure_min_m': self.measure.min,
+            'measure_max_m': self.measure.max,
+            'measure_mean_m': self.measure.mean,
+            'measure_std_m': self.measure.std,
+            'measure_p5_m': mq['p5'],
+            'measure_median_m': mq['median'],
+            'measure_p95_m': mq['p95'],
+            'angle_min_deg': self.angle_min,
+            'angle_max_deg': self.angle_max,
+        }
+
+
+def format_summary(s: dict) -> str:
+    """Resumen legible en una línea (para consola y logs)."""
+    if not s.get('count'):
+        return 'sin muestras'
+    ok = f"ok {s['ok_ratio'] * 100:.1f}% | " if s['ok_ratio'] is not None else ''
+    return (f"{s['count']:,} muestras | {ok}"
+            f"dist p5/med/p95 {s['measure_p5_m']:.3f}/{s['measure_median_m']:.3f}/"
+            f"{s['measure_p95_m']:.3f} m (media {s['measure_mean_m']:.3f} ± {s['measure_std_m']:.3f}) | "
+            f"calidad med {s['quality_median']:.0f} (media {s['quality_mean']:.1f} ± {s['quality_std']:.1f})")
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    ap = argparse.ArgumentParser(description='Estadísticas en streaming de un CSV o del sensor en vivo')
+    ap.add_argument('--csv', default='data/scan720.csv', help='CSV en cualquier formato de data/ (ver ingest.py)')
+    ap.add_argument('--port', default=None, help='Puerto del sensor: resumen continuo en vivo')
+    ap.add_argument('--seconds', type=float, default=10.0, help='Duración en vivo')
+    ap.add_argument('--interval', type=float, default=1.0, help='Segundos entre resúmenes en vivo')
+    args = ap.parse_args()
+
+    if args.port is None:
+        from ingest import iter_scan
+        # Comprobación contra el cálculo exacto con todo el archivo en memoria
+        chunks = list(iter_scan(args.csv, chunk_size=100))
+        st = StreamStats.from_chunks(chunks)
+        s = st.summary()
+        print(format_summary(s))
+        m = np.concatenate([c.measure_m for c in chunks])
+        q = np.concatenate([c.quality for c in chunks])
+        print(f"[CHECK] media {abs(s['measure_mean_m'] - m.mean()):.2e} | std {abs(s['measure_std_m'] - m.std()):.2e} | "
+              f"mediana dist {abs(s['measure_median_m'] - np.median(m)) * 1000:.2f} mm | "
+              f"p95 calidad {s['quality_p95'] - np.percentile(q, 95):+.2f}")
+        # merge de dos mitades == todo de una vez
+        half = len(chunks) // 2
+        merged = StreamStats.from_chunks(chunks[:half]).merge(StreamStats.from_chunks(chunks[half:])).summary()
+        print('[CHECK] merge de mitades == una pasada:',
+              all(merged[k] == s[k] or np.isclose(merged[k], s[k]) for k in s))
+    else:
+        from lidar_driver import LidarDriver
+        driver = LidarDriver(args.port)
+        total = StreamStats()
+        ventana = StreamStats()
+        t_end = time.time() + args.seconds
+        t_next = time.time() + args.interval
+        try:
+            for fr in driver.frames():
+                ventana.update_frame(fr)
+                if time.time() >= t_next:
+                    # Resumen del último intervalo y acumulado (merge de ventanas)
+                    total.merge(ventana)
+                    print(f'[último {args.interval:.0f} s] {format_summary(ventana.summary())}')
+                    ventana = StreamStats()
+                    t_next += args.interval
+                if time.time() >= t_end:
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            driver.shutdown_safe()
+        total.merge(ventana)
+        print(f'[total] {format_summary(total.summary())}')
@@ -0,0 +1,334 @@
+"""
+spatial_index.py
+Índice espacial por frame (rejilla uniforme) para consultas de radio y de
+vecino más cercano sobre los puntos XY proyectados.
+Propietario: Computación.
+
+Con la lista plana de filter_and_project() cada pregunta ("¿qué obstáculo
+está más cerca de X?", "¿qué puntos caen a menos de r de esta ruta?") es un
+recorrido lineal de todos los puntos. GridIndex reparte los puntos en celdas
+cuadradas de cell_m:
+ - construcción lineal: clave de celda por punto, ordenación radix
+   (np.argsort estable sobre claves de 16 bits) y tabla densa con el inicio
+   de cada celda (bincount + cumsum), así que localizar una celda es O(1).
+   Si la rejilla es muy dispersa o tiene más de 65536 celdas se usa una
+   ordenación estable normal y búsqueda binaria sobre las celdas ocupadas.
+ - consultas por lotes y vectorizadas: cada consulta mira solo el bloque de
+   celdas que cubre su radio; los pares (consulta, candidato) se generan de
+   golpe con np.repeat, sin bucles por consulta.
+ - rebuild(x, y) rehace el índice con el frame nuevo (mismo tamaño de celda).
+Los índices devueltos se refieren siempre al orden de los arrays de entrada.
+
+Uso:
+ idx = GridIndex(x, y, cell_m=0.25)
+ i, d = idx.nearest(qx, qy)                   # obstáculo más cercano a cada consulta
+ i, d = idx.knn(qx, qy, k=5)                  # (nq, k), -1 / inf si faltan
+ offsets, vecinos = idx.query_radius(qx, qy, 0.5)   # vecinos[offsets[j]:offsets[j+1]]
+ en_ruta = idx.within(path_x, path_y, 0.4)    # máscara de puntos a <= 0.4 m de la ruta
+ idx.rebuild(x_nuevo, y_nuevo)                # siguiente frame
+ python src/spatial_index.py                  # comparación con fuerza bruta (1k–50k puntos)
+"""
+from __future__ import annotations
+from typing import Optional, Tuple
+import numpy as np
+
+DEFAULT_CELL_M = 0.25
+RADIX_MAX_CELLS = 1 << 16   # claves de 16 bits: np.argsort(kind='stable') usa radix sort
+DENSE_CELLS_PER_POINT = 8   # con más celdas que esto por punto, búsqueda binaria en lugar de tabla
+BRUTE_BLOCK = 256           # consultas por bloque en la fuerza bruta (memoria acotada)
+
+
+class GridIndex:
+    """Rejilla uniforme sobre un conjunto de puntos 2D; se rehace por frame con rebuild()."""
+
+    def __init__(self, x: Optional[np.ndarray] = None, y: Optional[np.ndarray] = None,
+                 cell_m: float = DEFAULT_CELL_M) -> None:
+        if cell_m <= 0:
+            raise ValueError('cell_m debe ser > 0')
+        self.cell = float(cell_m)
+        self.rebuild(np.empty(0) if x is None else x, np.empty(0) if y is None else y)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    # ── Construcción ─────────────────────────────────────────────────
+    def rebuild(self, x: np.ndarray, y: np.ndarray) -> 'GridIndex':
+        """Indexa un frame nuevo en O(n) (radix sort por celda)."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        n = len(x)
+        if n == 0:
+            self._i0 = self._j0 = 0
+            self._w = self._h = 0
+            self.order = np.empty(0, dtype=np.int64)
+            self.xy = np.empty((0, 2))
+            self._start = np.zeros(1, dtype=np.int64)
+            self._cells = None
+            return self
+        ci = np.floor(x / self.cell).astype(np.int64)
+        cj = np.floor(y / self.cell).astype(np.int64)
+        self._i0, self._j0 = int(ci.min()), int(cj.min())
+        self._w = int(ci.max()) - self._i0 + 1
+        self._h = int(cj.max()) - self._j0 + 1
+        ncells = self._w * self._h
+        keys = (ci - self._i0) * self._h + (cj - self._j0)
+        if ncells <= RADIX_MAX_CELLS:
+            keys = keys.astype(np.uint16)
+        self.order = np.argsort(keys, kind='stable')
+        self.xy = np.column_stack((x, y))[self.order]
+        if ncells <= DENSE_CELLS_PER_POINT * n + RADIX_MAX_CELLS:
+            # Tabla densa: la celda k ocupa [start[k], start[k + 1])
+            self._start = np.zeros(ncells + 1, dtype=np.int64)
+            np.cumsum(np.bincount(keys, minlength=ncells), out=self._start[1:])
+            self._cells = None
+        else:
+            self._cells = keys[self.order].astype(np.int64)  # claves ordenadas (búsqueda binaria)
+            self._start = None
+        return self
+
+    # ── Generación de candidatos ─────────────────────────────────────
+    def _candidates(self, qx: np.ndarray, qy: np.ndarray, ring: int
+                    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Pares (consulta, punto) del bloque de (2*ring+1)² celdas alrededor de
+        cada consulta, agrupados por consulta.
+        Returns:
+            (qid, cand, per_q): índice de consulta y posición en self.xy de
+            cada par, y nº de pares de cada consulta.
+        """
+        nq = len(qx)
+        if self._covers_all(ring):
+            # El bloque tiene más celdas que puntos: es más barato mirar todos
+            n = len(self)
+            return np.repeat(np.arange(nq), n), np.tile(np.arange(n), nq), np.full(nq, n)
+        off = np.arange(-ring, ring + 1)
+        di = np.repeat(off, len(off))
+        dj = np.tile(off, len(off))
+        ci = np.floor(qx / self.cell).astype(np.int64)[:, None] - self._i0 + di[None]
+        cj = np.floor(qy / self.cell).astype(np.int64)[:, None] - self._j0 + dj[None]
+        inside = (ci >= 0) & (ci < self._w) & (cj >= 0) & (cj < self._h)
+        keys = np.where(inside, ci * self._h + cj, 0).ravel()
+        if self._start is not None:
+            start = self._start[keys]
+            count = self._start[keys + 1] - start
+        else:
+            start = np.searchsorted(self._cells, keys, side='left')
+            count = np.searchsorted(self._cells, keys, side='right') - start
+        count[~inside.ravel()] = 0
+        total = int(count.sum())
+        cand = np.repeat(start - np.cumsum(count) + count, count) + np.arange(total)
+        qid = np.repeat(np.arange(nq * len(di)) // len(di), count)
+        return qid, cand, count.reshape(nq, len(di)).sum(axis=1)
+
+    def _max_ring(self, qx: np.ndarray, qy: np.ndarray) -> np.ndarray:
+        """
+        Anillo que cubre toda la rejilla desde cada consulta: distancia de
+        Chebyshev (en celdas) a la esquina más lejana, también desde fuera.
+        """
+        ci = np.floor(qx / self.cell).astype(np.int64) - self._i0
+        cj = np.floor(qy / self.cell).astype(np.int64) - self._j0
+        return np.maximum(np.maximum(np.abs(ci), np.abs(ci - (self._w - 1))),
+                          np.maximum(np.abs(cj), np.abs(cj - (self._h - 1))))
+
+    def _covers_all(self, ring: int) -> bool:
+        """Con este anillo se comparan todos los puntos (resultado exacto sin más pasadas)."""
+        return (2 * ring + 1) ** 2 >= len(self)
+
+    # ── Consultas ────────────────────────────────────────────────────
+    def query_radius(self, qx: np.ndarray, qy: np.ndarray, r: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Puntos a distancia <= r de cada consulta.
+        Returns:
+            (offsets, idx) en formato CSR: los vecinos de la consulta j son
+            idx[offsets[j]:offsets[j + 1]] (índices de la entrada, sin orden).
+        """
+        qx, qy = np.atleast_1d(qx).astype(np.float64), np.atleast_1d(qy).astype(np.float64)
+        offsets = np.zeros(len(qx) + 1, dtype=np.int64)
+        if len(self) == 0 or len(qx) == 0:
+            return offsets, np.empty(0, dtype=np.int64)
+        qid, cand, _ = self._candidates(qx, qy, int(np.ceil(r / self.cell)))
+        d2 = (self.xy[cand, 0] - qx[qid]) ** 2 + (self.xy[cand, 1] - qy[qid]) ** 2
+        hit = d2 <= r * r
+        np.cumsum(np.bincount(qid[hit], minlength=len(qx)), out=offsets[1:])
+        return offsets, self.order[cand[hit]]
+
+    def within(self, qx: np.ndarray, qy: np.ndarray, r: float) -> np.ndarray:
+        """Máscara sobre los puntos indexados: a distancia <= r de alguna consulta (p. ej. una ruta muestreada)."""
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.query_radius(qx, qy, r)[1]] = True
+        return mask
+
+    def nearest(self, qx: np.ndarray, qy: np.ndarray, max_dist: float = np.inf
+                ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vecino más cercano de cada consulta.
+        Returns:
+            (idx, dist): índice en la entrada y distancia; -1 / inf si no hay
+            ninguno a <= max_dist.
+        """
+        idx, dist = self.knn(qx, qy, 1, max_dist)
+        return idx[:, 0], dist[:, 0]
+
+    def knn(self, qx: np.ndarray, qy: np.ndarray, k: int, max_dist: float = np.inf
+            ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Los k vecinos más cercanos de cada consulta, de menor a mayor distancia.
+        Sin max_dist el anillo de búsqueda crece (se dobla mientras falten
+        candidatos; con k candidatos salta al anillo que cubre el k-ésimo)
+        hasta que los k vecinos encontrados son seguros.
+        Returns:
+            (idx, dist) de forma (nq, k); -1 / inf donde no hay vecino.
+        """
+        qx, qy = np.atleast_1d(qx).astype(np.float64), np.atleast_1d(qy).astype(np.float64)
+        nq = len(qx)
+        idx = np.full((nq, k), -1, dtype=np.int64)
+        dist = np.full((nq, k), np.inf)
+        if len(self) == 0 or nq == 0 or k <= 0:
+            return idx, dist
+        full = self._max_ring(qx, qy)
+        ring0 = int(np.ceil(max_dist / self.cell)) if np.isfinite(max_dist) else 1
+        rings = np.minimum(full, ring0)
+        pending = np.arange(nq)
+        while len(pending):
+            # Se procesan juntas las consultas que necesitan el mismo anillo
+            ring = int(rings[pending].min())
+            batch = pending[rings[pending] == ring]
+            bx, by = qx[batch], qy[batch]
+            if self._covers_all(ring):
+                # Hay que mirar todos los puntos: argpartition por consulta (exacto)
+                bi, bd = brute_knn(self.xy[:, 0], self.xy[:, 1], bx, by, k)
+                hit = bd <= max_dist
+                idx[batch] = np.where(hit, self.order[np.maximum(bi, 0)], -1)
+                dist[batch] = np.where(hit, bd, np.inf)
+                pending = pending[~np.isin(pending, batch)]
+                continue
+            qid, cand, _ = self._candidates(bx, by, ring)
+            d2 = (self.xy[cand, 0] - bx[qid]) ** 2 + (self.xy[cand, 1] - by[qid]) ** 2
+            keep = d2 <= max_dist * max_dist
+            qid, cand, d2 = qid[keep], cand[keep], d2[keep]
+            if k == 1:
+                qsel, csel, dsel = _group_min(qid, cand, d2)
+                rank = np.zeros(len(qsel), dtype=np.int64)
+            else:
+                # Orden por (consulta, distancia) y posición dentro de cada grupo
+                order = np.lexsort((d2, qid))
+                qsel, csel, dsel = qid[order], cand[order], d2[order]
+                first = np.r_[0, np.flatnonzero(qsel[1:] != qsel[:-1]) + 1]
+                rank = np.arange(len(qsel)) - np.repeat(first, np.diff(np.r_[first, len(qsel)]))
+                top = rank < k
+                qsel, csel, dsel, rank = qsel[top], csel[top], dsel[top], rank[top]
+            found = np.bincount(qsel, minlength=len(batch))
+            kth = np.full(len(batch), np.inf)
+            last = rank == found[qsel] - 1
+            kth[qsel[last]] = np.sqrt(dsel[last])
+            # El bloque de anillo L contiene seguro todo punto a <= L * cell de la consulta
+            done = (ring >= full[batch]) | (np.isfinite(max_dist) and ring * self.cell >= max_dist)
+            resolved = done | ((found >= k) & (kth <= ring * self.cell))
+            ok = resolved[qsel]
+            rows = batch[qsel[ok]]
+            idx[rows, rank[ok]] = self.order[csel[ok]]
+            dist[rows, rank[ok]] = np.sqrt(dsel[ok])
+            # Sin resolver: con k candidatos basta el anillo que cubre el k-ésimo;
+            # si faltan, se dobla
+            retry = ~resolved
+            with np.errstate(invalid='ignore'):
+                need = np.where(found >= k, np.ceil(kth / self.cell), 2 * ring)
+            grow = np.minimum(np.maximum(need[retry], ring + 1), full[batch[retry]])
+            rings[batch[retry]] = grow.astype(np.int64)
+            pending = np.concatenate((pending[~np.isin(pending, batch)], batch[retry]))
+        return idx, dist
+
+
+def _group_min(qid: np.ndarray, cand: np.ndarray, d2: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Mínimo de d2 por consulta sobre pares ya agrupados por consulta (reduceat, sin ordenar)."""
+    if len(qid) == 0:
+        return qid, cand, d2
+    starts = np.r_[0, np.flatnonzero(qid[1:] != qid[:-1]) + 1]
+    best = np.minimum.reduceat(d2, starts)
+    is_min = np.flatnonzero(d2 == np.repeat(best, np.diff(np.r_[starts, len(qid)])))
+    qm = qid[is_min]
+    first = is_min[np.r_[True, qm[1:] != qm[:-1]]]  # primer empate de cada consulta
+    return qid[first], cand[first], d2[first]
+
+
+# ── Referencia por fuerza bruta (para comprobar y comparar tiempos) ──
+def brute_knn(x: np.ndarray, y: np.ndarray, qx: np.ndarray, qy: np.ndarray, k: int = 1
+              ) -> Tuple[np.ndarray, np.ndarray]:
+    """k vecinos más cercanos recorriendo todos los puntos (por bloques de consultas)."""
+    qx, qy = np.atleast_1d(qx), np.atleast_1d(qy)
+    k_eff = min(k, len(x))
+    idx = np.full((len(qx), k), -1, dtype=np.int64)
+    dist = np.full((len(qx), k), np.inf)
+    for s in range(0, len(qx), BRUTE_BLOCK):
+        d2 = (qx[s:s + BRUTE_BLOCK, None] - x[None]) ** 2 + (qy[s:s + BRUTE_BLOCK, None] - y[None]) ** 2
+        part = np.argpartition(d2, k_eff - 1, axis=1)[:, :k_eff] if k_eff < len(x) else np.argsort(d2, axis=1)
+        pd = np.take_along_axis(d2, part, axis=1)
+        o = np.argsort(pd, axis=1, kind='stable')
+        idx[s:s + BRUTE_BLOCK, :k_eff] = np.take_along_axis(part, o, axis=1)
+        dist[s:s + BRUTE_BLOCK, :k_eff] = np.sqrt(np.take_along_axis(pd, o, axis=1))
+    return idx, dist
+
+
+def brute_radius_counts(x: np.ndarray, y: np.ndarray, qx: np.ndarray, qy: np.ndarray, r: float) -> np.ndarray:
+    """Nº de puntos a distancia <= r de cada consulta, recorriendo todos."""
+    qx, qy = np.atleast_1d(qx), np.atleast_1d(qy)
+    out = np.empty(len(qx), dtype=np.int64)
+    for s in range(0, len(qx), BRUTE_BLOCK):
+        d2 = (qx[s:s + BRUTE_BLOCK, None] - x[None]) ** 2 + (qy[s:s + BRUTE_BLOCK, None] - y[None]) ** 2
+        out[s:s + BRUTE_BLOCK] = np.count_nonzero(d2 <= r * r, axis=1)
+    return out
+
+
+if __name__ == '__main__':
+    import time
+
+    def _best(fn, reps=5):
+        t = []
+        for _ in range(reps):
+            t0 = time.perf_counter()
+            fn()
+            t.append(time.perf_counter() - t0)
+        return min(t) * 1e3
+
+    # Escena tipo LiDAR: puntos sobre paredes y obstáculos a 0.3–8 m del sensor
+    rng = np.random.default_rng(0)
+    nq, r, k = 1000, 0.5, 5
+    print(f'{nq} consultas | radio {r} m | k={k} | celda {DEFAULT_CELL_M} m  (tiempos en ms, mejor de 5)')
+    print(f"{'puntos':>7} {'build':>7} {'nearest':>8} {'bruta':>8} {'knn':>7} {'bruta':>8} "
+          f"{'radio':>7} {'bruta':>8}  iguales")
+    for n in (1_000, 5_000, 10_000, 50_000):
+        ang = np.sort(rng.uniform(0, 2 * np.pi, n))
+        rad = 3.0 + 2.0 * np.sin(3 * ang) + rng.normal(0, 0.01, n)
+        clutter = rng.random(n) < 0.1
+        rad[clutter] = rng.uniform(0.3, 8.0, int(np.count_nonzero(clutter)))
+        x, y = rad * np.cos(ang), rad * np.sin(ang)
+        qx, qy = rng.uniform(-6, 6, nq), rng.uniform(-6, 6, nq)
+
+        gi = GridIndex(x, y)
+        t_build = _best(lambda: GridIndex(x, y))
+        t_nn = _best(lambda: gi.nearest(qx, qy))
+        t_nn_b = _best(lambda: brute_knn(x, y, qx, qy, 1))
+        t_knn = _best(lambda: gi.knn(qx, qy, k))
+        t_knn_b = _best(lambda: brute_knn(x, y, qx, qy, k))
+        t_rad = _best(lambda: gi.query_radius(qx, qy, r))
+        t_rad_b = _best(lambda: brute_radius_counts(x, y, qx, qy, r))
+
+        # Comprobación contra la fuerza bruta (distancias; los empates pueden cambiar el índice)
+        same = (np.allclose(gi.nearest(qx, qy)[1], brute_knn(x, y, qx, qy, 1)[1][:, 0])
+                and np.allclose(gi.knn(qx, qy, k)[1], brute_knn(x, y, qx, qy, k)[1])
+                and np.array_equal(np.diff(gi.query_radius(qx, qy, r)[0]), brute_radius_counts(x, y, qx, qy, r)))
+        print(f'{n:7d} {t_build:7.2f} {t_nn:8.2f} {t_nn_b:8.2f} {t_knn:7.2f} {t_knn_b:8.2f} '
+              f'{t_rad:7.2f} {t_rad_b:8.2f}  {same}')
+
+    # Consultas fuera de la zona indexada (p. ej. "obstáculo más cercano a un
+    # punto de la ruta" lejos del barrido): 8k puntos en una caja de 4x4 m
+    x, y = rng.uniform(0, 4, 8000), rng.uniform(0, 4, 8000)
+    qx, qy = rng.uniform(-40, 40, nq), rng.uniform(-40, 40, nq)
+    qx[:2], qy[:2] = (10.0, 2.0), (10.0, 2.0)  # en diagonal y a un lado de la caja
+    gi = GridIndex(x, y)
+    bi, bd = brute_knn(x, y, qx, qy, k)
+    assert np.allclose(gi.nearest(qx, qy)[1], bd[:, 0]) and np.allclose(gi.knn(qx, qy, k)[1], bd)
+    lim = 15.0
+    assert np.allclose(gi.nearest(qx, qy, lim)[1], np.where(bd[:, 0] <= lim, bd[:, 0], np.inf))
+    print(f'Fuera de la rejilla OK: {nq} consultas hasta a {np.max(bd[:, 0]):.0f} m de la caja de 4x4 m, '
+          f'nearest(10, 10) = {bd[0, 0]:.2f} m')
@@ -69,7 +69,7 @@ def transition(state: State, event: str) -> State:
    (State.INIT, 'diag_ok'): State.DIAG, # El checklist pasó, inciamos diagnóstico
    (State.INIT, 'diag_fail'): State.ERROR, # El checklist falló, abortamos
    (State.DIAG, 'start'): State.SCAN, # Diagnóstico correcto, encendemos el láser
-   (State.SCAN, 'sopt'): State.STOP, # Usuario o programa solicita detener escaneo
+   (State.SCAN, 'stop'): State.STOP, # Usuario, programa o safety_monitor solicita detener escaneo
   
  }
  return transitions.get((state, event), state) 
@@ -4,62 +4,79 @@ Visualización en tiempo real del RPLIDAR A1M8.
 Propietario: Visión Artificial (marisa lozano).
 Cómo funciona la visualización en tiempo real con matplotlib:
  - plt.ion() activa el modo interactivo (no bloquea el hilo)
- - fig.canvas.draw() + fig.canvas.flush_events() refresca la ventana
- - Esto funciona bien hasta ~8 Hz (frecuencia de rotación del sensor)
- - Si se necesita mayor fluidez: explorar pyqtgraph o pygame
+ - BlitRenderer (live_renderer.py) guarda el fondo (ejes, cuadrícula, leyenda)
+   y en cada frame solo redibuja el scatter y el texto → canvas.blit()
+ - Así se pasa holgadamente de 10 Hz; FPS y ms de dibujo salen en pantalla
+ - Si se necesita aún más fluidez: explorar pyqtgraph o pygame
+Adquisición y render van en hilos separados: un hilo lector vacía el puerto
+y deja solo el último frame completo (FrameRing 'latest'); el bucle de
+dibujo pinta siempre el más reciente y se salta los viejos. En pantalla:
+frames saltados y edad captura → píxeles (objetivo: menos de una vuelta).
+Con --inline se vuelve a leer y dibujar en el mismo bucle (depuración).
 Uso:
  python src/view_live.py --port /dev/ttyUSB0 --range 6.0
 """
 from __future__ import annotations
+import os
 import argparse
 import numpy as np
 import matplotlib.pyplot as plt
-from lidar_driver import LidarDriver
+from lidar_driver import LidarDriver, ScanFrame
+from lidar_processing import TrigTable
+from live_renderer import BlitRenderer, FrameAgeMeter
+from profiling import Profiler
+#tablas de seno/coseno para la rejilla de ángulos del sensor (1/64°), se calculan una sola vez
+TRIG = TrigTable()
 def polar_to_xy(pts):
  """
- Convierte una lista de ScanPoints a arrays numpy X, Y.
+ Convierte un ScanFrame (o una lista de ScanPoints) a arrays numpy X, Y.
  Args:
- pts: lista de tuplas (quality, angle_deg, dist_mm)
+ pts: ScanFrame, o lista de tuplas (quality, angle_deg, dist_mm)
  Returns:
  x, y: arrays numpy en metros
  q: array numpy de calidades (para colorear puntos opcionalmente)
  """
- #extraemos las calidades de todos los puntos y las guardamos en un array como decimales
- q = np.array([p[0] for p in pts], dtype=float)
- #extraemos los ángulos, pero los convertimos de grados a radianes porque numpy usa radianes para seno/coseno
- ang = np.deg2rad([p[1] for p in pts])
- #extraemos las distancias y las dividimos entre 1000 para pasar de milímetros a metros
- r = np.array([p[2] for p in pts], dtype=float) / 1000.0 # mm → m
+ if isinstance(pts, ScanFrame):
+  #el frame ya trae las columnas como arrays: no hay que reconstruir nada
+  q = pts.quality
+  ang = pts.angle
+  r = pts.dist / 1000.0 # mm → m
+ else:
+  #extraemos las calidades de todos los puntos y las guardamos en un array como decimales
+  q = np.array([p[0] for p in pts], dtype=float)
+  #extraemos los ángulos en grados (la tabla TRIG trabaja en grados)
+  ang = np.array([p[1] for p in pts], dtype=float)
+  #extraemos las distancias y las dividimos entre 1000 para pasar de milímetros a metros
+  r = np.array([p[2] for p in pts], dtype=float) / 1000.0 # mm → m
  # TODO [Visión]: filtrar por rango de distancia y calidad mínima
  # antes de calcular x, y. Puntos fuera de rango distorsionan la vista.
- # Ejemplo:
- # mask = (r > 0.15) & (r < 6.0) & (q >= 10)
- # ang, r, q = ang[mask], r[mask], q[mask]
-#filtramos distancias muy cortas < 0.15m, fuera de rango > 6.0m y de baja calidad < 10
-mask = (r > 0.15) & (r < 6.0) & (q >= 10)
-#ponemos la máscara para quedarnos con los puntos válidos
-ang_valido = ang[mask]
-r_valido = r[mask]
-q_valido = q[mask]
- #proyección a cartesianas con la coordenada X que es: distancia x coseno del ángulo
- x = r * np.cos(ang)
- #proyección a cartesianas con la coordenada Y que es la distancia por el seno del ángulo
- y = r * np.sin(ang)
+ #filtramos distancias muy cortas < 0.15m, fuera de rango > 6.0m y de baja calidad < 10
+ mask = (r > 0.15) & (r < 6.0) & (q >= 10)
+ #ponemos la máscara para quedarnos con los puntos válidos
+ ang_valido = ang[mask]
+ r_valido = r[mask]
+ q_valido = q[mask]
+ #proyección a cartesianas: X = distancia x coseno, Y = distancia x seno.
+ #cos/sin salen de la tabla precalculada (los ángulos fuera de la rejilla se calculan exactos)
+ x, y = TRIG.project(ang_valido, r_valido)
  #devolvemos las tres matrices, coordenadas X e Y, y la calidad original
  return x, y, q_valido
- 
-  def main():
-   #leemos los parametros
- ap = argparse.ArgumentParser(description='Visualización en tiempo real
-RPLIDAR')
- ap.add_argument('--port', required=True, help='Puerto serie
-(/dev/ttyUSB0 o COM5)')
- ap.add_argument('--range', type=float, default=6.0, help='Rango máximo a
-mostrar (metros)')
+
+def main():
+ #leemos los parametros
+ ap = argparse.ArgumentParser(description='Visualización en tiempo real RPLIDAR')
+ ap.add_argument('--port', required=True, help='Puerto serie (/dev/ttyUSB0 o COM5)')
+ ap.add_argument('--range', type=float, default=6.0, help='Rango máximo a mostrar (metros)')
+ ap.add_argument('--inline', action='store_true', help='Leer y dibujar en el mismo hilo (sin saltar frames viejos)')
+ ap.add_argument('--profile', action='store_true', help='Medir la latencia por etapa (lectura, filtro, proyección, dibujo)')
+ ap.add_argument('--profile-out', default=None, help='Exportar las medidas como líneas JSON (cada 5 s + final)')
  args = ap.parse_args()
- 
+
  # Inicializar driver y ventana matplotlib
  driver = LidarDriver(args.port)
+ #con --profile cada frame lleva marcas de tiempo por etapa
+ prof = Profiler(export=args.profile_out) if args.profile or args.profile_out else None
+ driver.profiler = prof
  plt.ion() # modo interactivo: no bloquea
  #creamos la figura y los ejes con un tamaño cuadrado 7x7
  fig, ax = plt.subplots(figsize=(7, 7))
@@ -84,45 +101,69 @@ mostrar (metros)')
  scat = ax.scatter([], [], s=4, c='cyan', alpha=0.8)
  # Texto de info en pantalla
  info_text = ax.text(-args.range + 0.1, args.range - 0.3, '',
- fontsize=9, color='white',
- bbox=dict(boxstyle='round', facecolor='black', alpha=0.5))
+  fontsize=9, color='white',
+  bbox=dict(boxstyle='round', facecolor='black', alpha=0.5))
+ #el renderer dibuja el fondo una vez y luego solo el scatter y el texto
+ renderer = BlitRenderer(fig, [scat], hud=info_text)
+ #edad de lo que se ve: desde que se completa el frame hasta que está en pantalla
+ edad = FrameAgeMeter()
  frame_count = 0
- 
+ #un hilo lee el puerto y el anillo guarda solo el frame más reciente:
+ #si el dibujo va lento se saltan los frames viejos en lugar de acumular retraso
+ frames = driver.frames() if args.inline else driver.frames_threaded(policy='latest')
+
  try:
- #driver.frames() es un generador que nos da barridos de 360 grados
- for fr in driver.frames():
- #transforma datos polares del sensor a cartesianos para la pantalla:
- x, y, q = polar_to_xy(fr.pts)
- # Actualizar puntos en el scatter
- scat.set_offsets(np.c_[x, y])
- #calculo de estadisticas de puntos
- frame_count += 1
- total_puntos = len(fr.pts)
- puntos_validos = len(x)
- puntos_invalidos = total_puntos - puntos_validos
- porcentaje_valido = (puntos_validos / total_puntos) * 100 if total_puntos > 0 else 0
+  #driver.frames() es un generador que nos da barridos de 360 grados
+  for fr in frames:
+   #transforma datos polares del sensor a cartesianos para la pantalla:
+   x, y, q = polar_to_xy(fr)
+   if prof is not None:
+    prof.stamp(fr, 'project')
+   # Actualizar puntos en el scatter
+   scat.set_offsets(np.c_[x, y])
+   #calculo de estadisticas de puntos
+   frame_count += 1
+   total_puntos = len(fr)
+   puntos_validos = len(x)
+   puntos_invalidos = total_puntos - puntos_validos
+   porcentaje_valido = (puntos_validos / total_puntos) * 100 if total_puntos > 0 else 0
 
- # Actualizar información en pantalla          
- info_text.set_text(
- f'Frame: {frame_count}\n'
- f'Puntos: {len(fr.pts)}\n'
- # TODO [Visión]: mostrar % válidos/inválidos
- f'Válidos: {puntos_validos} ({porcentaje_valido:.1f}%)\n'
- f'Inválidos: {puntos_invalidos}'
- )
- # Refrescar la ventana (clave para tiempo real)
- fig.canvas.draw()
- fig.canvas.flush_events()
- # TODO [Visión]: implementar captura automática cada N frames
- if frame_count % 50 == 0:
-                fig.savefig('docs/capturas/live_view.png')
-                print(f'[INFO] Captura guardada automáticamente en frame {frame_count}')
+   # Actualizar información en pantalla y refrescar la ventana (solo lo que cambia)
+   renderer.render(
+    f'Frame: {frame_count}\n'
+    f'Puntos: {total_puntos}\n'
+    # TODO [Visión]: mostrar % válidos/inválidos
+    f'Válidos: {puntos_validos} ({porcentaje_valido:.1f}%)\n'
+    f'Inválidos: {puntos_invalidos}'
+    + (f'\nSaltados: {driver.ring.dropped}' if driver.ring is not None else '')
+    + f'\n{edad.text()}'
+   )
+   #ya está en pantalla: medimos su edad (el texto muestra la del frame anterior)
+   edad.shown(fr.t, driver.ring.dropped if driver.ring is not None else 0)
+   if prof is not None:
+    prof.stamp(fr, 'render')
+    prof.finish(fr)
+   # TODO [Visión]: implementar captura automática cada N frames
+   if frame_count % 50 == 0:
+    renderer.savefig('docs/capturas/live_view.png')
+    print(f'[INFO] Captura guardada automáticamente en frame {frame_count}')
  except KeyboardInterrupt:
- #detenemos la salida por consola cuando el usuario pulsa Ctrl+C
- print('\n[INFO] Detenido por el usuario (Ctrl+C)')
+  #detenemos la salida por consola cuando el usuario pulsa Ctrl+C
+  print('\n[INFO] Detenido por el usuario (Ctrl+C)')
  finally:
- #parada segura obligatoria para evitar que el motor siga girando
- driver.shutdown_safe() # SIEMPRE parar el sensor al salir
- #ejecuta script:
- if __name__ == '__main__':
+  #cerramos el generador: si había hilo lector se para antes de tocar el puerto
+  frames.close()
+  #parada segura obligatoria para evitar que el motor siga girando
+  driver.shutdown_safe() # SIEMPRE parar el sensor al salir
+ #resumen de latencia y render
+ print(f'[INFO] Edad captura → píxeles: {edad.stats()}')
+ print(f'[INFO] Render: {renderer.stats()}')
+ if driver.ring is not None:
+  print(f'[INFO] Anillo de adquisición: {driver.ring.stats()}')
+ if prof is not None:
+  prof.close()
+  print(f'[INFO] Latencia por etapa:\n{prof.report()}')
+
+#ejecuta script:
+if __name__ == '__main__':
  main()
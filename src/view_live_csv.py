@@ -1,126 +1,128 @@
 """
 view_live_csv.py
-Visualización del CSV de referencia (scan_720.csv).
+Visualización de un CSV de escaneo (scan720.csv o cualquier formato de ingest.py).
 Propietario: Visión Artificial (marisa lozano).
 Importa lidar_processing.py (contrato de interfaz — NO modificar).
 Modos:
  Sin --animate : dibuja todos los puntos válidos de golpe.
  Con --animate : simula llegada progresiva de puntos (--step y --delay).
+  Cada paso solo dibuja los --step puntos nuevos sobre el fondo cacheado
+  (IncrementalScatter de live_renderer.py), así el coste por paso no crece
+  con los puntos acumulados. FPS y ms de dibujo salen en pantalla.
+ Con --polar : ejes polares (ángulo, distancia) en lugar de X/Y.
+El CSV se carga con ingest.load_scan: la primera vez se detecta el formato y
+se guarda una caché binaria junto al CSV; las siguientes cargas son un memmap.
 Uso:
- python src/view_live_csv.py --csv data/scan_720.csv --animate
+ python src/view_live_csv.py --csv data/scan720.csv --animate
+ python src/view_live_csv.py --csv data/scan720.csv --animate --polar
+ python src/view_live_csv.py --csv data/scan_20261902_1822.csv
 """
 from __future__ import annotations
+import os
 import time
 import argparse
+import numpy as np
 import matplotlib.pyplot as plt
-from lidar_driver_csv import read_scan_csv
-#importamos el contrato de interfaz del lider 
-# is_valid: para separar buenos de malos. polar_to_xy: para proyectar
-from lidar_processing import filter_and_project, is_valid, polar_to_xy # contrato interfaz
+from ingest import load_scan
+#importamos el contrato de interfaz del lider
+#filter_and_project_batch: separa buenos de malos y proyecta los buenos (mismo criterio que is_valid/polar_to_xy)
+from lidar_processing import DIST_MAX_M, filter_and_project_batch # contrato interfaz
+from live_renderer import BlitRenderer, IncrementalScatter
 
-def main(csv_path: str, animate: bool, step: int, delay: float, polar_mode: bool):
-#lectura de todas las muestras en bruto desde el archivo CSV
- samples = read_scan_csv(csv_path)
- n_total = len(samples)
+def main(csv_path: str, animate: bool, step: int, delay: float, polar_mode: bool, cache: bool = True):
+ #lectura de todas las muestras en columnas numpy (formato detectado; caché binaria si existe)
+ scan = load_scan(csv_path, cache)
+ quality, angle, measure_m, ok = scan.quality, scan.angle, scan.measure_m, scan.ok
+ n_total = len(angle)
  # Proyectar puntos válidos usando el módulo compartido
- #usamos filter_and_project para obtener los puntos válidos proyectados
- pts_validos = filter_and_project(samples) # lista de (x,y,quality,angle,r)
- n_valid = len(pts)
+ #x, y son las coordenadas de los válidos; mask marca cuáles son válidos en las columnas originales
+ x, y, mask = filter_and_project_batch(quality, angle, measure_m, ok)
+ n_valid = len(x)
  pct_valid = n_valid / n_total * 100 if n_total > 0 else 0
-#identificamos y separamos los puntos invalidos
-#filtramos la lista original y nos quedamos con los que is_valid() marca como False
-muestras_invalidas = [s for s in samples if not is_valid(s)]
-#configuramos la ventana gráfica Matplotlib
- fig, ax = plt.subplots(figsize=(8, 8))
-#configurar el modo de vista Polar vs Cartesiano
-if polar_mode:
-        #si el usuario pide modo polar creamos ejes especiales polares
-        ax = fig.add_subplot(111, projection='polar')
-        ax.set_title(f'RPLIDAR CSV (MODO POLAR) | {n_valid}/{n_total} válidos ({pct_valid:.1f}%)', pad=20)
-        #el centro del grafico polar es el origen por defecto
-    else:
-        #modo cartesiano X e Y
-        ax.set_title(f'RPLIDAR scan desde CSV | {n_valid}/{n_total} válidos
-       ({pct_valid:.1f}%)')
-        ax.set_xlabel('x (m)')
-        ax.set_ylabel('y (m)')
-        ax.set_aspect('equal', adjustable='box')
-        ax.plot(0, 0, 'r^', markersize=10, label='Sensor (origen)')
+ #identificamos y separamos los puntos invalidos (los que is_valid() marcaría como False)
+ inv_angle, inv_r = angle[~mask], measure_m[~mask]
+
+ #configuramos la ventana gráfica Matplotlib
+ #configurar el modo de vista Polar vs Cartesiano
+ if polar_mode:
+  #si el usuario pide modo polar creamos ejes especiales polares
+  fig, ax = plt.subplots(figsize=(8, 8), subplot_kw={'projection': 'polar'})
+  ax.set_title(f'RPLIDAR CSV (MODO POLAR) | {n_valid}/{n_total} válidos ({pct_valid:.1f}%)', pad=20)
+  #el centro del grafico polar es el origen por defecto
+  #en polar el eje "x" es el ángulo en radianes y el "y" la distancia en metros
+  val_a, val_b = np.deg2rad(angle[mask]), measure_m[mask]
+  inv_a, inv_b = np.deg2rad(inv_angle), inv_r
+ else:
+  #modo cartesiano X e Y
+  fig, ax = plt.subplots(figsize=(8, 8))
+  ax.set_title(f'RPLIDAR scan desde CSV | {n_valid}/{n_total} válidos ({pct_valid:.1f}%)')
+  ax.set_xlabel('x (m)')
+  ax.set_ylabel('y (m)')
+  ax.set_aspect('equal', adjustable='box')
+  ax.plot(0, 0, 'r^', markersize=10, label='Sensor (origen)')
+  val_a, val_b = x, y
+  #los inválidos se proyectan igual que los válidos (polar_to_xy vectorizado)
+  inv_rad = np.deg2rad(inv_angle)
+  inv_a, inv_b = inv_r * np.cos(inv_rad), inv_r * np.sin(inv_rad)
+  #límites fijos: en modo animado los puntos aún no existen y no hay autoescala
+  lim = max(float(np.max(np.abs(np.r_[x, y]))) * 1.1, 1.0) if n_valid else DIST_MAX_M
+  ax.set_xlim(-lim, lim)
+  ax.set_ylim(-lim, lim)
  ax.grid(True, alpha=0.3)
 
-#dibujo de puntos invalidos
-    # Dibujamos los puntos invalidos de fondo en rojo con una x para destacarlos
-    if len(muestras_invalidas) > 0:
-        if polar_mode:
-            #en polar, necesitamos radianes y la distancia en metros
-            inv_theta = [np.deg2rad(s.angle) for s in muestras_invalidas]
-            inv_r = [s.measure_m for s in muestras_invalidas]
-            ax.scatter(inv_theta, inv_r, color='red', marker='x', alpha=0.5, label='Inválidos / Ruido')
-        else:
-            #en cartesiano, usamos polar_to_xy del líder para proyectarlos
-            inv_xs, inv_ys = [], []
-            for s in muestras_invalidas:
-                x, y = polar_to_xy(s)
-                inv_xs.append(x)
-                inv_ys.append(y)
-            ax.scatter(inv_xs, inv_ys, color='red', marker='x', alpha=0.5, label='Inválidos / Ruido')
-#dibujo de puntos validos        
-if not animate:
- #modo estático: extraemos todas las coordenadas y pintamos de golpe
-        if polar_mode:
-            #indice 3 es ángulo en grados, Índice 4 es distancia en metros (según filter_and_project)
-            val_theta = [np.deg2rad(p[3]) for p in pts_validos]
-            val_r = [p[4] for p in pts_validos]
-            ax.scatter(val_theta, val_r, s=6, c='cyan', alpha=0.8, label='Puntos válidos')
-        else:
-            #indice 0 es X, Índice 1 es Y
-            xs = [p[0] for p in pts_validos]
-            ys = [p[1] for p in pts_validos]
-            ax.scatter(xs, ys, s=6, c='cyan', alpha=0.8, label='Puntos válidos')           
-        ax.legend(loc='upper right')
-else:
-        # Modo animado: activamos el modo interactivo para simular el barrido del láser
-        plt.ion()
-        # Creamos un scatter vacío para ir rellenándolo poco a poco
-        scat = ax.scatter([], [], s=6, c='cyan', alpha=0.8, label='Puntos válidos')
-        ax.legend(loc='upper right')
-     
-        datos_x, datos_y = [], []
-#bucle que avanza saltando de step en step puntos
- for i in range(0, len(pts), step):
- chunk = pts[i:i + step]
+ #dibujo de puntos invalidos
+ # Dibujamos los puntos invalidos de fondo en rojo con una x para destacarlos
+ if len(inv_a) > 0:
+  ax.scatter(inv_a, inv_b, color='red', marker='x', alpha=0.5, label='Inválidos / Ruido')
  if polar_mode:
-                datos_x.extend(np.deg2rad(p[3]) for p in chunk) #eje X en polar es el ángulo (theta)
-                datos_y.extend(p[4] for p in chunk)             #eje Y en polar es la distancia (radio)
-            else:
-                datos_x.extend(p[0] for p in chunk) # X cartesiana
-                datos_y.extend(p[1] for p in chunk) # Y cartesiana   
-            #actualizamos los datos del scatter con los nuevos puntos acumulados
-            #np.c_ une las listas en pares de coordenadas esperadas por matplotlib
-            scat.set_offsets(np.c_[datos_x, datos_y])
-            #refrescamos la ventana y forzamos una pausa para crear la ilusión de animacion
-            plt.pause(0.001)
-            time.sleep(delay)    
-        #apagamos el modo interactivo al terminar la animacion
-        plt.ioff()
-  
-#guardar captura de pantalla automaticamente
-    os.makedirs('docs/capturas', exist_ok=True)
-    ruta_captura = 'docs/capturas/live_view.png'
-    fig.savefig(docs/capturas/live_view.png)
-    print(f'\n[INFO] Gráfico generado correctamente.')
-    print(f'[INFO] Captura guardada de forma automática en: docs/capturas/live_view.png')
-    #mantenemos la ventana abierta hasta que el usuario la cierre manualmente
-    plt.show()
+  #radio fijo según los válidos (los inválidos lejanos no deben encoger la vista)
+  ax.set_rlim(0, float(val_b.max()) * 1.1 if n_valid else DIST_MAX_M)
+
+ #dibujo de puntos validos
+ if not animate:
+  #modo estático: pintamos todas las coordenadas de golpe
+  ax.scatter(val_a, val_b, s=6, c='cyan', alpha=0.8, label='Puntos válidos')
+  ax.legend(loc='upper right')
+ else:
+  # Modo animado: activamos el modo interactivo para simular el barrido del láser
+  plt.ion()
+  #texto con el progreso (y FPS / ms de dibujo que añade el renderer)
+  info_text = ax.text(0.02, 0.98, '', transform=ax.transAxes, va='top', fontsize=9, color='white',
+   bbox=dict(boxstyle='round', facecolor='black', alpha=0.5))
+  renderer = BlitRenderer(fig, hud=info_text)
+  # Nube que se va rellenando poco a poco: cada paso dibuja solo los puntos nuevos
+  nube = IncrementalScatter(ax, renderer, capacity=n_valid, s=6, c='cyan', alpha=0.8, label='Puntos válidos')
+  ax.legend(loc='upper right')
+  plt.show(block=False)
+  #bucle que avanza saltando de step en step puntos
+  for i in range(0, n_valid, step):
+   nube.extend(val_a[i:i + step], val_b[i:i + step])
+   renderer.render(f'Puntos: {nube.n}/{n_valid}')
+   #pausa para crear la ilusión de animacion
+   time.sleep(delay)
+  print(f'[INFO] Render: {renderer.stats()}')
+  #apagamos el modo interactivo al terminar la animacion
+  plt.ioff()
+
+ #guardar captura de pantalla automaticamente
+ os.makedirs('docs/capturas', exist_ok=True)
+ ruta_captura = 'docs/capturas/live_view.png'
+ if animate:
+  renderer.savefig(ruta_captura)
+ else:
+  fig.savefig(ruta_captura)
+ print(f'\n[INFO] Gráfico generado correctamente.')
+ print(f'[INFO] Captura guardada de forma automática en: {ruta_captura}')
+ #mantenemos la ventana abierta hasta que el usuario la cierre manualmente
+ plt.show()
 
 if __name__ == '__main__':
  ap = argparse.ArgumentParser(description='Visualizador CSV del RPLIDAR')
- ap.add_argument('--csv', default='data/scan_720.csv')
- ap.add_argument('--animate', action='store_true', help='Animar llegada de
-puntos')
- ap.add_argument('--step', type=int, default=20, help='Puntos por
-actualización')
-  ap.add_argument('--delay', type=float, default=0.02, help='Segundos entre
-updates')
+ ap.add_argument('--csv', default='data/scan720.csv')
+ ap.add_argument('--animate', action='store_true', help='Animar llegada de puntos')
+ ap.add_argument('--step', type=int, default=20, help='Puntos por actualización')
+ ap.add_argument('--delay', type=float, default=0.02, help='Segundos entre updates')
+ ap.add_argument('--polar', action='store_true', help='Vista polar (ángulo, distancia)')
+ ap.add_argument('--no-cache', action='store_true', help='Parsear siempre el texto (sin caché binaria)')
  args = ap.parse_args()
-main(args.csv, args.animate, args.step, args.delay, args.polar)
+ main(args.csv, args.animate, args.step, args.delay, args.polar, not args.no_cache)